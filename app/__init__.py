@@ -4,8 +4,21 @@ Telegram Bot с интеграцией Hydra AI.
 Этот пакет содержит все компоненты для работы бота:
 - bot_config: Загрузка конфигурации
 - context_loader: Загрузка контекста из markdown
+- context_watcher: Горячая перезагрузка контекста
+- snapshot_artifact: Сборка артефакта снимка контекста
 - hydra_client: HTTP клиент для Hydra AI API
+- token_counter: Подсчёт токенов и бюджет контекста
+- conversation_memory: История диалогов
 - message_handler: Обработка сообщений
+- chat_search: Поиск по исходным сообщениям чата (векторный индекс)
+- answer_cache: Кэш ответов на вопросы без истории диалога
+- context_search: Быстрый поиск по фрагментам контекста снимка
+- question_router: Выбор модели и бюджета ответа по вопросу
+- local_answers: Ответы команд по статистике и полнотекстовому индексу без API
+- text_normalize: Основа слова и запрос FTS5 (общие с utils/chat_index.py)
+- offload: Вынос блокирующих операций из event loop
+- outbound: Очередь исходящих сообщений с учётом лимитов Telegram
+- worker_pool: Многопроцессный режим (ingress + воркеры)
 - telegram_bot: Главный модуль бота
 """
 
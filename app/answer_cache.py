@@ -0,0 +1,357 @@
+"""
+Кэш ответов бота.
+
+Ответы на самостоятельные вопросы (заданные без истории диалога) не
+зависят от чата и сохраняются по нормализованному тексту вопроса и
+версии снимка контекста: после перезагрузки result/ старые ответы не
+выдаются. Ответы текущей версии держатся в памяти вместе с индексом
+слов вопросов, поэтому поиск по ним (inline-режим) не обращается к
+диску и не ждёт модель. В SQLite кэш переживает перезапуск бота и
+общий для процессов-воркеров: ответы, записанные другим процессом,
+подгружаются не чаще раза в REFRESH_INTERVAL секунд.
+
+Там же считается, как часто и сколько разных пользователей задают каждый
+самостоятельный вопрос: вопросы, заданные хотя бы min_users пользователями,
+заранее получают ответ при старте и перезагрузке контекста (см.
+prewarm_answers в telegram_bot.py).
+
+Вопросы пользователей бывают личными, поэтому поиск (inline-режим) видит
+только отобранные вопросы: список FAQ и вопросы, заданные хотя бы min_users
+разными пользователями. Такой вопрос показывается в нормализованном виде
+(question_key) - общем для всех, кто его задал, а не в формулировке
+конкретного пользователя.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from context_search import expand_prefix, text_terms
+
+
+# Сколько ответов текущей версии держать в памяти
+MAX_ENTRIES = 5000
+
+# Как часто подгружать из базы ответы, записанные другими процессами (секунды)
+REFRESH_INTERVAL = 2.0
+
+# Сколько ждать блокировки базы, занятой другим процессом (секунды)
+DB_TIMEOUT = 30.0
+
+# Сколько разных пользователей должны задать вопрос, чтобы он попал в частые
+MIN_QUESTION_USERS = 3
+
+
+def question_key(question):
+    """Ключ вопроса: регистр, "ё", пунктуация и лишние пробелы не различаются"""
+    return ' '.join(re.findall(r'\w+', question.lower().replace('ё', 'е')))
+
+
+def user_hash(user_id):
+    """Хэш ID пользователя: для подсчёта разных пользователей ID не хранится открытым текстом"""
+    return hashlib.sha256(f"answer-cache:{user_id}".encode('utf-8')).hexdigest()[:16]
+
+
+class AnswerCache:
+    """Ответы на вопросы по версии снимка: в памяти + SQLite на диске"""
+
+    def __init__(self, db_path=None, max_entries=MAX_ENTRIES, faq_questions=(), min_users=MIN_QUESTION_USERS):
+        """
+        Инициализация кэша.
+
+        Args:
+            db_path: Путь к базе SQLite (None - только в памяти)
+            max_entries: Сколько ответов текущей версии держать в памяти
+            faq_questions: Вопросы FAQ - всегда доступны поиску
+            min_users: Сколько разных пользователей должны задать вопрос,
+                       чтобы он стал частым и доступным поиску
+        """
+        self.max_entries = max_entries
+        self.min_users = min_users
+        self.version = None
+        self._entries = OrderedDict()   # ключ -> (вопрос, ответ), новые в конце
+        self._terms = {}                # основа -> {ключи вопросов}
+        self._vocabulary = None         # отсортированные основы (строятся при поиске)
+        self._last_row = 0              # rowid последнего прочитанного из базы ответа
+        self._refreshed_at = 0.0
+        self._questions = {}            # ключ -> (частота, время, последняя формулировка), если базы нет
+        self._askers = {}               # ключ -> {хэши пользователей}, если базы нет
+        self._faq = {question_key(question): question for question in faq_questions if question_key(question)}
+        self._popular = set()           # ключи вопросов, заданных min_users пользователями
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            # База общая для процессов-воркеров: WAL - чтение не ждёт записи другого
+            # процесса, а запись ждёт освобождения блокировки до DB_TIMEOUT секунд
+            self._db = sqlite3.connect(str(db_path), timeout=DB_TIMEOUT, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT, version TEXT, question TEXT, answer TEXT, created_at REAL, "
+                "PRIMARY KEY (key, version))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS questions ("
+                "key TEXT PRIMARY KEY, question TEXT, count INTEGER, last_asked REAL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS askers (key TEXT, user TEXT, PRIMARY KEY (key, user))"
+            )
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def set_version(self, version):
+        """
+        Переключиться на версию снимка: в памяти остаются только её ответы.
+
+        Args:
+            version: Версия снимка (ContextSnapshot.version)
+        """
+        rows = []
+        last_row = 0
+        if self._db is not None:
+            with self._lock:
+                last_row = self._db.execute("SELECT coalesce(max(rowid), 0) FROM answers").fetchone()[0]
+                rows = self._db.execute(
+                    "SELECT question, answer FROM answers WHERE version = ? AND rowid <= ? "
+                    "ORDER BY created_at DESC LIMIT ?",
+                    (version, last_row, self.max_entries)
+                ).fetchall()
+
+        with self._lock:
+            self.version = version
+            self._entries.clear()
+            self._terms.clear()
+            self._vocabulary = None
+            self._last_row = last_row
+            self._refreshed_at = time.monotonic()
+            for question, answer in reversed(rows):
+                self._remember(question, answer)
+            self._load_popular()
+
+    def _load_popular(self):
+        """Обновить множество частых вопросов из базы (под блокировкой)"""
+        if self._db is not None:
+            self._popular = {
+                key for key, in self._db.execute(
+                    "SELECT key FROM askers GROUP BY key HAVING count(*) >= ?", (self.min_users,)
+                )
+            }
+
+    def _refresh(self):
+        """Подгрузить ответы текущей версии и частые вопросы, записанные другими процессами (под блокировкой)"""
+        if self._db is None or time.monotonic() - self._refreshed_at < REFRESH_INTERVAL:
+            return
+        self._refreshed_at = time.monotonic()
+        self._load_popular()
+        # rowid растёт в порядке записи (INSERT OR REPLACE тоже выдаёт новый rowid)
+        rows = self._db.execute(
+            "SELECT rowid, version, question, answer FROM answers WHERE rowid > ? ORDER BY rowid",
+            (self._last_row,)
+        ).fetchall()
+        for row, version, question, answer in rows:
+            self._last_row = row
+            if version == self.version:
+                self._remember(question, answer)
+
+    def _remember(self, question, answer):
+        """Добавить ответ в память (под блокировкой)"""
+        key = question_key(question)
+        self._forget(key)
+        self._entries[key] = (question, answer)
+        for term in set(text_terms(question)):
+            self._terms.setdefault(term, set()).add(key)
+        self._vocabulary = None
+
+        while len(self._entries) > self.max_entries:
+            self._forget(next(iter(self._entries)))
+
+    def _forget(self, key):
+        """Убрать ответ из памяти (под блокировкой)"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for term in set(text_terms(entry[0])):
+            keys = self._terms.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._terms[term]
+        self._vocabulary = None
+
+    def get(self, question, version):
+        """
+        Ответ на вопрос для версии снимка.
+
+        Returns:
+            str: Ответ или None
+        """
+        with self._lock:
+            if version != self.version:
+                return None
+            if question_key(question) not in self._entries:
+                self._refresh()
+            entry = self._entries.get(question_key(question))
+            return entry[1] if entry else None
+
+    def put(self, question, answer, version):
+        """
+        Сохранить ответ на вопрос для версии снимка.
+
+        Ответы для версии, отличной от текущей (снимок успел смениться),
+        только записываются в базу.
+        """
+        with self._lock:
+            if version == self.version:
+                self._remember(question, answer)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers (key, version, question, answer, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (question_key(question), version, question, answer, time.time())
+                )
+                self._db.commit()
+
+    def missing(self, questions, version):
+        """
+        Вопросы, на которые для версии снимка ещё нет ответа (повторы убираются).
+
+        Args:
+            questions: Тексты вопросов
+            version: Версия снимка
+
+        Returns:
+            list: Вопросы без ответа, в исходном порядке
+        """
+        found = []
+        seen = set()
+        with self._lock:
+            for question in questions:
+                key = question_key(question)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                cached = version == self.version and key in self._entries
+                if not cached and self._db is not None:
+                    cached = self._db.execute(
+                        "SELECT 1 FROM answers WHERE key = ? AND version = ?", (key, version)
+                    ).fetchone() is not None
+                if not cached:
+                    found.append(question)
+        return found
+
+    def record_question(self, question, user_id):
+        """
+        Учесть самостоятельный вопрос в статистике частых вопросов.
+
+        Args:
+            question: Текст вопроса
+            user_id: ID задавшего пользователя (хранится только хэш)
+        """
+        key = question_key(question)
+        if not key:
+            return
+        user = user_hash(user_id)
+        with self._lock:
+            if self._db is None:
+                count = self._questions.get(key, (0,))[0]
+                self._questions[key] = (count + 1, time.time(), question.strip())
+                self._askers.setdefault(key, set()).add(user)
+                if len(self._askers[key]) >= self.min_users:
+                    self._popular.add(key)
+                return
+            self._db.execute(
+                "INSERT INTO questions (key, question, count, last_asked) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(key) DO UPDATE SET count = count + 1, "
+                "question = excluded.question, last_asked = excluded.last_asked",
+                (key, question.strip(), time.time())
+            )
+            self._db.execute("INSERT OR IGNORE INTO askers (key, user) VALUES (?, ?)", (key, user))
+            self._db.commit()
+
+    def top_questions(self, limit):
+        """
+        Самые частые вопросы, заданные хотя бы min_users разными пользователями.
+
+        Args:
+            limit: Максимум вопросов
+
+        Returns:
+            list: Тексты вопросов (последняя формулировка), частые первыми
+        """
+        if limit <= 0:
+            return []
+        with self._lock:
+            if self._db is None:
+                popular = sorted(
+                    (stats for key, stats in self._questions.items()
+                     if len(self._askers.get(key, ())) >= self.min_users),
+                    key=lambda stats: (-stats[0], -stats[1])
+                )
+                return [question for _, _, question in popular[:limit]]
+            return [
+                question for question, in self._db.execute(
+                    "SELECT question FROM questions WHERE key IN ("
+                    "SELECT key FROM askers GROUP BY key HAVING count(*) >= ?) "
+                    "ORDER BY count DESC, last_asked DESC LIMIT ?",
+                    (self.min_users, limit)
+                )
+            ]
+
+    def public_question(self, key):
+        """
+        Текст вопроса, который можно показать другим пользователям (под блокировкой).
+
+        Returns:
+            str: Вопрос FAQ, нормализованный частый вопрос или None - вопрос личный
+        """
+        if key in self._faq:
+            return self._faq[key]
+        if key in self._popular:
+            return key[:1].upper() + key[1:] + '?'
+        return None
+
+    def search(self, query, limit=5):
+        """
+        Ответы текущей версии на вопросы FAQ и частые вопросы, похожие на запрос.
+
+        Вопросы ранжируются по числу слов запроса, которые в них есть
+        (последнее слово - по префиксу), при равенстве - свежие первыми.
+        Личные вопросы (не FAQ и заданные меньше чем min_users
+        пользователями) не ищутся.
+
+        Args:
+            query: Текст запроса
+            limit: Максимум результатов
+
+        Returns:
+            list: [(вопрос для показа, ответ)]
+        """
+        terms = text_terms(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            self._refresh()
+            if self._vocabulary is None:
+                self._vocabulary = sorted(self._terms)
+            groups = [[term] for term in terms[:-1]]
+            groups.append(expand_prefix(self._vocabulary, terms[-1]) or [terms[-1]])
+
+            scores = Counter()
+            for group in groups:
+                for key in set().union(*(self._terms.get(term, ()) for term in group)):
+                    if self.public_question(key) is not None:
+                        scores[key] += 1
+            if not scores:
+                return []
+
+            order = {key: i for i, key in enumerate(self._entries)}
+            best = sorted(scores, key=lambda key: (-scores[key], -order[key]))[:limit]
+            return [(self.public_question(key), self._entries[key][1]) for key in best]
@@ -16,6 +16,14 @@ except ImportError:
     sys.exit(1)
 
 
+# Примеры вопросов из приветствия /start - их задают первыми
+DEFAULT_FAQ = (
+    'Кто является основным разработчиком?|'
+    'Что такое проект MyBox?|'
+    'Какие технологии используются?'
+)
+
+
 class BotConfig:
     """Конфигурация бота из .env файла"""
 
@@ -41,11 +49,77 @@ class BotConfig:
         self.model = os.getenv('HYDRA_MODEL', 'gpt-4o-mini')
         self.temperature = float(os.getenv('TEMPERATURE', '0.7'))
         self.max_tokens = int(os.getenv('MAX_TOKENS', '2000'))
+        # Простые справочные вопросы (question_router.py) - быстрой модели с меньшим бюджетом ответа.
+        # Выключено по умолчанию: без отдельной FAST_MODEL маршрутизация только урезает ответы
+        self.router_enabled = os.getenv('ROUTER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+        self.fast_model = os.getenv('FAST_MODEL') or self.model
+        self.fast_max_tokens = int(os.getenv('FAST_MAX_TOKENS', '800'))
+        # Сжимать тело запроса к API gzip (только если API принимает Content-Encoding: gzip)
+        self.api_gzip = os.getenv('API_GZIP', 'false').lower() in ('1', 'true', 'yes')
+        # Бюджет токенов на весь запрос (prompt + контекст + вопрос), 0 - без ограничения
+        self.max_input_tokens = int(os.getenv('MAX_INPUT_TOKENS', '100000'))
 
         # Пути (относительно директории запуска)
         self.result_dir = Path(os.getenv('RESULT_DIR', '../result'))
         self.system_prompt_file = Path(os.getenv('SYSTEM_PROMPT_FILE', 'config/system_prompt.txt'))
 
+        # Векторный индекс исходных сообщений чата (utils/chat_vectors.py); нет папки - не используется
+        self.chat_vectors_dir = Path(os.getenv('CHAT_VECTORS_DIR', '../data/chat_vectors'))
+        # Сколько найденных окон сообщений добавлять к вопросу (0 - не искать)
+        self.chat_vectors_top_k = int(os.getenv('CHAT_VECTORS_TOP_K', '4'))
+
+        # Команды без обращения к API: полнотекстовый индекс (utils/chat_index.py)
+        # и статистика участников (utils/participant_stats.py --json)
+        self.chat_index_db = Path(os.getenv('CHAT_INDEX_DB', '../data/chat_index.db'))
+        self.participant_stats_file = Path(os.getenv('PARTICIPANT_STATS_FILE', '../data/participant_stats.json'))
+
+        # Артефакт снимка контекста (snapshot_artifact.py); если файла нет - читается result/
+        self.snapshot_file = Path(os.getenv('SNAPSHOT_FILE', 'context.snapshot'))
+
+        # История диалога: последние пары вопрос-ответ, бюджет токенов, число чатов в памяти
+        self.history_turns = int(os.getenv('HISTORY_TURNS', '6'))
+        self.history_max_tokens = int(os.getenv('HISTORY_MAX_TOKENS', '3000'))
+        self.history_max_chats = int(os.getenv('HISTORY_MAX_CHATS', '1000'))
+        # База SQLite для истории диалогов (пусто - только в памяти)
+        self.conversation_db = os.getenv('CONVERSATION_DB', 'conversations.db')
+        # База SQLite кэша ответов на вопросы без истории (пусто - только в памяти)
+        self.answer_cache_db = os.getenv('ANSWER_CACHE_DB', 'answers.db')
+        # Ответы, готовые заранее (при старте и перезагрузке контекста): вопросы через "|",
+        # сколько самых частых вопросов пользователей добавить и сколько запросов одновременно (0 - выкл.)
+        self.faq_questions = [
+            question.strip() for question in os.getenv('FAQ_QUESTIONS', DEFAULT_FAQ).split('|') if question.strip()
+        ]
+        self.prewarm_top_n = int(os.getenv('PREWARM_TOP_N', '20'))
+        # Сколько разных пользователей должны задать вопрос, чтобы он стал частым:
+        # ответ на него готовится заранее и показывается в inline-режиме
+        self.popular_min_users = int(os.getenv('POPULAR_MIN_USERS', '3'))
+        self.prewarm_concurrency = int(os.getenv('PREWARM_CONCURRENCY', '2'))
+
+        # Режим получения обновлений: polling или webhook
+        self.bot_mode = os.getenv('BOT_MODE', 'polling').lower()
+        # Webhook: публичный URL (через reverse proxy) и локальный адрес сервера
+        self.webhook_url = os.getenv('WEBHOOK_URL', '')
+        self.webhook_listen = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+        self.webhook_port = int(os.getenv('WEBHOOK_PORT', '8443'))
+        self.webhook_path = os.getenv('WEBHOOK_PATH', 'telegram')
+        self.webhook_secret = os.getenv('WEBHOOK_SECRET') or None
+        # Многопроцессный режим: число воркеров (0 - один процесс) и параллельных обновлений в воркере
+        self.bot_workers = int(os.getenv('BOT_WORKERS', '0'))
+        self.worker_concurrency = int(os.getenv('WORKER_CONCURRENCY', '8'))
+        # Адрес Bot API (по умолчанию api.telegram.org; для локального Bot API или нагрузочного теста)
+        self.telegram_api_url = os.getenv('TELEGRAM_API_URL', '')
+        # Лимит исходящих сообщений в секунду на бота (делится между воркерами)
+        self.outbound_rate = float(os.getenv('OUTBOUND_RATE', '30'))
+
+        # Пул потоков для блокирующих шагов обработки и период замера задержки event loop (0 - выкл.)
+        self.executor_workers = int(os.getenv('EXECUTOR_WORKERS', '16'))
+        # Отдельный пул для запросов к API: одновременных запросов не больше стольких
+        self.api_workers = int(os.getenv('API_WORKERS', '64'))
+        self.loop_lag_interval = float(os.getenv('LOOP_LAG_INTERVAL', '0.5'))
+
+        # Интервал проверки изменений контекста в секундах (0 - без горячей перезагрузки)
+        self.reload_interval = float(os.getenv('RELOAD_INTERVAL', '5'))
+
         # Валидация
         self._validate()
 
@@ -62,12 +136,18 @@ class BotConfig:
         if not self.api_url:
             errors.append("API_URL не найден в .env")
 
-        if not self.result_dir.exists():
+        if not self.result_dir.exists() and not self.snapshot_file.exists():
             errors.append(f"Директория с контекстом не найдена: {self.result_dir}")
 
         if not self.system_prompt_file.exists():
             errors.append(f"Файл system prompt не найден: {self.system_prompt_file}")
 
+        if self.bot_mode not in ('polling', 'webhook'):
+            errors.append(f"Неизвестный BOT_MODE: {self.bot_mode} (ожидается polling или webhook)")
+
+        if self.bot_mode == 'webhook' and not self.webhook_url:
+            errors.append("WEBHOOK_URL не найден в .env (обязателен при BOT_MODE=webhook)")
+
         if errors:
             print("[ERROR] Ошибки конфигурации:")
             for error in errors:
@@ -91,7 +171,17 @@ class BotConfig:
             f"  model={self.model},\n"
             f"  temperature={self.temperature},\n"
             f"  max_tokens={self.max_tokens},\n"
+            f"  router_enabled={self.router_enabled},\n"
+            f"  fast_model={self.fast_model},\n"
+            f"  fast_max_tokens={self.fast_max_tokens},\n"
+            f"  bot_mode={self.bot_mode},\n"
+            f"  bot_workers={self.bot_workers},\n"
+            f"  max_input_tokens={self.max_input_tokens},\n"
+            f"  history_turns={self.history_turns},\n"
+            f"  history_max_tokens={self.history_max_tokens},\n"
             f"  result_dir={self.result_dir},\n"
-            f"  system_prompt_file={self.system_prompt_file}\n"
+            f"  system_prompt_file={self.system_prompt_file},\n"
+            f"  snapshot_file={self.snapshot_file},\n"
+            f"  reload_interval={self.reload_interval}\n"
             f")"
         )
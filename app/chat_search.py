@@ -0,0 +1,243 @@
+"""
+Поиск по исходным сообщениям чата (векторный индекс).
+
+Второй источник знаний бота, кроме result/*.md: окна исходных сообщений
+с транскрипциями голосовых, проиндексированные utils/chat_vectors.py.
+По каждому вопросу находятся несколько ближайших окон, и они добавляются
+в запрос как цитаты с ID сообщений.
+
+Матрица эмбеддингов int8 читается через mmap (общая для процессов-воркеров
+страничным кэшем ОС). Поиск приближённый (IVF): вопрос сравнивается
+с центроидами, затем только со строками NPROBE ближайших списков.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько ближайших списков IVF просматривать и минимальное косинусное сходство окна
+NPROBE = 16
+MIN_SCORE = 0.3
+
+# Длина соседних сообщений окна в запросе (само найденное сообщение - целиком)
+NEIGHBOUR_CHARS = 300
+
+
+class ChatVectorIndex:
+    """Векторный индекс окон сообщений (формат - см. utils/chat_vectors.py)"""
+
+    def __init__(self, path, embed=None):
+        """
+        Открыть индекс.
+
+        Args:
+            path: Папка индекса
+            embed: Функция эмбеддингов texts -> np.ndarray (по умолчанию - модель из meta.json)
+        """
+        self.path = Path(path)
+        self.meta = json.loads((self.path / 'meta.json').read_text(encoding='utf-8'))
+        self.vectors = np.load(self.path / 'vectors.npy', mmap_mode='r')
+        self.scales = np.load(self.path / 'scales.npy')
+        self.centroids = np.load(self.path / 'centroids.npy')
+        self.offsets = np.load(self.path / 'offsets.npy')
+        self._db_uri = f"file:{self.path / 'windows.db'}?mode=ro"
+        self._embed = embed or load_embedder(self.meta['model'])
+
+    def __len__(self):
+        return self.meta['count']
+
+    def search_vector(self, query, k=5, nprobe=NPROBE):
+        """
+        Ближайшие строки к нормированному вектору запроса.
+
+        Args:
+            query: np.ndarray float32 (dim,)
+            k: Количество результатов
+            nprobe: Сколько ближайших списков IVF просматривать
+
+        Returns:
+            list: [(номер строки, косинусное сходство)], по убыванию сходства
+        """
+        nprobe = min(nprobe, len(self.centroids))
+        probe = np.argpartition(self.centroids @ query, -nprobe)[-nprobe:]
+
+        rows = []
+        scores = []
+        for j in probe:
+            start, end = self.offsets[j], self.offsets[j + 1]
+            if start == end:
+                continue
+            rows.append(np.arange(start, end))
+            scores.append((self.vectors[start:end] @ query) * self.scales[start:end])
+        if not rows:
+            return []
+
+        rows = np.concatenate(rows)
+        scores = np.concatenate(scores)
+        if len(scores) > k:
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def search(self, question, k=5, min_score=MIN_SCORE):
+        """
+        Найти окна сообщений, близкие к вопросу.
+
+        Args:
+            question: Текст вопроса
+            k: Максимум результатов
+            min_score: Минимальное косинусное сходство
+
+        Returns:
+            list: [{'message_id', 'date', 'author', 'text', 'score'}]
+        """
+        query = self._embed([question])[0]
+        found = [(row, score) for row, score in self.search_vector(query, k) if score >= min_score]
+        if not found:
+            return []
+
+        db = sqlite3.connect(self._db_uri, uri=True)
+        try:
+            windows = {
+                row: (message_id, json.loads(members)) for row, message_id, members in db.execute(
+                    f"SELECT row, message_id, message_ids FROM windows "
+                    f"WHERE row IN ({','.join('?' * len(found))})",
+                    [row for row, _ in found]
+                )
+            }
+            ids = sorted({i for _, members in windows.values() for i in members})
+            messages = {
+                message_id: rest for message_id, *rest in db.execute(
+                    f"SELECT id, date, author, line FROM messages WHERE id IN ({','.join('?' * len(ids))})",
+                    ids
+                )
+            }
+        finally:
+            db.close()
+
+        hits = []
+        for row, score in found:
+            if row not in windows:
+                continue
+            message_id, members = windows[row]
+            date, author, _ = messages[message_id]
+            # Найденное сообщение - целиком, соседние - с обрезкой
+            lines = [
+                messages[i][2] if i == message_id else _shorten(messages[i][2], NEIGHBOUR_CHARS)
+                for i in members if i in messages
+            ]
+            hits.append({
+                'message_id': message_id, 'date': date, 'author': author,
+                'text': '\n'.join(lines), 'score': round(score, 3)
+            })
+        return hits
+
+
+def _shorten(text, limit):
+    """Обрезать строку до limit символов"""
+    return text if len(text) <= limit else text[:limit].rstrip() + '…'
+
+
+def load_embedder(model_name):
+    """
+    Функция эмбеддингов вопроса той же моделью, что и индекс.
+
+    Raises:
+        ImportError: Если не установлен sentence-transformers
+    """
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device='cpu')
+    lock = threading.Lock()
+
+    def embed(texts):
+        with lock:
+            return model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+    return embed
+
+
+def open_index(path):
+    """
+    Открыть индекс, если он построен и доступна модель эмбеддингов.
+
+    Returns:
+        ChatVectorIndex или None
+    """
+    path = Path(path)
+    if not (path / 'meta.json').exists():
+        return None
+    if np is None:
+        logger.warning("Индекс сообщений не используется: pip install numpy sentence-transformers")
+        return None
+    try:
+        return ChatVectorIndex(path)
+    except ImportError:
+        logger.warning("Индекс сообщений не используется: pip install sentence-transformers")
+        return None
+
+
+def format_hits(hits):
+    """
+    Текст найденных окон для запроса к API.
+
+    Args:
+        hits: Результаты ChatVectorIndex.search
+
+    Returns:
+        str: Окна, разделённые пустой строкой
+    """
+    return '\n\n'.join(
+        f"Сообщение #{hit['message_id']} ({(hit['date'] or '')[:10]}, {hit['author']}):\n{hit['text']}"
+        for hit in hits
+    )
+
+
+if __name__ == '__main__':
+    # Замер скорости поиска: python chat_search.py <папка_индекса> [вопрос]
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print(f"Использование: python {sys.argv[0]} <папка_индекса> [вопрос]")
+        sys.exit(1)
+
+    index = ChatVectorIndex(sys.argv[1], embed=None if len(sys.argv) > 2 else (lambda texts: None))
+    print(f"Окон: {len(index)}, списков: {len(index.centroids)}, размерность: {index.meta['dim']}")
+
+    # Запросы - зашумлённые строки самого индекса
+    rng = np.random.default_rng(0)
+    sample = np.sort(rng.choice(len(index), 200))
+    queries = index.vectors[sample].astype(np.float32) * index.scales[sample, None]
+    queries += rng.normal(0, 0.02, queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    timings = []
+    hits = 0
+    for row, query in zip(sample, queries):
+        started = time.perf_counter()
+        result = index.search_vector(query, k=5)
+        timings.append(time.perf_counter() - started)
+        hits += any(found == row for found, _ in result)
+    timings.sort()
+    print(f"search_vector: p50 {timings[len(timings) // 2] * 1000:.2f} мс, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} мс, "
+          f"исходная строка в топ-5: {hits / len(timings):.0%}")
+
+    if len(sys.argv) > 2:
+        started = time.perf_counter()
+        hits = index.search(sys.argv[2])
+        print(f"\nПоиск с эмбеддингом вопроса: {(time.perf_counter() - started) * 1000:.1f} мс")
+        print(format_hits(hits))
@@ -1,13 +1,80 @@
 """
 Модуль загрузки контекста из markdown файлов.
 
-Загружает все файлы анализа из директории result/ в единую строку.
+Загружает все файлы анализа из директории result/ в единую строку
+и собирает из неё снимок контекста (ContextSnapshot) для бота.
 """
 
+import hashlib
+import json
+import logging
+import mmap
 import sys
+import time
 from pathlib import Path
 
 
+logger = logging.getLogger(__name__)
+
+# Список файлов в правильном порядке
+CONTEXT_FILES = [
+    '01-methodology.md',
+    '02-chat_participants.md',
+    '03-projects.md',
+    '04-vision_evolution.md',
+    '05-positions_by_participant.md',
+    '06-positions_evolution.md',
+    '07-positions_matrix.md'
+]
+
+# Построители производных индексов снимка: {имя: (функция(snapshot) -> индекс, persist, is_current)}
+INDEX_BUILDERS = {}
+
+# Формат артефакта снимка: MAGIC | длина заголовка (8 байт, little-endian) | JSON |
+# контекст в виде тела JSON-строки (encode_json_text)
+SNAPSHOT_MAGIC = b'MAYACTX\x00'
+SNAPSHOT_FORMAT_VERSION = 3
+
+
+def encode_json_text(text):
+    """
+    Закодировать текст как тело JSON-строки: UTF-8 без кавычек, не-ASCII не экранируется.
+
+    Экранирование посимвольное, поэтому кодирование частей текста,
+    склеенное вместе, равно кодированию всего текста.
+
+    Args:
+        text: Текст
+
+    Returns:
+        bytes: Тело JSON-строки
+    """
+    return json.dumps(text, ensure_ascii=False)[1:-1].encode('utf-8')
+
+
+class EncodedText:
+    """
+    Текст, хранящийся как тело JSON-строки (encode_json_text) из нескольких частей.
+
+    Части - bytes или memoryview, в том числе срезы артефакта снимка,
+    отображённого в память: тело запроса к API собирается из них
+    (hydra_client.encode_payload) без декодирования текста.
+    """
+
+    __slots__ = ('parts',)
+
+    def __init__(self, parts):
+        """
+        Args:
+            parts: Части тела JSON-строки (bytes или memoryview)
+        """
+        self.parts = tuple(parts)
+
+    def __str__(self):
+        """Декодированный текст"""
+        return json.loads(b''.join([b'"', *self.parts, b'"']))
+
+
 def load_all_context(result_dir='result'):
     """
     Загрузить все markdown файлы из директории result/ в единую строку.
@@ -22,17 +89,6 @@ def load_all_context(result_dir='result'):
         FileNotFoundError: Если какой-либо файл не найден
         Exception: При ошибках чтения файлов
     """
-    # Список файлов в правильном порядке
-    context_files = [
-        '01-methodology.md',
-        '02-chat_participants.md',
-        '03-projects.md',
-        '04-vision_evolution.md',
-        '05-positions_by_participant.md',
-        '06-positions_evolution.md',
-        '07-positions_matrix.md'
-    ]
-
     result_path = Path(result_dir)
 
     if not result_path.exists():
@@ -40,7 +96,7 @@ def load_all_context(result_dir='result'):
 
     context_parts = []
 
-    for filename in context_files:
+    for filename in CONTEXT_FILES:
         filepath = result_path / filename
 
         if not filepath.exists():
@@ -76,6 +132,304 @@ def get_context_stats(context):
     }
 
 
+def load_system_prompt(system_prompt_file):
+    """
+    Загрузить system prompt из файла.
+
+    Args:
+        system_prompt_file: Путь к файлу system prompt
+
+    Returns:
+        str: Текст system prompt
+
+    Raises:
+        FileNotFoundError: Если файл не найден
+    """
+    with open(system_prompt_file, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def split_context_chunks(context):
+    """
+    Разбить контекст на фрагменты: по файлам и по заголовкам второго уровня.
+
+    Args:
+        context: Строка с контекстом (результат load_all_context)
+
+    Returns:
+        list: Фрагменты в порядке следования, каждый - словарь
+              {'file', 'title', 'start', 'end'} со смещениями в байтах
+              контекста, закодированного encode_json_text
+    """
+    chunks = []
+    current = None
+    current_file = ''
+    offset = 0
+
+    for line in context.splitlines(keepends=True):
+        title = None
+
+        if line.startswith('# Файл: '):
+            current_file = line[len('# Файл: '):].strip()
+            title = current_file
+        elif line.startswith('## '):
+            title = line[3:].strip()
+
+        if title is not None:
+            if current is not None:
+                current['end'] = offset
+                chunks.append(current)
+            current = {'file': current_file, 'title': title, 'start': offset}
+        elif current is None:
+            current = {'file': current_file, 'title': '', 'start': offset}
+
+        offset += len(encode_json_text(line))
+
+    if current is not None:
+        current['end'] = offset
+        chunks.append(current)
+
+    return chunks
+
+
+def register_index_builder(name, builder, persist=False, is_current=None):
+    """
+    Зарегистрировать построитель производного индекса снимка.
+
+    Индексы строятся при каждой загрузке снимка (при старте и при
+    горячей перезагрузке) и доступны как snapshot.indexes[name].
+
+    Args:
+        name: Имя индекса
+        builder: Функция builder(snapshot), возвращающая индекс
+        persist: Сохранять индекс в артефакт снимка (индекс должен
+                 сериализоваться в JSON и зависеть только от контекста)
+        is_current: Функция is_current(индекс) -> bool: можно ли использовать
+                    индекс из артефакта (например, посчитан тем же токенизатором);
+                    устаревший индекс строится заново
+    """
+    INDEX_BUILDERS[name] = (builder, persist, is_current)
+
+
+class ContextSnapshot:
+    """Снимок system prompt и контекста, с которым работает бот"""
+
+    def __init__(self, system_prompt, context=None, chunks=None, stats=None,
+                 context_hash=None, indexes=None, context_json=None, source='result/'):
+        """
+        Создать снимок и построить производные индексы.
+
+        Контекст хранится только в виде тела JSON-строки (context_json):
+        из артефакта это memoryview на отображённый в память файл, и
+        процесс не держит декодированную копию текста. Необязательные
+        аргументы передаются при загрузке из артефакта (snapshot_artifact.py),
+        чтобы не вычислять их заново.
+
+        Args:
+            system_prompt: Текст system prompt
+            context: Объединенный контекст из result/ (если нет context_json)
+            chunks: Таблица фрагментов (split_context_chunks)
+            stats: Статистика контекста (get_context_stats)
+            context_hash: SHA-256 контекста
+            indexes: Готовые производные индексы {имя: индекс}
+            context_json: Контекст, закодированный encode_json_text (bytes или memoryview)
+            source: Откуда загружен контекст (для логов)
+        """
+        self.system_prompt = system_prompt
+        self.source = source
+        self.context_json = context_json if context_json is not None else encode_json_text(context)
+        self.encoded_context = EncodedText([self.context_json])
+        self.chunks = chunks if chunks is not None else split_context_chunks(context)
+        self.stats = stats if stats is not None else get_context_stats(context)
+        self.context_hash = context_hash or hashlib.sha256(context.encode('utf-8')).hexdigest()
+        self.loaded_at = time.time()
+
+        # Версия - хэш содержимого, одинаковая для одинаковых данных
+        digest = hashlib.sha256(system_prompt.encode('utf-8'))
+        digest.update(self.context_hash.encode('ascii'))
+        self.version = digest.hexdigest()[:12]
+
+        # Результаты вычислений по снимку (например, выбор фрагментов под бюджет):
+        # живут, пока жив снимок, и не удерживают старые снимки после перезагрузки
+        self.memo = {}
+
+        self.indexes = dict(indexes or {})
+        for name, (builder, persist, is_current) in INDEX_BUILDERS.items():
+            if name not in self.indexes or (is_current and not is_current(self.indexes[name])):
+                self.indexes[name] = builder(self)
+
+    @property
+    def context(self):
+        """Весь контекст одной строкой (декодируется при каждом обращении)"""
+        return str(self.encoded_context)
+
+    def chunk_json(self, index):
+        """Фрагмент контекста в виде тела JSON-строки (срез без копирования)"""
+        chunk = self.chunks[index]
+        return memoryview(self.context_json)[chunk['start']:chunk['end']]
+
+    def chunk_text(self, index):
+        """Текст фрагмента контекста"""
+        return str(EncodedText([self.chunk_json(index)]))
+
+    def __repr__(self):
+        """Строковое представление снимка"""
+        return f"ContextSnapshot(version={self.version}, chars={self.stats['chars']})"
+
+
+def read_snapshot_artifact(snapshot_file):
+    """
+    Прочитать артефакт снимка, собранный snapshot_artifact.py.
+
+    Файл отображается в память: заголовок (JSON) разбирается сразу, а
+    контекст не копируется и не декодируется - возвращается memoryview на
+    отображённые страницы. Процессы, открывшие один артефакт, разделяют эти
+    страницы через page cache ОС; отображение живёт, пока жив memoryview.
+
+    Args:
+        snapshot_file: Путь к файлу артефакта
+
+    Returns:
+        dict: Заголовок артефакта с добавленным ключом 'context_json'
+
+    Raises:
+        ValueError: Если файл не является артефактом снимка
+    """
+    with open(snapshot_file, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        if mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"Неверный формат артефакта снимка: {snapshot_file}")
+
+        header_start = len(SNAPSHOT_MAGIC) + 8
+        header_length = int.from_bytes(mm[len(SNAPSHOT_MAGIC):header_start], 'little')
+        header = json.loads(mm[header_start:header_start + header_length])
+
+        if header.get('format') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия артефакта снимка: {header.get('format')}")
+    except Exception:
+        mm.close()
+        raise
+
+    context_start = header_start + header_length
+    header['context_json'] = memoryview(mm)[context_start:context_start + header['context_length']]
+    return header
+
+
+def get_source_hashes(result_dir):
+    """
+    SHA-256 файлов контекста (сохраняются в артефакт снимка).
+
+    Args:
+        result_dir: Путь к директории с файлами контекста
+
+    Returns:
+        dict: {имя файла: хэш}
+    """
+    result_path = Path(result_dir)
+    return {
+        filename: hashlib.sha256((result_path / filename).read_bytes()).hexdigest()
+        for filename in CONTEXT_FILES
+    }
+
+
+def is_artifact_current(artifact, snapshot_file, result_dir):
+    """
+    Соответствует ли артефакт снимка файлам result/.
+
+    Артефакт используется, только если он новее всех файлов контекста и
+    сохранённые в нём хэши файлов совпадают с текущими: иначе правка
+    result/ игнорировалась бы, пока снимок не пересобран. Если файлов
+    result/ нет (на сервер скопирован только снимок, см. utils/deploy.py),
+    артефакт - единственный источник и считается актуальным.
+
+    Args:
+        artifact: Заголовок артефакта (read_snapshot_artifact)
+        snapshot_file: Путь к файлу артефакта
+        result_dir: Путь к директории с файлами контекста
+
+    Returns:
+        bool: True, если артефакт можно использовать
+    """
+    sources = [Path(result_dir) / filename for filename in CONTEXT_FILES]
+    if not all(path.exists() for path in sources):
+        return True
+    if Path(snapshot_file).stat().st_mtime_ns < max(path.stat().st_mtime_ns for path in sources):
+        return False
+    return artifact.get('sources') == get_source_hashes(result_dir)
+
+
+def load_snapshot(result_dir, system_prompt_file, snapshot_file=None):
+    """
+    Загрузить system prompt и контекст в новый снимок.
+
+    Если артефакт снимка существует и соответствует файлам result/
+    (is_artifact_current), контекст берётся из него, иначе собирается
+    из файлов result/.
+
+    Args:
+        result_dir: Путь к директории с файлами контекста
+        system_prompt_file: Путь к файлу system prompt
+        snapshot_file: Путь к артефакту снимка (опционально)
+
+    Returns:
+        ContextSnapshot: Новый снимок
+    """
+    system_prompt = load_system_prompt(system_prompt_file)
+
+    artifact = None
+    if snapshot_file and Path(snapshot_file).exists():
+        try:
+            artifact = read_snapshot_artifact(snapshot_file)
+        except ValueError:
+            # Артефакт старого формата: без файлов result/ загружать нечего
+            if not Path(result_dir).exists():
+                raise
+        if artifact is not None and not is_artifact_current(artifact, snapshot_file, result_dir):
+            logger.warning(
+                f"Снимок {snapshot_file} не соответствует файлам {result_dir} (собран из других "
+                f"версий файлов или старше их): контекст собирается из {result_dir}"
+            )
+            artifact = None
+
+    if artifact is not None:
+        snapshot = ContextSnapshot(
+            system_prompt,
+            chunks=artifact['chunks'],
+            stats=artifact['stats'],
+            context_hash=artifact['context_hash'],
+            indexes=artifact['indexes'],
+            context_json=artifact['context_json'],
+            source=f"снимок {snapshot_file} (собран {artifact.get('built_at', '?')})"
+        )
+    else:
+        context = load_all_context(str(result_dir))
+        snapshot = ContextSnapshot(system_prompt, context, source=f"файлы {result_dir}")
+
+    logger.info(f"Контекст загружен: {snapshot.source}, версия {snapshot.version}")
+    return snapshot
+
+
+def get_source_files(result_dir, system_prompt_file, snapshot_file=None):
+    """
+    Получить список файлов, из которых собирается снимок.
+
+    Args:
+        result_dir: Путь к директории с файлами контекста
+        system_prompt_file: Путь к файлу system prompt
+        snapshot_file: Путь к артефакту снимка (опционально)
+
+    Returns:
+        list: Пути к файлам
+    """
+    result_path = Path(result_dir)
+    files = [Path(system_prompt_file)] + [result_path / filename for filename in CONTEXT_FILES]
+    if snapshot_file:
+        files.append(Path(snapshot_file))
+    return files
+
+
 if __name__ == '__main__':
     """Тест загрузки контекста"""
     try:
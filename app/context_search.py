@@ -0,0 +1,136 @@
+"""
+Быстрый поиск по фрагментам контекста снимка (без модели).
+
+Для каждого снимка строится инвертированный индекс chunk_terms: основа
+слова -> [(фрагмент, число вхождений)]. Фрагменты ранжируются по BM25,
+последнее слово запроса ищется как префикс (в inline-режиме запрос
+приходит по мере набора). Поиск по контексту result/ занимает доли
+миллисекунды и используется там, где ждать модель нельзя.
+"""
+
+import math
+import re
+from bisect import bisect_left
+from collections import Counter
+
+from context_loader import register_index_builder
+from text_normalize import STEMMER, stem
+
+
+TERM_RE = re.compile(r'\w+')
+
+# Параметры BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def text_terms(text):
+    """Основы слов текста (однобуквенные слова пропускаются)"""
+    return [stem(word) for word in TERM_RE.findall(text) if len(word) > 1]
+
+
+def build_chunk_terms(snapshot):
+    """
+    Построить индекс chunk_terms: основы слов фрагментов снимка.
+
+    Args:
+        snapshot: ContextSnapshot
+
+    Returns:
+        dict: {'terms': {основа: [[фрагмент, вхождений], ...]}, 'lengths': [слов во фрагменте, ...],
+               'stemmer': способ выделения основы}
+    """
+    terms = {}
+    lengths = []
+    for i in range(len(snapshot.chunks)):
+        counts = Counter(text_terms(snapshot.chunk_text(i)))
+        lengths.append(sum(counts.values()))
+        for term, count in counts.items():
+            terms.setdefault(term, []).append([i, count])
+    return {'terms': terms, 'lengths': lengths, 'stemmer': STEMMER}
+
+
+# Основы из артефакта, выделенные другим способом (например, без snowballstemmer), пересчитываются
+register_index_builder(
+    'chunk_terms', build_chunk_terms, persist=True,
+    is_current=lambda index: index.get('stemmer') == STEMMER
+)
+
+
+def build_chunk_vocabulary(snapshot):
+    """Отсортированные основы снимка (для поиска по префиксу)"""
+    return sorted(snapshot.indexes['chunk_terms']['terms'])
+
+
+# Строится после chunk_terms при создании снимка; не сохраняется - сортировка дешевле чтения
+register_index_builder('chunk_vocabulary', build_chunk_vocabulary)
+
+
+def expand_prefix(vocabulary, prefix, limit=20):
+    """Основы из отсортированного списка, начинающиеся с prefix"""
+    found = []
+    i = bisect_left(vocabulary, prefix)
+    while i < len(vocabulary) and vocabulary[i].startswith(prefix) and len(found) < limit:
+        found.append(vocabulary[i])
+        i += 1
+    return found
+
+
+def search_chunks(snapshot, query, k=5):
+    """
+    Найти фрагменты контекста, лучше всего подходящие к запросу.
+
+    Args:
+        snapshot: ContextSnapshot
+        query: Текст запроса
+        k: Максимум результатов
+
+    Returns:
+        list: [(номер фрагмента, оценка)], лучшие первыми
+    """
+    index = snapshot.indexes['chunk_terms']
+    terms = text_terms(query)
+    if not terms:
+        return []
+
+    # Последнее слово может быть недописано: берутся все основы с таким началом
+    groups = [[term] for term in terms[:-1]]
+    groups.append(expand_prefix(snapshot.indexes['chunk_vocabulary'], terms[-1]) or [terms[-1]])
+
+    lengths = index['lengths']
+    average = sum(lengths) / max(1, len(lengths))
+    scores = Counter()
+    for group in groups:
+        # Вхождения вариантов одного слова считаются вместе
+        frequencies = Counter()
+        for term in group:
+            for chunk, count in index['terms'].get(term, ()):
+                frequencies[chunk] += count
+        if not frequencies:
+            continue
+        idf = math.log(1 + (len(lengths) - len(frequencies) + 0.5) / (len(frequencies) + 0.5))
+        for chunk, frequency in frequencies.items():
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[chunk] / max(1, average))
+            scores[chunk] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+    return [(chunk, round(score, 3)) for chunk, score in scores.most_common(k)]
+
+
+def chunk_snippet(snapshot, chunk_index, query, length=300):
+    """
+    Отрывок фрагмента вокруг первого найденного слова запроса.
+
+    Returns:
+        str: Отрывок в одну строку
+    """
+    text = snapshot.chunk_text(chunk_index)
+    lowered = text.lower().replace('ё', 'е')
+
+    position = -1
+    for term in text_terms(query):
+        position = lowered.find(term)
+        if position >= 0:
+            break
+    start = max(0, position - length // 3) if position >= 0 else 0
+    snippet = ' '.join(text[start:start + length].split())
+    return ('…' if start else '') + snippet + ('…' if start + length < len(text) else '')
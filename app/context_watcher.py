@@ -0,0 +1,120 @@
+"""
+Горячая перезагрузка контекста и system prompt.
+
+Следит за файлами из result/, артефактом снимка и system_prompt.txt
+(опрос mtime) и при их изменении собирает новый снимок контекста,
+не останавливая бота.
+"""
+
+import asyncio
+import logging
+
+from context_loader import get_source_files, load_snapshot
+from offload import run_blocking
+
+
+logger = logging.getLogger(__name__)
+
+
+class ContextWatcher:
+    """Наблюдатель за файлами контекста с атомарной подменой снимка"""
+
+    def __init__(self, result_dir, system_prompt_file, snapshot, on_reload=None, snapshot_file=None):
+        """
+        Инициализация наблюдателя.
+
+        Args:
+            result_dir: Путь к директории с файлами контекста
+            system_prompt_file: Путь к файлу system prompt
+            snapshot: Текущий (уже загруженный) снимок
+            on_reload: Функция on_reload(snapshot), вызываемая после подмены
+            snapshot_file: Путь к артефакту снимка (опционально)
+        """
+        self.result_dir = result_dir
+        self.system_prompt_file = system_prompt_file
+        self.snapshot_file = snapshot_file
+        self.snapshot = snapshot
+        self.on_reload = on_reload
+
+        self._fingerprint = self.fingerprint()
+
+    def fingerprint(self):
+        """
+        Получить отпечаток файлов контекста (mtime и размер каждого файла).
+
+        Returns:
+            tuple: Отпечаток; отсутствующие файлы отмечаются как None
+        """
+        result = []
+        for path in get_source_files(self.result_dir, self.system_prompt_file, self.snapshot_file):
+            try:
+                stat = path.stat()
+                result.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                result.append(None)
+        return tuple(result)
+
+    async def reload(self):
+        """
+        Собрать новый снимок и подменить текущий.
+
+        Сборка выполняется в отдельном потоке, чтобы не блокировать
+        обработку сообщений. При ошибке остаётся прежний снимок.
+
+        Returns:
+            bool: True, если снимок подменён
+        """
+        try:
+            snapshot = await run_blocking(
+                load_snapshot, self.result_dir, self.system_prompt_file, self.snapshot_file
+            )
+        except Exception as e:
+            logger.error(f"Ошибка перезагрузки контекста, остаётся версия {self.snapshot.version}: {e}")
+            return False
+
+        if snapshot.version == self.snapshot.version:
+            return False
+
+        previous = self.snapshot
+        self.snapshot = snapshot
+
+        logger.info(
+            f"Контекст перезагружен: версия {previous.version} -> {snapshot.version} "
+            f"({snapshot.stats['chars']:,} символов, {snapshot.source})"
+        )
+
+        if self.on_reload:
+            self.on_reload(snapshot)
+
+        return True
+
+    async def run(self, interval):
+        """
+        Опрашивать файлы контекста и перезагружать снимок при изменениях.
+
+        Перезагрузка выполняется, только когда отпечаток не менялся между
+        двумя опросами подряд, чтобы не прочитать файл в процессе записи.
+
+        Args:
+            interval: Интервал опроса в секундах
+        """
+        logger.info(f"Наблюдение за контекстом каждые {interval} с (версия {self.snapshot.version})")
+        pending = None
+
+        while True:
+            await asyncio.sleep(interval)
+
+            current = await run_blocking(self.fingerprint)
+
+            if current == self._fingerprint:
+                pending = None
+                continue
+
+            if current != pending:
+                # Файлы ещё могут записываться - ждём следующего опроса
+                pending = current
+                continue
+
+            await self.reload()
+            self._fingerprint = current
+            pending = None
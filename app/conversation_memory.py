@@ -0,0 +1,285 @@
+"""
+История диалога для Telegram-бота.
+
+Для каждого чата хранится ограниченное число последних пар
+вопрос-ответ и краткое содержание более старой части диалога.
+Состояние чатов вытесняется из памяти по LRU и сохраняется в SQLite.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+from token_counter import TOKENS_PER_MESSAGE, count_tokens
+
+
+# Prompt для сворачивания старых реплик в краткое содержание
+SUMMARY_PROMPT = (
+    "Ты ведёшь краткое содержание диалога пользователя с ассистентом. "
+    "Обнови краткое содержание, добавив в него новые реплики. "
+    "Сохрани темы, имена, проекты и незакрытые вопросы пользователя. "
+    "Пиши сжато, не более 10 предложений, без вступлений."
+)
+
+# Максимум токенов в ответе при сворачивании
+SUMMARY_MAX_TOKENS = 400
+
+# Сколько ждать блокировки базы, занятой другим процессом (секунды)
+DB_TIMEOUT = 30.0
+
+# Максимум ещё не свёрнутых реплик (если сворачивание не успевает или падает)
+MAX_PENDING_TURNS = 20
+
+
+class ChatMemory:
+    """Состояние диалога одного чата"""
+
+    def __init__(self, max_turns, turns=None, summary='', pending=None):
+        """
+        Args:
+            max_turns: Сколько последних пар вопрос-ответ хранить целиком
+            turns: Последние пары [(вопрос, ответ), ...]
+            summary: Краткое содержание более старой части диалога
+            pending: Вытесненные пары, ещё не добавленные в summary
+        """
+        self.turns = deque(turns or [], maxlen=max_turns)
+        self.summary = summary
+        self.pending = list(pending or [])
+        self.summarizing = False
+
+    def add_turn(self, question, answer):
+        """Добавить пару вопрос-ответ; самая старая пара уходит на сворачивание"""
+        if len(self.turns) == self.turns.maxlen:
+            self.pending.append(self.turns[0])
+            # Пока идёт сворачивание, начало pending - забранные take_pending пары:
+            # их число нужно finish_summary, поэтому список обрезается после него
+            if not self.summarizing:
+                del self.pending[:-MAX_PENDING_TURNS]
+        self.turns.append((question, answer))
+
+    def is_empty(self):
+        """Есть ли в чате история"""
+        return not self.turns and not self.summary and not self.pending
+
+
+class ConversationStore:
+    """Хранилище диалогов: LRU в памяти + SQLite на диске"""
+
+    def __init__(self, db_path=None, max_chats=1000, max_turns=6):
+        """
+        Инициализация хранилища.
+
+        Args:
+            db_path: Путь к базе SQLite (None - без сохранения на диск)
+            max_chats: Сколько чатов держать в памяти
+            max_turns: Сколько последних пар вопрос-ответ хранить целиком
+        """
+        self.max_chats = max_chats
+        self.max_turns = max_turns
+        self._chats = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            # База общая для процессов-воркеров: WAL - чтение не ждёт записи другого
+            # процесса, а запись ждёт освобождения блокировки до DB_TIMEOUT секунд
+            self._db = sqlite3.connect(str(db_path), timeout=DB_TIMEOUT, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "chat_id INTEGER PRIMARY KEY, summary TEXT, turns TEXT, "
+                "pending TEXT, updated_at REAL)"
+            )
+            self._db.commit()
+
+    def get(self, chat_id):
+        """
+        Получить состояние чата (из памяти, из базы или новое).
+
+        Args:
+            chat_id: ID чата
+
+        Returns:
+            ChatMemory: Состояние чата
+        """
+        with self._lock:
+            memory = self._chats.get(chat_id)
+            if memory is not None:
+                self._chats.move_to_end(chat_id)
+                return memory
+
+            memory = self._load(chat_id) or ChatMemory(self.max_turns)
+            self._chats[chat_id] = memory
+
+            # Вытесняем давно неактивные чаты (они остаются в базе)
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+
+            return memory
+
+    def _load(self, chat_id):
+        """Загрузить состояние чата из базы"""
+        if self._db is None:
+            return None
+
+        row = self._db.execute(
+            "SELECT summary, turns, pending FROM conversations WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        summary, turns, pending = row
+        return ChatMemory(
+            self.max_turns,
+            turns=[tuple(turn) for turn in json.loads(turns)],
+            summary=summary,
+            pending=[tuple(turn) for turn in json.loads(pending)]
+        )
+
+    def save(self, chat_id):
+        """Сохранить состояние чата в базу"""
+        if self._db is None:
+            return
+
+        with self._lock:
+            memory = self._chats.get(chat_id)
+            if memory is None:
+                return
+            row = (
+                chat_id,
+                memory.summary,
+                json.dumps(list(memory.turns), ensure_ascii=False),
+                json.dumps(memory.pending, ensure_ascii=False),
+                time.time()
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO conversations "
+                "(chat_id, summary, turns, pending, updated_at) VALUES (?, ?, ?, ?, ?)",
+                row
+            )
+            self._db.commit()
+
+    def add_turn(self, chat_id, question, answer):
+        """
+        Добавить пару вопрос-ответ в историю чата и сохранить её.
+
+        Returns:
+            bool: True, если накопились реплики для сворачивания в summary
+        """
+        memory = self.get(chat_id)
+        with self._lock:
+            memory.add_turn(question, answer)
+            ready = bool(memory.pending) and not memory.summarizing
+        self.save(chat_id)
+        return ready
+
+    def clear(self, chat_id):
+        """Удалить историю чата"""
+        with self._lock:
+            self._chats.pop(chat_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM conversations WHERE chat_id = ?", (chat_id,))
+                self._db.commit()
+
+    def history_messages(self, chat_id, max_tokens):
+        """
+        Собрать историю чата в сообщения для API в пределах бюджета токенов.
+
+        Краткое содержание идёт первым, затем последние пары вопрос-ответ:
+        при нехватке бюджета отбрасываются самые старые из них.
+
+        Args:
+            chat_id: ID чата
+            max_tokens: Бюджет токенов на историю
+
+        Returns:
+            list: Сообщения в формате OpenAI
+        """
+        memory = self.get(chat_id)
+        with self._lock:
+            summary, recent = memory.summary, list(memory.turns)
+        messages = []
+        budget = max_tokens
+
+        if summary:
+            content = f"# КРАТКОЕ СОДЕРЖАНИЕ ПРЕДЫДУЩЕГО ДИАЛОГА\n\n{summary}"
+            tokens = TOKENS_PER_MESSAGE + count_tokens(content)
+            if tokens <= budget:
+                messages.append({"role": "system", "content": content})
+                budget -= tokens
+
+        turns = []
+        for question, answer in reversed(recent):
+            tokens = 2 * TOKENS_PER_MESSAGE + count_tokens(question) + count_tokens(answer)
+            if tokens > budget:
+                break
+            turns.append((question, answer))
+            budget -= tokens
+
+        for question, answer in reversed(turns):
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+
+        return messages
+
+    def take_pending(self, chat_id):
+        """
+        Забрать реплики для сворачивания и пометить чат как сворачиваемый.
+
+        Returns:
+            tuple: (текущее summary, список пар) или None, если сворачивать нечего
+        """
+        memory = self.get(chat_id)
+        with self._lock:
+            if memory.summarizing or not memory.pending:
+                return None
+            memory.summarizing = True
+            return memory.summary, list(memory.pending)
+
+    def finish_summary(self, chat_id, folded, summary):
+        """
+        Записать новое summary после сворачивания.
+
+        Args:
+            chat_id: ID чата
+            folded: Пары, которые вошли в summary (результат take_pending)
+            summary: Новое summary (None - сворачивание не удалось)
+        """
+        memory = self.get(chat_id)
+        with self._lock:
+            memory.summarizing = False
+            if summary is not None:
+                memory.summary = summary
+                # folded - начало pending; пары, вытесненные за время сворачивания, остаются
+                # (по значению сравнивать нельзя: одинаковый вопрос-ответ мог повториться)
+                memory.pending = memory.pending[len(folded):]
+            del memory.pending[:-MAX_PENDING_TURNS]
+        self.save(chat_id)
+
+
+def build_summary_messages(summary, turns):
+    """
+    Построить запрос на сворачивание реплик в краткое содержание.
+
+    Args:
+        summary: Текущее краткое содержание (может быть пустым)
+        turns: Пары (вопрос, ответ) для добавления
+
+    Returns:
+        list: Массив сообщений в формате OpenAI
+    """
+    dialog = '\n\n'.join(
+        f"Пользователь: {question}\nАссистент: {answer}" for question, answer in turns
+    )
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {
+            "role": "user",
+            "content": (
+                f"Текущее краткое содержание:\n{summary or '(пусто)'}\n\n"
+                f"Новые реплики:\n{dialog}"
+            )
+        }
+    ]
@@ -2,9 +2,20 @@
 Клиент для взаимодействия с Hydra AI API.
 
 Обеспечивает отправку запросов к API и обработку ответов.
+
+Тело запроса собирается из заранее закодированных фрагментов JSON:
+большое статическое system-сообщение (prompt + контекст) кодируется один
+раз и переиспользуется, для каждого вопроса кодируется только остальное.
+Контекст снимка (EncodedText) уже хранится закодированным и копируется
+в тело запроса напрямую, в том числе из артефакта снимка в mmap.
 """
 
+import gzip
+import json
 import sys
+from functools import lru_cache
+
+from context_loader import EncodedText
 
 try:
     import requests
@@ -14,10 +25,65 @@ except ImportError:
     sys.exit(1)
 
 
+def _dumps(value):
+    """Компактный JSON без экранирования не-ASCII (UTF-8 вдвое короче \\uXXXX для кириллицы)"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+@lru_cache(maxsize=8)
+def encode_system_message(content):
+    """
+    Закодировать system-сообщение в JSON (с кэшированием).
+
+    Args:
+        content: Текст system-сообщения
+
+    Returns:
+        bytes: JSON-объект сообщения в UTF-8
+    """
+    return _dumps({"role": "system", "content": content}).encode('utf-8')
+
+
+def encode_payload(model, messages, temperature, max_tokens):
+    """
+    Собрать тело запроса chat/completions.
+
+    Эквивалентно json.dumps(payload), но первое system-сообщение
+    (prompt + контекст) берётся из кэша закодированных фрагментов, а
+    если его текст - EncodedText, части вставляются в тело как есть.
+
+    Args:
+        model: Название модели
+        messages: Массив сообщений в формате OpenAI
+        temperature: Степень креативности
+        max_tokens: Максимальное количество токенов в ответе
+
+    Returns:
+        bytes: Тело запроса в UTF-8
+    """
+    pieces = [_dumps({'model': model})[:-1].encode('utf-8'), b',"messages":[']
+    for i, message in enumerate(messages):
+        if i:
+            pieces.append(b',')
+        if i == 0 and message.get('role') == 'system' and len(message) == 2:
+            content = message['content']
+            if isinstance(content, EncodedText):
+                pieces.extend([b'{"role":"system","content":"', *content.parts, b'"}'])
+            else:
+                pieces.append(encode_system_message(content))
+        else:
+            pieces.append(_dumps(message).encode('utf-8'))
+
+    pieces.append(b'],')
+    pieces.append(_dumps({'temperature': temperature, 'max_tokens': max_tokens})[1:].encode('utf-8'))
+    # Один проход копирования: части контекста из mmap не склеиваются заранее
+    return b''.join(pieces)
+
+
 class HydraAIClient:
     """Клиент для Hydra AI API (OpenAI-compatible)"""
 
-    def __init__(self, api_key, api_url, model='gpt-4o-mini'):
+    def __init__(self, api_key, api_url, model='gpt-4o-mini', compress=False, pool_size=10):
         """
         Инициализация клиента.
 
@@ -25,19 +91,24 @@ class HydraAIClient:
             api_key: API ключ для авторизации
             api_url: URL эндпоинта API
             model: Название модели для использования
+            compress: Сжимать тело запроса gzip (если API принимает Content-Encoding: gzip)
+            pool_size: Сколько соединений с API держать открытыми (по числу одновременных запросов)
         """
         self.api_key = api_key
         self.api_url = api_url
         self.model = model
+        self.compress = compress
 
         # Создаем сессию с предустановленными заголовками
         self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=pool_size))
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=pool_size))
         self.session.headers.update({
             'Authorization': f'Bearer {api_key}',
             'Content-Type': 'application/json'
         })
 
-    def chat_completion(self, messages, temperature=0.7, max_tokens=2000):
+    def chat_completion(self, messages, temperature=0.7, max_tokens=2000, model=None):
         """
         Отправить запрос на генерацию текста.
 
@@ -46,6 +117,7 @@ class HydraAIClient:
                       [{"role": "system", "content": "..."}, {"role": "user", "content": "..."}]
             temperature: Степень креативности (0.0-2.0)
             max_tokens: Максимальное количество токенов в ответе
+            model: Модель для этого запроса (по умолчанию - модель клиента)
 
         Returns:
             dict: Ответ от API в формате OpenAI
@@ -55,17 +127,17 @@ class HydraAIClient:
             requests.exceptions.Timeout: При превышении времени ожидания
             requests.exceptions.RequestException: При других ошибках сети
         """
-        payload = {
-            'model': self.model,
-            'messages': messages,
-            'temperature': temperature,
-            'max_tokens': max_tokens
-        }
+        body = encode_payload(model or self.model, messages, temperature, max_tokens)
+        headers = None
+        if self.compress:
+            body = gzip.compress(body, compresslevel=1)
+            headers = {'Content-Encoding': 'gzip'}
 
         try:
             response = self.session.post(
                 self.api_url,
-                json=payload,
+                data=body,
+                headers=headers,
                 timeout=60  # 60 секунд таймаут
             )
 
@@ -119,3 +191,46 @@ class HydraAIClient:
     def __repr__(self):
         """Строковое представление клиента (без API ключа)"""
         return f"HydraAIClient(model={self.model}, api_url={self.api_url})"
+
+
+if __name__ == "__main__":
+    # Сравнение размера тела запроса и времени кодирования:
+    # python hydra_client.py [result_dir] [system_prompt_file]
+    import timeit
+    from pathlib import Path
+
+    from context_loader import load_snapshot
+    from message_handler import build_messages
+
+    result_dir = Path(sys.argv[1] if len(sys.argv) > 1 else '../result')
+    prompt_file = Path(sys.argv[2] if len(sys.argv) > 2 else 'config/system_prompt.txt')
+    snapshot = load_snapshot(result_dir, prompt_file)
+
+    def old_body():
+        payload = {
+            'model': 'gpt-4o-mini',
+            'messages': build_messages(snapshot.system_prompt, snapshot.context, "Кто основной разработчик?"),
+            'temperature': 0.7,
+            'max_tokens': 2000
+        }
+        return json.dumps(payload).encode('utf-8')
+
+    def new_body():
+        messages = build_messages(snapshot.system_prompt, snapshot.encoded_context, "Кто основной разработчик?")
+        return encode_payload('gpt-4o-mini', messages, 0.7, 2000)
+
+    assert json.loads(old_body()) == json.loads(new_body())
+
+    number = 200
+    for name, func in (('json.dumps (ensure_ascii)', old_body), ('encode_payload', new_body)):
+        body = func()
+        seconds = timeit.timeit(func, number=number) / number
+        print(f"{name}:")
+        print(f"  Размер тела:   {len(body):,} байт")
+        print(f"  Кодирование:   {seconds * 1000:.3f} мс на запрос")
+
+    body = new_body()
+    seconds = timeit.timeit(lambda: gzip.compress(new_body(), compresslevel=1), number=number) / number
+    print("encode_payload + gzip:")
+    print(f"  Размер тела:   {len(gzip.compress(body, compresslevel=1)):,} байт")
+    print(f"  Кодирование:   {seconds * 1000:.3f} мс на запрос")
@@ -0,0 +1,201 @@
+"""
+Ответы на фактические вопросы без обращения к API.
+
+Команды /stats, /who, /when и /search отвечают по заранее посчитанным
+данным за миллисекунды и не расходуют квоту Hydra AI:
+
+- статистика участников - JSON utils/participant_stats.py
+  (перечитывается при изменении файла);
+- поиск, упоминания темы по месяцам и авторам - полнотекстовый индекс
+  utils/chat_index.py (SQLite FTS5, открывается только на чтение).
+
+Нет файла - команда отвечает, чем его построить.
+
+Запрос FTS5 строится так же, как при построении индекса
+(text_normalize.py).
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from text_normalize import build_match
+
+
+# Уровни для строки активности по неделям (как в utils/participant_stats.py)
+SPARK = ' ▁▂▃▄▅▆▇█'
+
+NO_STATS = "📊 Статистика не посчитана: python utils/participant_stats.py data/chat_index.db --json --output data/participant_stats.json"
+NO_INDEX = "🔎 Индекс переписки не построен: python utils/chat_index.py build <папка_экспорта> data/transcriptions"
+
+
+def _sparkline(values):
+    """Символ на неделю, высота - доля от максимума"""
+    top = max(values, default=0)
+    if not top:
+        return ''
+    return ''.join(SPARK[-(-value * (len(SPARK) - 1) // top)] for value in values)
+
+
+class LocalAnswers:
+    """Ответы команд по статистике участников и полнотекстовому индексу"""
+
+    def __init__(self, index_db, stats_file):
+        """
+        Args:
+            index_db: База utils/chat_index.py
+            stats_file: JSON utils/participant_stats.py
+        """
+        self.index_db = Path(index_db)
+        self.stats_file = Path(stats_file)
+        self._stats = None
+        self._stats_mtime = None
+        self._lock = threading.Lock()
+
+    def _load_stats(self):
+        """Статистика участников (перечитывается, если файл изменился) или None"""
+        try:
+            mtime = self.stats_file.stat().st_mtime
+        except OSError:
+            return None
+        with self._lock:
+            if mtime != self._stats_mtime:
+                self._stats = json.loads(self.stats_file.read_text(encoding='utf-8'))
+                self._stats_mtime = mtime
+            return self._stats
+
+    def _query(self, sql, params):
+        """Выполнить запрос к индексу (соединение на запрос: вызывается из разных потоков)"""
+        db = sqlite3.connect(f"file:{self.index_db}?mode=ro", uri=True)
+        try:
+            return db.execute(sql, params).fetchall()
+        finally:
+            db.close()
+
+    def stats(self, name=''):
+        """
+        /stats: активность всех участников или карточка одного.
+
+        Args:
+            name: Часть имени участника (пусто - все)
+
+        Returns:
+            str: Текст ответа
+        """
+        stats = self._load_stats()
+        if stats is None:
+            return NO_STATS
+
+        authors = stats['authors']
+        if not name:
+            lines = [f"📊 Активность участников ({stats['messages']} сообщений)", ""]
+            for i, a in enumerate(authors[:20], 1):
+                lines.append(
+                    f"{i}. {a['author']} - {a['messages']} сообщ., {a['words']} слов, "
+                    f"🎤 {a['voice_minutes']:g} мин, реакций: {a['reactions_received']}"
+                )
+            if len(authors) > 20:
+                lines.append(f"… и ещё {len(authors) - 20}")
+            return '\n'.join(lines)
+
+        found = [a for a in authors if name.lower() in a['author'].lower()]
+        if not found:
+            return f"👤 Участник «{name}» не найден"
+        if len(found) > 1:
+            return "👤 Уточните имя: " + ', '.join(a['author'] for a in found)
+
+        a = found[0]
+        place = authors.index(a) + 1
+        return '\n'.join([
+            f"👤 {a['author']} ({place}-й по активности)",
+            f"Сообщений: {a['messages']} (слов: {a['words']}, в среднем {a['words_per_message']:g})",
+            f"Голосовые: {a['voice_minutes']:g} мин",
+            f"Реакций получено: {a['reactions_received']}",
+            f"Ответил другим: {a['replies_out']}, получил ответов: {a['replies_in']}",
+            f"Чаще всего общается с: {a['top_partner'] or '-'}",
+            f"Активен: {a['first_day'] or '-'} - {a['last_day'] or '-'} ({a['active_days']} дн.)",
+            f"По неделям: {_sparkline(a['weekly'])}",
+        ])
+
+    def search(self, query, limit=5):
+        """/search: лучшие совпадения по всей переписке"""
+        if not self.index_db.exists():
+            return NO_INDEX
+        match = build_match(query)
+        if not match:
+            return "🔎 Укажите, что искать: /search голосовой ассистент"
+
+        rows = self._query(
+            "SELECT m.id, m.date, m.author, snippet(messages_fts, -1, '«', '»', '…', 16) "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ? ORDER BY bm25(messages_fts) LIMIT ?",
+            (match, limit)
+        )
+        if not rows:
+            return f"🔎 По запросу «{query}» ничего не найдено"
+        lines = [f"🔎 «{query}»:", ""]
+        for message_id, date, author, snippet in rows:
+            lines.append(f"#{message_id} {(date or '')[:10]} {author}:\n{' '.join(snippet.split())}\n")
+        return '\n'.join(lines).rstrip()
+
+    def who(self, topic, limit=10):
+        """/who: кто больше всех писал о теме"""
+        if not self.index_db.exists():
+            return NO_INDEX
+        match = build_match(topic)
+        if not match:
+            return "🗣 Укажите тему: /who MyBox"
+
+        rows = self._query(
+            "SELECT m.author, count(*), min(m.date), max(m.date) "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ? GROUP BY m.author ORDER BY count(*) DESC",
+            (match,)
+        )
+        if not rows:
+            return f"🗣 О «{topic}» никто не писал"
+        total = sum(row[1] for row in rows)
+        lines = [f"🗣 Кто писал о «{topic}» ({total} сообщений):", ""]
+        for i, (author, count, first, last) in enumerate(rows[:limit], 1):
+            lines.append(f"{i}. {author} - {count} ({(first or '')[:10]} - {(last or '')[:10]})")
+        return '\n'.join(lines)
+
+    def when(self, topic):
+        """/when: когда обсуждалась тема - первое и последнее упоминание, число по месяцам"""
+        if not self.index_db.exists():
+            return NO_INDEX
+        match = build_match(topic)
+        if not match:
+            return "🗓 Укажите тему: /when MyBox"
+
+        months = self._query(
+            "SELECT substr(m.date, 1, 7), count(*) "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ? GROUP BY 1 ORDER BY 1",
+            (match,)
+        )
+        if not months:
+            return f"🗓 «{topic}» в переписке не упоминается"
+        edges = self._query(
+            "SELECT * FROM ("
+            "  SELECT m.id, m.date, m.author FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "  WHERE messages_fts MATCH ?1 ORDER BY m.id LIMIT 1) "
+            "UNION ALL SELECT * FROM ("
+            "  SELECT m.id, m.date, m.author FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "  WHERE messages_fts MATCH ?1 ORDER BY m.id DESC LIMIT 1)",
+            (match,)
+        )
+
+        (first_id, first_date, first_author), (last_id, last_date, last_author) = edges
+        top = max(count for _, count in months)
+        lines = [
+            f"🗓 «{topic}»: {sum(count for _, count in months)} упоминаний",
+            f"Первое: {(first_date or '')[:10]}, {first_author} (#{first_id})",
+            f"Последнее: {(last_date or '')[:10]}, {last_author} (#{last_id})",
+            "",
+            "По месяцам:",
+        ]
+        for month, count in months:
+            lines.append(f"{month or '?'} {'█' * max(1, round(count / top * 12))} {count}")
+        return '\n'.join(lines)
@@ -4,15 +4,59 @@
 Форматирование запросов к AI и обработка ответов.
 """
 
+import bisect
+import re
+import unicodedata
+from functools import lru_cache
 
-def build_messages(system_prompt, context, user_question):
+from context_loader import EncodedText, encode_json_text
+
+
+def build_system_content(system_prompt, context):
+    """
+    Собрать текст system-сообщения.
+
+    Контекст из снимка (EncodedText, см. fit_context) не декодируется:
+    system-сообщение - тоже EncodedText, к частям контекста добавляется
+    только закодированный prompt (кэшируется сам prompt, а не контекст:
+    кэш не удерживает снимки после перезагрузки). Для строки возвращается
+    один и тот же объект для одного и того же контекста, поэтому
+    закодированный JSON-фрагмент в HydraAIClient находится по
+    кэшированному хэшу.
+
+    Args:
+        system_prompt: System prompt для AI
+        context: Контекст (str или EncodedText)
+
+    Returns:
+        str | EncodedText: Текст system-сообщения
+    """
+    if isinstance(context, EncodedText):
+        return EncodedText([_encode_prompt_header(system_prompt), *context.parts])
+    return _join_system_content(system_prompt, context)
+
+
+@lru_cache(maxsize=8)
+def _encode_prompt_header(system_prompt):
+    """System prompt и заголовок контекста в виде тела JSON-строки"""
+    return encode_json_text(f"{system_prompt}\n\n# КОНТЕКСТ\n\n")
+
+
+@lru_cache(maxsize=8)
+def _join_system_content(system_prompt, context):
+    """System prompt и контекст-строка одним текстом"""
+    return f"{system_prompt}\n\n# КОНТЕКСТ\n\n{context}"
+
+
+def build_messages(system_prompt, context, user_question, history=None):
     """
     Построить массив сообщений для Hydra AI API.
 
     Args:
         system_prompt: System prompt для AI
-        context: Контекст из markdown файлов
+        context: Контекст (str или EncodedText из fit_context)
         user_question: Вопрос пользователя
+        history: Сообщения истории диалога между контекстом и вопросом (опционально)
 
     Returns:
         list: Массив сообщений в формате OpenAI
@@ -20,78 +64,206 @@ def build_messages(system_prompt, context, user_question):
     messages = [
         {
             "role": "system",
-            "content": f"{system_prompt}\n\n# КОНТЕКСТ\n\n{context}"
-        },
-        {
-            "role": "user",
-            "content": user_question
+            "content": build_system_content(system_prompt, context)
         }
     ]
 
+    if history:
+        messages.extend(history)
+
+    messages.append({
+        "role": "user",
+        "content": user_question
+    })
+
     return messages
 
 
+def build_excerpts_message(excerpts):
+    """
+    Сообщение с найденными исходными сообщениями чата.
+
+    Добавляется после истории диалога, перед вопросом: system-сообщение
+    с контекстом остаётся неизменным и кэшируется.
+
+    Args:
+        excerpts: Текст найденных сообщений (chat_search.format_hits)
+
+    Returns:
+        dict: Сообщение в формате OpenAI
+    """
+    return {
+        "role": "system",
+        "content": (
+            "# ИСХОДНЫЕ СООБЩЕНИЯ ЧАТА\n\n"
+            "Фрагменты переписки, найденные по вопросу. Если опираешься на них, "
+            "указывай номер сообщения (#ID).\n\n"
+            f"{excerpts}"
+        )
+    }
+
+
+# Строка, открывающая или закрывающая блок кода (``` с необязательным языком)
+_FENCE_RE = re.compile(r'^ {0,3}```[^\n`]*$', re.MULTILINE)
+
+_FENCE_CLOSE = '\n```'
+
+# Символы вне BMP (в UTF-16 - суррогатная пара)
+_ASTRAL_RE = re.compile('[\U00010000-\U0010FFFF]')
+
+
+def utf16_length(text):
+    """
+    Длина текста в кодовых единицах UTF-16 (так длину сообщения считает Telegram).
+
+    Args:
+        text: Текст
+
+    Returns:
+        int: Количество кодовых единиц UTF-16
+    """
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _is_grapheme_boundary(text, i):
+    """
+    Можно ли разрезать текст перед позицией i, не разбив видимый символ.
+
+    Приближение правил Unicode для графем: не отделяются комбинирующие
+    знаки, вариационные селекторы, модификаторы цвета кожи, ZWJ-последовательности
+    эмодзи и пары региональных индикаторов (флаги).
+    """
+    if i <= 0 or i >= len(text):
+        return True
+
+    prev, char = ord(text[i - 1]), ord(text[i])
+    if char == 0x200D or prev == 0x200D:
+        return False
+    if unicodedata.combining(text[i]) or 0xFE00 <= char <= 0xFE0F or 0xE0100 <= char <= 0xE01EF:
+        return False
+    if 0x1F3FB <= char <= 0x1F3FF:
+        return False
+    if 0x1F1E6 <= char <= 0x1F1FF and 0x1F1E6 <= prev <= 0x1F1FF:
+        # Флаг - пара индикаторов: режем только после чётного их количества
+        count = 0
+        j = i - 1
+        while j >= 0 and 0x1F1E6 <= ord(text[j]) <= 0x1F1FF:
+            count += 1
+            j -= 1
+        return count % 2 == 0
+    return True
+
+
 def split_long_message(text, max_length=4000):
     """
-    Разделить длинное сообщение на части по границам параграфов.
+    Разделить длинное сообщение на части не длиннее max_length.
 
-    Telegram имеет лимит 4096 символов на сообщение.
-    Разбиваем на части по 4000 символов с учетом границ параграфов.
+    Telegram имеет лимит 4096 символов на сообщение (в кодовых единицах
+    UTF-16, поэтому эмодзи вне BMP считаются за два). Часть режется
+    по последней границе параграфа, если её нет во второй половине
+    окна - по переводу строки, затем по пробелу, и только затем
+    посередине слова (на границе графем). Если разрез попадает внутрь
+    блока кода ```, блок закрывается в конце части и открывается заново
+    в следующей. Работает за один проход: O(n) от длины текста.
 
     Args:
         text: Текст для разделения
-        max_length: Максимальная длина одной части (по умолчанию 4000)
+        max_length: Максимальная длина одной части в UTF-16 (по умолчанию 4000)
 
     Returns:
         list: Список частей сообщения
     """
     # Если сообщение короткое, возвращаем как есть
-    if len(text) <= max_length:
+    if utf16_length(text) <= max_length:
         return [text]
 
+    n = len(text)
+
+    # Символы вне BMP занимают две кодовые единицы UTF-16
+    astral = [m.start() for m in _ASTRAL_RE.finditer(text)]
+
+    def window_end(start, budget):
+        """
+        Наибольший конец части, начинающейся в start, в пределах budget единиц UTF-16.
+
+        Часть всегда продвигается хотя бы на один символ: если даже он не
+        влезает (лимит меньше двух единиц), лимит превышается, но не зависает.
+        """
+        end = min(n, start + budget)
+        if astral:
+            # Длина text[start:end] в UTF-16 растёт с end: ищем наибольший end бинарным поиском
+            first = bisect.bisect_left(astral, start)
+            low, high = start, end
+            while low < high:
+                middle = (low + high + 1) // 2
+                if middle - start + bisect.bisect_left(astral, middle, first) - first <= budget:
+                    low = middle
+                else:
+                    high = middle - 1
+            end = low
+        return max(end, min(n, start + 1))
+
+    # Строки-ограды блоков кода: (начало, конец, текст строки)
+    fences = [(m.start(), m.end(), m.group().strip()) for m in _FENCE_RE.finditer(text)]
+    fence_index = 0
+    open_fence = None
+
     parts = []
-    current_part = ""
+    pos = 0
 
-    # Разбиваем по параграфам (двойной перенос строки)
-    paragraphs = text.split('\n\n')
+    while pos < n:
+        # Внутри блока кода часть начинается с повторного открытия блока
+        prefix = open_fence + '\n' if open_fence else ''
+        reserve = utf16_length(prefix) + len(_FENCE_CLOSE) if fences else 0
+        if reserve * 2 > max_length:
+            prefix, reserve = '', 0
+        budget = max_length - reserve
 
-    for paragraph in paragraphs:
-        # Если добавление параграфа не превысит лимит
-        if len(current_part) + len(paragraph) + 2 <= max_length:
-            if current_part:
-                current_part += '\n\n' + paragraph
-            else:
-                current_part = paragraph
+        end = window_end(pos, budget)
+        if end >= n:
+            cut = n
         else:
-            # Сохраняем текущую часть
-            if current_part:
-                parts.append(current_part.strip())
+            # Разрез не раньше середины окна: каждая часть продвигает текст минимум на пол-лимита
+            floor = pos + (end - pos) // 2
+            cut = text.rfind('\n\n', floor, end)
+            if cut <= pos:
+                cut = text.rfind('\n', floor, end)
+            if cut <= pos:
+                cut = max(text.rfind(' ', floor, end), text.rfind('\t', floor, end))
+            if cut <= pos:
+                cut = end
+                while cut > pos and not _is_grapheme_boundary(text, cut):
+                    cut -= 1
+                if cut == pos:
+                    cut = end
 
-            # Если параграф сам по себе слишком длинный, разбиваем его
-            if len(paragraph) > max_length:
-                # Разбиваем по предложениям
-                sentences = paragraph.split('. ')
-                temp_part = ""
-
-                for sentence in sentences:
-                    if len(temp_part) + len(sentence) + 2 <= max_length:
-                        if temp_part:
-                            temp_part += '. ' + sentence
-                        else:
-                            temp_part = sentence
-                    else:
-                        if temp_part:
-                            parts.append(temp_part.strip())
-                        temp_part = sentence
+        # Строка-ограда не разрезается: иначе её начало в части выглядит как ещё одна ограда
+        if fence_index < len(fences) and fences[fence_index][0] < cut < fences[fence_index][1]:
+            if fences[fence_index][0] > pos:
+                cut = fences[fence_index][0]
 
-                if temp_part:
-                    current_part = temp_part
-            else:
-                current_part = paragraph
+        # Обновляем состояние блока кода по оградам внутри части
+        while fence_index < len(fences) and fences[fence_index][1] <= cut:
+            open_fence = None if open_fence else fences[fence_index][2]
+            fence_index += 1
+
+        body = text[pos:cut].rstrip()
+        if body:
+            parts.append(prefix + body + (_FENCE_CLOSE if open_fence and reserve else ''))
 
-    # Добавляем последнюю часть
-    if current_part:
-        parts.append(current_part.strip())
+        # Пропускаем разделитель; внутри блока кода отступы значимы
+        pos = cut
+        separators = '\n' if open_fence else ' \t\n'
+        while pos < n and text[pos] in separators:
+            pos += 1
+
+        # Следующая часть не должна начинаться с пустого блока: закрывающая ограда уже добавлена
+        if open_fence and fence_index < len(fences) and fences[fence_index][0] == pos:
+            pos = fences[fence_index][1]
+            open_fence = None
+            fence_index += 1
+            while pos < n and text[pos] in ' \t\n':
+                pos += 1
 
     return parts
 
@@ -101,7 +273,7 @@ def format_error_message(error_type, details=None):
     Форматировать сообщение об ошибке для пользователя.
 
     Args:
-        error_type: Тип ошибки ('timeout', 'auth', 'rate_limit', 'server', 'unknown')
+        error_type: Тип ошибки ('timeout', 'auth', 'rate_limit', 'server', 'local', 'unknown')
         details: Дополнительные детали (опционально)
 
     Returns:
@@ -112,6 +284,7 @@ def format_error_message(error_type, details=None):
         'auth': "🔐 Ошибка авторизации API. Обратитесь к администратору.",
         'rate_limit': "⏰ Превышен лимит запросов. Подождите немного и попробуйте снова.",
         'server': "🔧 Ошибка сервера API. Попробуйте позже.",
+        'local': "📂 Не удалось прочитать статистику или индекс переписки. Обратитесь к администратору.",
         'unknown': "❌ Произошла ошибка при обработке запроса."
     }
 
@@ -121,3 +294,68 @@ def format_error_message(error_type, details=None):
         message += f"\n\nДетали: {details}"
 
     return message
+
+
+if __name__ == "__main__":
+    # Замер скорости разбиения (инварианты проверяются в tests/test_message_handler.py):
+    # python message_handler.py
+    import random
+    import time
+
+    def legacy_split(text, max_length=4000):
+        """Прежний алгоритм (конкатенация строк, разрез только по '. ') для сравнения"""
+        if len(text) <= max_length:
+            return [text]
+        parts, current = [], ""
+        for paragraph in text.split('\n\n'):
+            if len(current) + len(paragraph) + 2 <= max_length:
+                current = current + '\n\n' + paragraph if current else paragraph
+                continue
+            if current:
+                parts.append(current.strip())
+            current = paragraph
+            if len(paragraph) > max_length:
+                temp = ""
+                for sentence in paragraph.split('. '):
+                    if len(temp) + len(sentence) + 2 <= max_length:
+                        temp = temp + '. ' + sentence if temp else sentence
+                    else:
+                        if temp:
+                            parts.append(temp.strip())
+                        temp = sentence
+                current = temp
+        if current:
+            parts.append(current.strip())
+        return parts
+
+    words = ['проект', 'участник', 'бот', 'context', 'видение', '👍🏽', '🇷🇺', 'é', 'код;']
+
+    def random_text(rng, size):
+        """Случайный текст с параграфами, строками, блоками кода и эмодзи"""
+        chunks = []
+        length = 0
+        while length < size:
+            kind = rng.random()
+            if kind < 0.1:
+                chunk = '\n```python\n' + '\n'.join(
+                    '    ' + ' '.join(rng.choices(words, k=rng.randint(1, 12)))
+                    for _ in range(rng.randint(1, 80))
+                ) + '\n```\n'
+            elif kind < 0.15:
+                chunk = 'x' * rng.randint(1, 9000)
+            else:
+                chunk = ' '.join(rng.choices(words, k=rng.randint(1, 300)))
+            chunks.append(chunk)
+            chunks.append(rng.choice(['\n\n', '\n', ' ', '. ']))
+            length += len(chunk)
+        return ''.join(chunks)
+
+    for size in (10_000, 100_000, 1_000_000):
+        text = random_text(random.Random(size), size)
+        for name, func in (('split_long_message', split_long_message), ('прежний алгоритм', legacy_split)):
+            started = time.perf_counter()
+            parts = func(text)
+            elapsed = time.perf_counter() - started
+            longest = max(utf16_length(part) for part in parts)
+            print(f"{size:>9,} символов, {name:<18}: {elapsed * 1000:8.2f} мс, "
+                  f"частей {len(parts)}, самая длинная {longest}")
@@ -0,0 +1,129 @@
+"""
+Вынос блокирующих операций из event loop и контроль его отзывчивости.
+
+CPU-нагруженные и блокирующие шаги обработки сообщения (сборка запроса,
+подсчёт токенов, разбиение ответа, работа с SQLite) выполняются в
+ограниченном пуле потоков, а запросы к API, которые ждут ответа модели
+десятки секунд, - в отдельном, большем пуле: иначе несколько медленных
+ответов занимают все потоки и быстрые шаги других сообщений стоят в
+очереди. LoopLagMonitor измеряет задержку event loop, чтобы было видно,
+что он не блокируется.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+# Пулы для блокирующих операций и для запросов к API (создаются в init_executor)
+_executor = None
+_io_executor = None
+
+
+def init_executor(max_workers, io_workers=None):
+    """
+    Создать пулы потоков для блокирующих операций и для запросов к API.
+
+    Args:
+        max_workers: Максимальное количество потоков для блокирующих операций
+        io_workers: Максимальное количество одновременных запросов к API
+                    (None - запросы выполняются в общем пуле)
+    """
+    global _executor, _io_executor
+    _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='blocking')
+    _io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='api') if io_workers else None
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Выполнить блокирующую функцию в пуле потоков, не блокируя event loop.
+
+    Args:
+        func: Функция
+        args, kwargs: Аргументы функции
+
+    Returns:
+        Результат функции
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_io(func, *args, **kwargs):
+    """
+    Выполнить долгий запрос к API в отдельном пуле потоков.
+
+    Args:
+        func: Функция
+        args, kwargs: Аргументы функции
+
+    Returns:
+        Результат функции
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor or _executor, functools.partial(func, *args, **kwargs))
+
+
+class LoopLagMonitor:
+    """Измерение задержки event loop"""
+
+    def __init__(self, interval=0.5, report_every=60.0, warn_threshold=0.1):
+        """
+        Args:
+            interval: Период проверки в секундах
+            report_every: Период записи статистики в лог в секундах
+            warn_threshold: Задержка в секундах, при которой пишется предупреждение
+        """
+        self.interval = interval
+        self.report_every = report_every
+        self.warn_threshold = warn_threshold
+        self._reset()
+
+    def _reset(self):
+        """Начать новое окно статистики"""
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def stats(self):
+        """
+        Статистика текущего окна.
+
+        Returns:
+            dict: {'samples', 'avg_ms', 'max_ms'}
+        """
+        avg = self.total_lag / self.samples if self.samples else 0.0
+        return {
+            'samples': self.samples,
+            'avg_ms': round(avg * 1000, 2),
+            'max_ms': round(self.max_lag * 1000, 2)
+        }
+
+    async def run(self):
+        """Измерять задержку: насколько позже заказанного просыпается sleep()"""
+        report_at = time.monotonic() + self.report_every
+
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - started - self.interval)
+
+            self.samples += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+
+            if lag >= self.warn_threshold:
+                logger.warning(f"Event loop был заблокирован на {lag * 1000:.0f} мс")
+
+            if time.monotonic() >= report_at:
+                stats = self.stats()
+                logger.info(
+                    f"Задержка event loop за {self.report_every:.0f} с: "
+                    f"средняя {stats['avg_ms']} мс, максимальная {stats['max_ms']} мс"
+                )
+                self._reset()
+                report_at = time.monotonic() + self.report_every
@@ -0,0 +1,238 @@
+"""
+Отправка ответов в Telegram с учётом лимитов Bot API.
+
+Telegram ограничивает исходящие сообщения: около 30 в секунду на бота,
+не чаще одного в секунду в личный чат и 20 в минуту в группу. При
+превышении API отвечает 429 (RetryAfter). OutboundDispatcher ставит
+сообщения в очередь, выдерживает оба лимита сам, после RetryAfter
+откладывает отправку в чат на указанное время и повторяет её.
+
+Сообщения одного чата уходят строго по порядку. Из чатов, готовых к
+отправке, первым обслуживается тот, чьё очередное сообщение - начало
+ответа (FIRST): пользователи, ждущие ответа, получают его раньше, чем
+уходят продолжения длинных ответов другим (CONTINUATION).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+
+from telegram.error import RetryAfter
+
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты сообщений: меньше - раньше
+FIRST = 0
+CONTINUATION = 1
+
+# Максимум повторов одного сообщения после RetryAfter
+MAX_RETRIES = 5
+
+
+class OutboundDispatcher:
+    """Очередь исходящих сообщений с ограничением скорости"""
+
+    def __init__(self, bot, global_rate=30.0, private_interval=1.0, group_interval=3.0):
+        """
+        Args:
+            bot: telegram.Bot
+            global_rate: Сообщений в секунду на весь бот (на этот процесс)
+            private_interval: Минимальный интервал между сообщениями в личный чат, с
+            group_interval: Минимальный интервал между сообщениями в группу, с (20 в минуту)
+        """
+        self.bot = bot
+        self.global_rate = global_rate
+        self.private_interval = private_interval
+        self.group_interval = group_interval
+
+        # Глобальный лимит: token bucket с запасом на одну секунду
+        self._tokens = global_rate
+        self._refilled_at = time.monotonic()
+
+        # Очереди чатов: chat_id -> deque[(priority, text, kwargs, future, retries)]
+        self._queues = {}
+        # Момент, раньше которого в чат нельзя отправлять
+        self._next_send = {}
+        # Чаты с сообщениями в очереди, готовые к отправке: (priority, seq, chat_id)
+        self._ready = []
+        # Чаты, ждущие своего интервала: (ready_at, seq, chat_id)
+        self._waiting = []
+        # Чаты, у которых сообщение уже отправляется
+        self._in_flight = set()
+
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._tasks = set()
+        self.sent = 0
+        self.retried = 0
+
+    def send(self, chat_id, text, priority=FIRST, **kwargs):
+        """
+        Поставить сообщение в очередь.
+
+        Args:
+            chat_id: ID чата
+            text: Текст сообщения
+            priority: FIRST или CONTINUATION
+            kwargs: Дополнительные параметры bot.send_message
+
+        Returns:
+            asyncio.Future: Результат отправки (Message) или исключение
+        """
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+
+        queue.append((priority, text, kwargs, future, 0))
+        if len(queue) == 1 and chat_id not in self._in_flight:
+            self._schedule(chat_id)
+
+        self._wakeup.set()
+        return future
+
+    async def send_parts(self, chat_id, parts, reply_to=None, **kwargs):
+        """
+        Отправить ответ из нескольких частей и дождаться доставки.
+
+        Первая часть идёт с приоритетом FIRST, остальные - CONTINUATION.
+
+        Args:
+            chat_id: ID чата
+            parts: Части ответа
+            reply_to: ReplyParameters вопроса - первая часть отправляется ответом на него
+            kwargs: Дополнительные параметры bot.send_message
+
+        Returns:
+            list: Отправленные сообщения
+        """
+        futures = [
+            self.send(chat_id, part, FIRST, reply_parameters=reply_to, **kwargs) if i == 0
+            else self.send(chat_id, part, CONTINUATION, **kwargs)
+            for i, part in enumerate(parts)
+        ]
+        return await asyncio.gather(*futures)
+
+    def _schedule(self, chat_id):
+        """Поставить чат с непустой очередью в ready или waiting"""
+        ready_at = self._next_send.get(chat_id, 0.0)
+        if ready_at <= time.monotonic():
+            priority = self._queues[chat_id][0][0]
+            heapq.heappush(self._ready, (priority, next(self._seq), chat_id))
+        else:
+            heapq.heappush(self._waiting, (ready_at, next(self._seq), chat_id))
+
+    def _take_token(self):
+        """
+        Взять разрешение глобального лимита.
+
+        Returns:
+            float: 0, если разрешение выдано, иначе сколько секунд ждать
+        """
+        now = time.monotonic()
+        self._tokens = min(
+            self.global_rate,
+            self._tokens + (now - self._refilled_at) * self.global_rate
+        )
+        self._refilled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.global_rate
+
+    async def run(self):
+        """Цикл отправки (запускается как фоновая задача)"""
+        while True:
+            now = time.monotonic()
+            while self._waiting and self._waiting[0][0] <= now:
+                _, _, chat_id = heapq.heappop(self._waiting)
+                self._schedule(chat_id)
+
+            if not self._ready:
+                timeout = self._waiting[0][0] - now if self._waiting else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            delay = self._take_token()
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, chat_id = heapq.heappop(self._ready)
+            self._in_flight.add(chat_id)
+            task = asyncio.create_task(self._deliver(chat_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, chat_id):
+        """Отправить очередное сообщение чата"""
+        queue = self._queues[chat_id]
+        priority, text, kwargs, future, retries = queue[0]
+        interval = self.group_interval if chat_id < 0 else self.private_interval
+
+        try:
+            message = await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+        except RetryAfter as e:
+            delay = e.retry_after
+            if hasattr(delay, 'total_seconds'):
+                delay = delay.total_seconds()
+            if retries < MAX_RETRIES:
+                # Сообщение остаётся первым в очереди чата и уйдёт после паузы
+                logger.warning(f"Flood control в чате {chat_id}: повтор через {delay} с")
+                queue[0] = (priority, text, kwargs, future, retries + 1)
+                self.retried += 1
+                interval = max(interval, delay)
+            else:
+                queue.popleft()
+                if not future.done():
+                    future.set_exception(e)
+        except Exception as e:
+            queue.popleft()
+            if not future.done():
+                future.set_exception(e)
+        else:
+            queue.popleft()
+            if not future.done():
+                future.set_result(message)
+            self.sent += 1
+
+        self._next_send[chat_id] = time.monotonic() + interval
+        self._in_flight.discard(chat_id)
+
+        if queue:
+            self._schedule(chat_id)
+        else:
+            del self._queues[chat_id]
+            # Интервал чата помним, пока он не истёк
+            self._forget_later(chat_id, interval)
+        self._wakeup.set()
+
+    def _forget_later(self, chat_id, interval):
+        """Удалить интервал чата без очереди, когда он истечёт"""
+        def forget():
+            if chat_id not in self._queues and self._next_send.get(chat_id, 0.0) <= time.monotonic():
+                self._next_send.pop(chat_id, None)
+
+        asyncio.get_running_loop().call_later(interval, forget)
+
+    def stats(self):
+        """
+        Состояние очереди.
+
+        Returns:
+            dict: {'queued', 'chats', 'sent', 'retried'}
+        """
+        return {
+            'queued': sum(len(queue) for queue in self._queues.values()),
+            'chats': len(self._queues),
+            'sent': self.sent,
+            'retried': self.retried
+        }
@@ -0,0 +1,229 @@
+"""
+Выбор модели и бюджета ответа по вопросу.
+
+Простые справочные вопросы ("кто такой...", "что такое MyBox?") не
+требуют сильной модели и длинного ответа, сложные ("как менялись позиции...",
+"сравни подходы...") - требуют. Вопрос относится к одному из классов
+локально, без обращения к API, за доли миллисекунды:
+
+1. Правила: продолжение диалога (есть история) и явные признаки сложного
+   вопроса (эволюция, сравнение, причины, длинный вопрос) - сложный вопрос,
+   короткий справочный вопрос - простой.
+2. Если правило не сработало - логистическая регрессия на символьных
+   n-граммах, обученная при создании роутера на примерах EXAMPLES
+   (чистый Python, около 0.1 с на CPU при старте бота).
+
+Запуск модуля печатает точность на примерах (leave-one-out) и время
+классификации.
+"""
+
+import math
+import random
+import re
+from collections import Counter
+
+
+SIMPLE = 'simple'
+COMPLEX = 'complex'
+
+# Признаки сложного вопроса: развитие во времени, сравнение, причины, анализ.
+# Основы слов привязаны к началу слова (\b), а у неоднозначных перечислены окончания:
+# "спор" не должен находить "спорт", "анализ" - "психоанализ", "как мен" - "как меня зовут"
+COMPLEX_RE = re.compile(
+    r'\b(?:эволюц|(?:со )?временем|меня(?:л|ет|ют)|измен(?:ил|ял|ени)|развива|развит|'
+    r'истори(?:я|и|ю|ей)\b|хронолог|сравн|отлича|разниц|почему|зачем|причин|противореч|'
+    r'разноглас|спор(?!т)|позици\w* .*\b(?:участник|кажд|всех)|проанализ|анализ|оцени|'
+    r'плюсы|минусы|подробн|расскажи все|по шагам|этап)'
+)
+
+# Короткие справочные вопросы
+SIMPLE_RE = re.compile(
+    r'^(кто|что такое|что за|когда|где|сколько|какой|какая|какое|какие|как зовут|есть ли|чей)\b'
+)
+
+# Вопрос из стольких слов и длиннее считается сложным, короче стольких (со справочным началом) - простым
+COMPLEX_WORDS = 25
+SIMPLE_WORDS = 8
+
+# Порог вероятности сложного вопроса для линейной модели (ниже 0.5: сложный вопрос,
+# отправленный быстрой модели, обходится дороже, чем простой - сильной)
+THRESHOLD = 0.4
+
+# Размеры символьных n-грамм
+NGRAM_SIZES = (2, 3, 4)
+
+# Обучающие примеры линейной модели
+EXAMPLES = [
+    (SIMPLE, "Кто является основным разработчиком?"),
+    (SIMPLE, "Что такое проект MyBox?"),
+    (SIMPLE, "Какие технологии используются?"),
+    (SIMPLE, "Кто такой Борис?"),
+    (SIMPLE, "Когда начался проект?"),
+    (SIMPLE, "Сколько участников в чате?"),
+    (SIMPLE, "Что такое Media Room?"),
+    (SIMPLE, "Кто отвечает за бэкапы?"),
+    (SIMPLE, "Где хранится код?"),
+    (SIMPLE, "Какой язык программирования выбрали?"),
+    (SIMPLE, "Кто предложил FAM?"),
+    (SIMPLE, "Что за проект Personal AI?"),
+    (SIMPLE, "Какая база данных используется?"),
+    (SIMPLE, "Кто занимается дизайном?"),
+    (SIMPLE, "Есть ли мобильное приложение?"),
+    (SIMPLE, "Назови участников проекта"),
+    (SIMPLE, "Перечисли проекты"),
+    (SIMPLE, "Чем занимается Анна?"),
+    (SIMPLE, "Какая роль у Виктора?"),
+    (SIMPLE, "На чём написан бэкенд?"),
+    (SIMPLE, "Какой сервер используется для MyBox?"),
+    (SIMPLE, "Кто автор идеи голосового ассистента?"),
+    (SIMPLE, "Дата первого релиза?"),
+    (SIMPLE, "Что такое Майя?"),
+    (SIMPLE, "Кто руководит проектом?"),
+    (SIMPLE, "Как называется основной продукт?"),
+    (SIMPLE, "Какой статус у проекта бэкапов?"),
+    (SIMPLE, "Ссылка на репозиторий есть?"),
+    (COMPLEX, "Как менялись позиции участников по поводу MyBox?"),
+    (COMPLEX, "Как эволюционировало видение проекта?"),
+    (COMPLEX, "Почему отказались от облачного хранения?"),
+    (COMPLEX, "Сравни подходы Анны и Бориса к архитектуре"),
+    (COMPLEX, "Опиши историю обсуждения приватности"),
+    (COMPLEX, "В чём разногласия между участниками?"),
+    (COMPLEX, "Как развивалась идея голосового интерфейса со временем?"),
+    (COMPLEX, "Какие были этапы развития проекта и что на них решали?"),
+    (COMPLEX, "Проанализируй риски проекта MyBox"),
+    (COMPLEX, "Чем отличается Personal AI от MyBox и почему их разделили?"),
+    (COMPLEX, "Расскажи подробно, как принимались ключевые решения"),
+    (COMPLEX, "Кто и как влиял на концепцию продукта в разные периоды?"),
+    (COMPLEX, "Объясни, какие аргументы приводились за и против локальной модели"),
+    (COMPLEX, "Как изменилось отношение команды к монетизации?"),
+    (COMPLEX, "Какие противоречия есть в позициях участников?"),
+    (COMPLEX, "Составь хронологию проекта по месяцам"),
+    (COMPLEX, "Оцени, насколько реалистичен план релиза"),
+    (COMPLEX, "Что думал каждый участник о приватности и как это менялось?"),
+    (COMPLEX, "Опиши плюсы и минусы выбранной архитектуры"),
+    (COMPLEX, "Как связаны между собой все проекты и кто за что отвечает?"),
+    (COMPLEX, "Какие идеи обсуждались, но были отвергнуты, и по каким причинам?"),
+    (COMPLEX, "Расскажи о конфликтах в команде и чем они закончились"),
+    (COMPLEX, "Объясни логику перехода от Media Room к FAM"),
+    (COMPLEX, "Как менялся состав команды и роли участников?"),
+    (COMPLEX, "Что стоит учесть новому участнику, чтобы понять контекст проекта?"),
+    (COMPLEX, "Поясни, зачем нужен отдельный сервер и какие есть альтернативы"),
+]
+
+
+def normalize(question):
+    """Нижний регистр, "ё" -> "е", пробелы схлопываются"""
+    return ' '.join(question.lower().replace('ё', 'е').split())
+
+
+def features(question):
+    """Символьные n-граммы вопроса (с границами) и их частоты"""
+    text = f" {normalize(question)} "
+    counts = Counter(
+        text[i:i + size] for size in NGRAM_SIZES for i in range(len(text) - size + 1)
+    )
+    # Нормировка на длину: длинный вопрос не получает преимущества числом n-грамм
+    norm = math.sqrt(sum(value * value for value in counts.values())) or 1.0
+    return {gram: value / norm for gram, value in counts.items()}
+
+
+class LinearModel:
+    """Логистическая регрессия на разреженных признаках (SGD, L2)"""
+
+    def __init__(self):
+        self.weights = {}
+        self.bias = 0.0
+
+    def score(self, feature_values):
+        """Вероятность положительного класса"""
+        z = self.bias + sum(self.weights.get(name, 0.0) * value for name, value in feature_values.items())
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+    def train(self, samples, epochs=40, rate=0.5, l2=1e-4, seed=0):
+        """
+        Обучить модель.
+
+        Args:
+            samples: [(признаки, метка 0/1)]
+            epochs: Проходов по выборке
+            rate: Шаг SGD
+            l2: Коэффициент L2-регуляризации
+            seed: Seed перемешивания
+        """
+        rng = random.Random(seed)
+        samples = list(samples)
+        for _ in range(epochs):
+            rng.shuffle(samples)
+            for feature_values, label in samples:
+                error = self.score(feature_values) - label
+                self.bias -= rate * error
+                for name, value in feature_values.items():
+                    weight = self.weights.get(name, 0.0)
+                    self.weights[name] = weight - rate * (error * value + l2 * weight)
+        return self
+
+
+class QuestionRouter:
+    """Классификатор вопросов: простой (справочный) или сложный"""
+
+    def __init__(self, examples=EXAMPLES):
+        """
+        Args:
+            examples: Обучающие примеры [(SIMPLE | COMPLEX, вопрос)]
+        """
+        self.model = LinearModel().train(
+            (features(question), 1 if label == COMPLEX else 0) for label, question in examples
+        )
+
+    def classify(self, question, history=None):
+        """
+        Определить класс вопроса.
+
+        Args:
+            question: Текст вопроса
+            history: Сообщения диалога до вопроса. Продолжение диалога ("а почему?",
+                "а он?") без истории не понять, поэтому оно всегда сложный вопрос
+
+        Returns:
+            dict: {'label': SIMPLE | COMPLEX, 'reason': 'rule' | 'history' | 'model',
+                'score': вероятность сложного}
+        """
+        if history:
+            return {'label': COMPLEX, 'reason': 'history', 'score': 1.0}
+
+        text = normalize(question)
+        words = len(text.split())
+
+        if words >= COMPLEX_WORDS or text.count('?') > 1 or COMPLEX_RE.search(text):
+            return {'label': COMPLEX, 'reason': 'rule', 'score': 1.0}
+        if words < SIMPLE_WORDS and SIMPLE_RE.search(text):
+            return {'label': SIMPLE, 'reason': 'rule', 'score': 0.0}
+
+        score = self.model.score(features(text))
+        return {'label': COMPLEX if score >= THRESHOLD else SIMPLE, 'reason': 'model', 'score': round(score, 3)}
+
+
+if __name__ == '__main__':
+    # Проверка: точность линейной модели на примерах (leave-one-out) и время классификации
+    import sys
+    import time
+
+    correct = 0
+    for i, (label, question) in enumerate(EXAMPLES):
+        model = QuestionRouter(EXAMPLES[:i] + EXAMPLES[i + 1:]).model
+        predicted = COMPLEX if model.score(features(question)) >= THRESHOLD else SIMPLE
+        correct += predicted == label
+    print(f"Линейная модель, leave-one-out: {correct}/{len(EXAMPLES)} ({correct / len(EXAMPLES):.0%})")
+
+    started = time.perf_counter()
+    router = QuestionRouter()
+    print(f"Обучение: {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    questions = sys.argv[1:] or [question for _, question in EXAMPLES]
+    started = time.perf_counter()
+    routes = [router.classify(question) for question in questions]
+    elapsed = (time.perf_counter() - started) / len(questions)
+    print(f"Классификация: {elapsed * 1000:.3f} мс на вопрос\n")
+
+    for question, route in zip(questions, routes):
+        print(f"  {route['label']:<8} {route['reason']:<6} {route['score']:<6} {question}")
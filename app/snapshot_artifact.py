@@ -0,0 +1,94 @@
+"""
+Сборка артефакта снимка контекста.
+
+Заранее объединяет файлы result/ в один файл с таблицей фрагментов,
+статистикой и сохраняемыми индексами, чтобы бот при старте только
+отображал его в память, а не собирал контекст заново.
+
+Использование:
+    python snapshot_artifact.py [директория_result] [файл_артефакта]
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from context_loader import (
+    CONTEXT_FILES, INDEX_BUILDERS, SNAPSHOT_FORMAT_VERSION, SNAPSHOT_MAGIC,
+    ContextSnapshot, get_source_hashes, load_all_context
+)
+
+# Модули ниже регистрируют сохраняемые индексы снимка
+import context_search  # noqa: F401
+import token_counter  # noqa: F401
+
+
+def build_snapshot_artifact(result_dir, output_path):
+    """
+    Собрать артефакт снимка из файлов result/ и атомарно записать его.
+
+    Args:
+        result_dir: Путь к директории с файлами контекста
+        output_path: Путь к файлу артефакта
+
+    Returns:
+        dict: Заголовок записанного артефакта
+    """
+    context = load_all_context(str(result_dir))
+
+    # System prompt в артефакт не входит: он обновляется отдельно (update_prompt.py)
+    snapshot = ContextSnapshot('', context)
+
+    header = {
+        'format': SNAPSHOT_FORMAT_VERSION,
+        'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'files': CONTEXT_FILES,
+        'sources': get_source_hashes(result_dir),
+        'context_hash': snapshot.context_hash,
+        'context_length': len(snapshot.context_json),
+        'stats': snapshot.stats,
+        'chunks': snapshot.chunks,
+        'indexes': {
+            name: snapshot.indexes[name]
+            for name, (builder, persist, is_current) in INDEX_BUILDERS.items()
+            if persist
+        }
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        f.write(snapshot.context_json)
+
+    # Атомарная подмена: бот при горячей перезагрузке не увидит файл наполовину
+    os.replace(tmp_path, output_path)
+
+    return header
+
+
+if __name__ == '__main__':
+    """Сборка артефакта снимка"""
+    result_dir = sys.argv[1] if len(sys.argv) > 1 else '../result'
+    output_path = sys.argv[2] if len(sys.argv) > 2 else 'context.snapshot'
+
+    try:
+        print(f"[INFO] Сборка снимка из {result_dir}...")
+        header = build_snapshot_artifact(result_dir, output_path)
+
+        print(f"[OK] Снимок сохранён: {output_path}")
+        print(f"  Символов: {header['stats']['chars']:,}")
+        print(f"  Фрагментов: {len(header['chunks'])}")
+        print(f"  Индексов: {len(header['indexes'])}")
+        print(f"  Хэш контекста: {header['context_hash'][:12]}")
+        print(f"  Размер: {Path(output_path).stat().st_size / 1024:.2f} KB")
+
+    except Exception as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
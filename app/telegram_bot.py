@@ -6,7 +6,12 @@ Telegram-бот с интеграцией Hydra AI.
 
 import sys
 import io
+import asyncio
+import hashlib
+import json
 import logging
+import sqlite3
+import time
 from datetime import datetime
 
 # Настройка UTF-8 для Windows console
@@ -16,8 +21,11 @@ if sys.platform == 'win32':
 
 # Импорт зависимостей с обработкой ошибок
 try:
-    from telegram import Update
-    from telegram.ext import Application, CommandHandler, MessageHandler, filters
+    from telegram import (
+        InlineQueryResultArticle, InlineQueryResultsButton, InputTextMessageContent,
+        ReplyParameters, Update
+    )
+    from telegram.ext import Application, CommandHandler, InlineQueryHandler, MessageHandler, filters
     from telegram.constants import ChatAction
 except ImportError:
     print("Ошибка: Необходимо установить библиотеку python-telegram-bot")
@@ -32,10 +40,24 @@ except ImportError:
     sys.exit(1)
 
 # Импорт локальных модулей
+from answer_cache import AnswerCache
 from bot_config import BotConfig
-from context_loader import load_all_context, get_context_stats
+from chat_search import format_hits, open_index
+from context_loader import load_snapshot
+from context_search import chunk_snippet, search_chunks
+from context_watcher import ContextWatcher
+from conversation_memory import (
+    SUMMARY_MAX_TOKENS, ConversationStore, build_summary_messages
+)
 from hydra_client import HydraAIClient
-from message_handler import build_messages, split_long_message, format_error_message
+from local_answers import LocalAnswers
+from offload import LoopLagMonitor, init_executor, run_blocking, run_io
+from outbound import OutboundDispatcher
+from question_router import SIMPLE, QuestionRouter
+from token_counter import fit_context, get_tokenizer_name
+from message_handler import (
+    build_excerpts_message, build_messages, split_long_message, format_error_message
+)
 
 
 # Настройка логирования
@@ -46,11 +68,30 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Типы обновлений, которые обрабатывают хендлеры (остальные Telegram не присылает)
+ALLOWED_UPDATES = [Update.MESSAGE, Update.INLINE_QUERY]
+
+# Inline-режим: сколько ответов из кэша и фрагментов контекста показывать,
+# длина отправляемого фрагмента и время кэширования результатов на стороне Telegram
+INLINE_ANSWERS = 5
+INLINE_SNIPPETS = 5
+INLINE_TEXT_CHARS = 1500
+INLINE_CACHE_TIME = 60
+
+
 # Глобальные переменные (инициализируются при старте)
 config = None
 hydra_client = None
-system_prompt = None
-context = None
+watcher = None
+conversations = None
+outbound = None
+chat_vectors = None
+local_answers = None
+answer_cache = None
+router = None
+
+# Номер процесса-воркера (0 - и в однопроцессном режиме), задаётся worker_pool.py
+worker_index = 0
 
 
 async def start_command(update: Update, context_obj):
@@ -87,22 +128,230 @@ async def help_command(update: Update, context_obj):
 **Доступные команды:**
 /start - Приветствие и описание бота
 /help - Эта справка
+/reset - Начать диалог заново (забыть историю)
+
+**Быстрые ответы по переписке (без AI):**
+/stats [имя] - Активность участников или одного участника
+/who тема - Кто больше всех писал о теме
+/when тема - Когда обсуждалась тема (по месяцам)
+/search запрос - Поиск сообщений
 
 **Как пользоваться:**
 Просто отправьте мне свой вопрос текстовым сообщением.
+Можно задавать уточняющие вопросы - я помню недавний диалог.
 
 **Важно:**
 • Я отвечаю только на основе информации из контекста
 • Если информации нет, я честно об этом скажу
-• Каждый вопрос обрабатывается независимо (без истории диалога)
 """
     await update.message.reply_text(help_message)
 
 
+async def reset_command(update: Update, context_obj):
+    """Обработчик команды /reset"""
+    await run_blocking(conversations.clear, update.effective_chat.id)
+    await update.message.reply_text("🧹 История диалога очищена. Задайте новый вопрос!")
+
+
+def quote(message):
+    """Параметры ответа на сообщение (если его успели удалить - отправить без цитаты)"""
+    return ReplyParameters(message_id=message.message_id, allow_sending_without_reply=True)
+
+
+async def reply_local(update: Update, context_obj, answer):
+    """Ответить по локальным данным, без запроса к API"""
+    query = ' '.join(context_obj.args or ())
+    command = update.message.text.split()[0]
+    started = time.perf_counter()
+    try:
+        text = await run_blocking(answer, query)
+    except (json.JSONDecodeError, sqlite3.Error) as e:
+        # Файл статистики записан не до конца или повреждён, индекс повреждён или заблокирован
+        logger.error(f"[{update.effective_user.id}] {command} {query[:100]} - ошибка локальных данных: {e}")
+        text = format_error_message('local')
+    else:
+        logger.info(
+            f"[{update.effective_user.id}] {command} {query[:100]} "
+            f"- локальный ответ за {(time.perf_counter() - started) * 1000:.1f} мс"
+        )
+    await outbound.send_parts(update.effective_chat.id, split_long_message(text), reply_to=quote(update.message))
+
+
+async def stats_command(update: Update, context_obj):
+    """Обработчик команды /stats [имя]"""
+    await reply_local(update, context_obj, local_answers.stats)
+
+
+async def who_command(update: Update, context_obj):
+    """Обработчик команды /who тема"""
+    await reply_local(update, context_obj, local_answers.who)
+
+
+async def when_command(update: Update, context_obj):
+    """Обработчик команды /when тема"""
+    await reply_local(update, context_obj, local_answers.when)
+
+
+async def search_command(update: Update, context_obj):
+    """Обработчик команды /search запрос"""
+    await reply_local(update, context_obj, local_answers.search)
+
+
+async def summarize_history(chat_id):
+    """Свернуть вытесненные реплики чата в краткое содержание (в фоне)"""
+    taken = await run_blocking(conversations.take_pending, chat_id)
+    if taken is None:
+        return
+
+    summary, turns = taken
+    new_summary = None
+
+    try:
+        response = await run_io(
+            hydra_client.chat_completion,
+            messages=build_summary_messages(summary, turns),
+            temperature=0.2,
+            max_tokens=SUMMARY_MAX_TOKENS
+        )
+        new_summary = hydra_client.extract_message_content(response).strip()
+        logger.info(f"[chat {chat_id}] История свёрнута ({len(turns)} реплик)")
+    except Exception as e:
+        logger.warning(f"[chat {chat_id}] Не удалось свернуть историю: {e}")
+    finally:
+        await run_blocking(conversations.finish_summary, chat_id, turns, new_summary)
+
+
+def prepare_messages(snapshot, chat_id, user_message):
+    """
+    Собрать запрос к API: история, контекст в пределах бюджета,
+    найденные исходные сообщения чата, вопрос.
+
+    Выполняется в пуле потоков (эмбеддинг вопроса, подсчёт токенов, сборка строк, SQLite).
+
+    Args:
+        snapshot: ContextSnapshot
+        chat_id: ID чата (None - вопрос без истории диалога)
+        user_message: Вопрос
+
+    Returns:
+        tuple: (сообщения, оценка prompt_tokens, количество отброшенных фрагментов,
+            история диалога)
+    """
+    # История диалога в пределах своего бюджета токенов
+    dialog = conversations.history_messages(chat_id, config.history_max_tokens) if chat_id is not None else []
+    history = dialog
+
+    # Исходные сообщения чата, близкие к вопросу: идут после истории и учитываются в бюджете
+    if chat_vectors and config.chat_vectors_top_k > 0:
+        hits = chat_vectors.search(user_message, k=config.chat_vectors_top_k)
+        if hits:
+            history = history + [build_excerpts_message(format_hits(hits))]
+
+    # Подбираем контекст под бюджет токенов и формируем массив сообщений для API
+    context_text, estimated_tokens, dropped = fit_context(
+        snapshot, user_message, config.max_input_tokens, history
+    )
+    messages = build_messages(snapshot.system_prompt, context_text, user_message, history)
+
+    return messages, estimated_tokens, dropped, dialog
+
+
+def lookup_answer(snapshot, chat_id, user_id, user_message):
+    """
+    Вопрос без истории диалога учитывается в статистике частых вопросов,
+    и для него ищется готовый ответ в кэше.
+
+    Выполняется в пуле потоков (SQLite).
+
+    Returns:
+        tuple: (задан ли вопрос без истории диалога, ответ из кэша или None)
+    """
+    if not conversations.get(chat_id).is_empty():
+        return False, None
+    answer_cache.record_question(user_message, user_id)
+    return True, answer_cache.get(user_message, snapshot.version)
+
+
+async def request_answer(snapshot, chat_id, user_message, log_prefix):
+    """
+    Получить ответ модели на вопрос.
+
+    Args:
+        snapshot: ContextSnapshot
+        chat_id: ID чата (None - вопрос без истории диалога)
+        user_message: Вопрос
+        log_prefix: Префикс записей лога
+
+    Returns:
+        str: Ответ
+
+    Raises:
+        requests.exceptions.RequestException: Ошибки API
+    """
+    # CPU-нагруженные и блокирующие шаги выполняются вне event loop
+    messages, estimated_tokens, dropped, dialog = await run_blocking(
+        prepare_messages, snapshot, chat_id, user_message
+    )
+    if dropped:
+        logger.warning(
+            f"{log_prefix} Контекст урезан до {config.max_input_tokens} токенов: "
+            f"отброшено фрагментов: {dropped}"
+        )
+
+    # Простой справочный вопрос без истории диалога - быстрой модели с меньшим бюджетом ответа
+    model, max_tokens = config.model, config.max_tokens
+    if router is not None:
+        started = time.perf_counter()
+        route = router.classify(user_message, dialog)
+        if route['label'] == SIMPLE:
+            model, max_tokens = config.fast_model, config.fast_max_tokens
+        logger.info(
+            f"{log_prefix} Маршрут: {route['label']} ({route['reason']}, {route['score']}) -> "
+            f"{model}, max_tokens {max_tokens}, за {(time.perf_counter() - started) * 1000:.2f} мс"
+        )
+
+    # Отправляем запрос к Hydra AI (сериализация и HTTP - в пуле потоков для запросов к API)
+    response = await run_io(
+        hydra_client.chat_completion,
+        messages=messages,
+        temperature=config.temperature,
+        max_tokens=max_tokens,
+        model=model
+    )
+
+    # Логируем статистику
+    usage = response.get('usage', {})
+    logger.info(
+        f"{log_prefix} Ответ получен ({model}, контекст {snapshot.version}). "
+        f"Токены: {usage.get('prompt_tokens', 0)} + {usage.get('completion_tokens', 0)} "
+        f"= {usage.get('total_tokens', 0)} "
+        f"(оценка prompt: {estimated_tokens})"
+    )
+
+    return hydra_client.extract_message_content(response)
+
+
+def finish_answer(chat_id, user_message, answer, version, cache):
+    """
+    Запомнить реплику в истории и разбить ответ на части для отправки.
+    С cache=True ответ сохраняется в кэш ответов.
+
+    Выполняется в пуле потоков (SQLite, разбиение длинного текста).
+
+    Returns:
+        tuple: (нужно ли свернуть историю, части ответа)
+    """
+    needs_summary = conversations.add_turn(chat_id, user_message, answer)
+    if cache:
+        answer_cache.put(user_message, answer, version)
+    return needs_summary, split_long_message(answer)
+
+
 async def handle_message(update: Update, context_obj):
     """Обработчик текстовых сообщений от пользователей"""
     user_message = update.message.text
     user_id = update.effective_user.id
+    chat_id = update.effective_chat.id
     username = update.effective_user.username or "unknown"
 
     logger.info(f"[{user_id}] @{username}: {user_message[:100]}")
@@ -110,44 +359,35 @@ async def handle_message(update: Update, context_obj):
     # Отправляем действие "печатает..."
     await update.message.chat.send_action(ChatAction.TYPING)
 
-    try:
-        # Формируем массив сообщений для API
-        messages = build_messages(system_prompt, context, user_message)
-
-        # Отправляем запрос к Hydra AI
-        response = hydra_client.chat_completion(
-            messages=messages,
-            temperature=config.temperature,
-            max_tokens=config.max_tokens
-        )
+    # Снимок фиксируется на время обработки: перезагрузка не влияет на текущий ответ
+    snapshot = watcher.snapshot
 
-        # Извлекаем ответ
-        answer = hydra_client.extract_message_content(response)
+    try:
+        # Вопрос без истории диалога мог быть задан раньше (или заранее подготовлен)
+        standalone, answer = await run_blocking(lookup_answer, snapshot, chat_id, user_id, user_message)
+        cached = answer is not None
+        if cached:
+            logger.info(f"[{user_id}] Ответ из кэша (контекст {snapshot.version})")
+        else:
+            answer = await request_answer(snapshot, chat_id, user_message, f"[{user_id}]")
 
-        # Логируем статистику
-        usage = response.get('usage', {})
-        logger.info(
-            f"[{user_id}] Ответ получен. "
-            f"Токены: {usage.get('prompt_tokens', 0)} + {usage.get('completion_tokens', 0)} "
-            f"= {usage.get('total_tokens', 0)}"
+        # Запоминаем реплику и разбиваем длинный ответ на части
+        needs_summary, message_parts = await run_blocking(
+            finish_answer, chat_id, user_message, answer, snapshot.version, standalone and not cached
         )
 
-        # Разбиваем длинный ответ на части
-        message_parts = split_long_message(answer)
-
-        # Отправляем ответ (возможно несколько сообщений)
-        for i, part in enumerate(message_parts):
-            if i > 0:
-                # Небольшая задержка между сообщениями
-                await update.message.chat.send_action(ChatAction.TYPING)
+        # Старые реплики сворачиваются в фоне, вне обработки ответа
+        if needs_summary:
+            context_obj.application.create_task(summarize_history(chat_id))
 
-            await update.message.reply_text(part)
+        # Отправляем ответ (возможно несколько сообщений) через очередь с учётом лимитов Telegram
+        await outbound.send_parts(chat_id, message_parts, reply_to=quote(update.message))
 
         logger.info(f"[{user_id}] Ответ отправлен ({len(message_parts)} частей)")
 
     except requests.exceptions.Timeout:
         error_msg = format_error_message('timeout')
-        await update.message.reply_text(error_msg)
+        await outbound.send(chat_id, error_msg, reply_parameters=quote(update.message))
         logger.error(f"[{user_id}] Timeout error")
 
     except requests.exceptions.HTTPError as e:
@@ -162,69 +402,219 @@ async def handle_message(update: Update, context_obj):
         else:
             error_msg = format_error_message('unknown', str(e))
 
-        await update.message.reply_text(error_msg)
+        await outbound.send(chat_id, error_msg, reply_parameters=quote(update.message))
         logger.error(f"[{user_id}] HTTP error: {e}")
 
     except Exception as e:
         error_msg = format_error_message('unknown')
-        await update.message.reply_text(error_msg)
+        await outbound.send(chat_id, error_msg, reply_parameters=quote(update.message))
         logger.error(f"[{user_id}] Unexpected error: {e}", exc_info=True)
 
 
+def _shorten(text, limit):
+    """Обрезать текст до limit символов"""
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+
+def inline_results(snapshot, query):
+    """
+    Результаты inline-запроса: ответы из кэша на похожие вопросы FAQ и
+    частые вопросы (личные вопросы других пользователей не показываются)
+    и подходящие фрагменты контекста. Модель не вызывается.
+
+    Выполняется в пуле потоков.
+
+    Returns:
+        list: InlineQueryResultArticle
+    """
+    results = []
+    for question, answer in answer_cache.search(query, INLINE_ANSWERS):
+        results.append(InlineQueryResultArticle(
+            id='a' + hashlib.md5(question.encode('utf-8')).hexdigest(),
+            title=_shorten(f"💬 {question}", 100),
+            description=_shorten(' '.join(answer.split()), 200),
+            input_message_content=InputTextMessageContent(_shorten(f"❓ {question}\n\n{answer}", 4096))
+        ))
+
+    for chunk_index, _ in search_chunks(snapshot, query, INLINE_SNIPPETS):
+        chunk = snapshot.chunks[chunk_index]
+        source = f"{chunk['file']} - {chunk['title']}" if chunk['title'] not in ('', chunk['file']) else chunk['file']
+        results.append(InlineQueryResultArticle(
+            id=f"c{snapshot.version}-{chunk_index}",
+            title=_shorten(f"📄 {chunk['title'] or chunk['file']}", 100),
+            description=chunk_snippet(snapshot, chunk_index, query, 200),
+            input_message_content=InputTextMessageContent(
+                f"📄 {source}\n\n{chunk_snippet(snapshot, chunk_index, query, INLINE_TEXT_CHARS)}"
+            )
+        ))
+    return results
+
+
+async def inline_query(update: Update, context_obj):
+    """
+    Обработчик inline-запросов (@бот вопрос в любом чате).
+
+    Telegram ждёт ответ на inline-запрос несколько секунд, поэтому
+    результаты берутся только из кэша ответов и локального поиска по
+    контексту; полный ответ модели - по кнопке в личном чате с ботом.
+    """
+    query = update.inline_query.query.strip()
+    started = time.perf_counter()
+    results = await run_blocking(inline_results, watcher.snapshot, query) if query else []
+    logger.info(
+        f"[{update.effective_user.id}] inline: {query[:100]} - {len(results)} результатов "
+        f"за {(time.perf_counter() - started) * 1000:.1f} мс"
+    )
+    await update.inline_query.answer(
+        results,
+        cache_time=INLINE_CACHE_TIME,
+        button=InlineQueryResultsButton(text="Спросить бота в личном чате", start_parameter="inline")
+    )
+
+
+async def prewarm_answers(snapshot):
+    """
+    Заранее получить ответы на частые вопросы для снимка (в фоне).
+
+    Вопросы - список FAQ_QUESTIONS и PREWARM_TOP_N самых частых вопросов
+    пользователей; уже закэшированные для этой версии пропускаются.
+    Одновременно выполняется не больше PREWARM_CONCURRENCY запросов, чтобы
+    не занимать API и пул потоков, нужные живым вопросам.
+    """
+    questions = await run_blocking(
+        lambda: answer_cache.missing(
+            config.faq_questions + answer_cache.top_questions(config.prewarm_top_n), snapshot.version
+        )
+    )
+    if not questions:
+        return
+
+    logger.info(f"Подготовка ответов на частые вопросы: {len(questions)} (контекст {snapshot.version})")
+    semaphore = asyncio.Semaphore(config.prewarm_concurrency)
+
+    async def prewarm(question):
+        async with semaphore:
+            # Контекст успел смениться - ответ для старой версии уже не нужен
+            if watcher.snapshot.version != snapshot.version:
+                return False
+            try:
+                answer = await request_answer(snapshot, None, question, "[prewarm]")
+            except Exception as e:
+                logger.warning(f"[prewarm] Не удалось получить ответ на «{question[:100]}»: {e}")
+                return False
+            await run_blocking(answer_cache.put, question, answer, snapshot.version)
+            return True
+
+    started = time.perf_counter()
+    done = await asyncio.gather(*(prewarm(question) for question in questions))
+    logger.info(
+        f"Частые вопросы: готово {sum(done)} из {len(questions)} "
+        f"за {time.perf_counter() - started:.1f} с (контекст {snapshot.version})"
+    )
+
+
 async def error_handler(update: Update, context_obj):
     """Обработчик необработанных ошибок"""
     logger.error(f"Update {update} caused error {context_obj.error}", exc_info=context_obj.error)
 
 
-def main():
-    """Основная функция запуска бота"""
-    global config, hydra_client, system_prompt, context
+async def post_init(application):
+    """Запуск фоновых задач после инициализации бота"""
+    global outbound
 
-    print("=" * 80)
-    print("🤖 Telegram Bot с Hydra AI интеграцией")
-    print("=" * 80)
+    # Глобальный лимит Telegram делится между процессами-воркерами
+    outbound = OutboundDispatcher(
+        application.bot,
+        global_rate=config.outbound_rate / max(1, config.bot_workers)
+    )
+    application.create_task(outbound.run())
+
+    if config.reload_interval > 0:
+        application.create_task(watcher.run(config.reload_interval))
+
+    if config.loop_lag_interval > 0:
+        application.create_task(LoopLagMonitor(config.loop_lag_interval).run())
+
+    # Ответы на частые вопросы готовит один процесс, остальные подгружают их из кэша
+    if config.prewarm_concurrency > 0 and worker_index == 0:
+        application.create_task(prewarm_answers(watcher.snapshot))
+
+
+def load_config():
+    """Загрузка конфигурации (шаг 1)"""
+    global config
 
-    # Загрузка конфигурации
     try:
         print("\n[1/4] Загрузка конфигурации...")
         config = BotConfig()
         print(f"  ✓ Модель: {config.model}")
         print(f"  ✓ Temperature: {config.temperature}")
         print(f"  ✓ Max tokens: {config.max_tokens}")
+        print(f"  ✓ Max input tokens: {config.max_input_tokens}")
     except Exception as e:
         print(f"\n❌ Ошибка загрузки конфигурации: {e}")
         sys.exit(1)
 
-    # Загрузка system prompt
-    try:
-        print("\n[2/4] Загрузка system prompt...")
-        system_prompt = config.load_system_prompt()
-        print(f"  ✓ Загружен из: {config.system_prompt_file}")
-        print(f"  ✓ Длина: {len(system_prompt)} символов")
-    except Exception as e:
-        print(f"\n❌ Ошибка загрузки system prompt: {e}")
-        sys.exit(1)
 
-    # Загрузка контекста
+async def switch_answer_cache(snapshot):
+    """Переключить кэш ответов на новую версию снимка и подготовить ответы на частые вопросы"""
+    await run_blocking(answer_cache.set_version, snapshot.version)
+    if config.prewarm_concurrency > 0 and worker_index == 0:
+        await prewarm_answers(snapshot)
+
+
+def on_context_reload(snapshot):
+    """После подмены снимка (вызывается в event loop)"""
+    asyncio.get_running_loop().create_task(switch_answer_cache(snapshot))
+
+
+def init_runtime():
+    """
+    Загрузка контекста и инициализация клиентов (шаги 2-4).
+
+    Выполняется в процессе, который обрабатывает сообщения: в единственном
+    процессе бота или в каждом процессе-воркере (см. worker_pool.py).
+    """
+    global hydra_client, watcher, conversations, chat_vectors, local_answers, answer_cache, router
+
+    # Загрузка system prompt и контекста
     try:
-        print("\n[3/4] Загрузка контекста...")
-        context = load_all_context(str(config.result_dir))
-        stats = get_context_stats(context)
-        print(f"  ✓ Загружено файлов: 7")
+        print("\n[2/4] Загрузка system prompt и контекста...")
+        snapshot = load_snapshot(config.result_dir, config.system_prompt_file, config.snapshot_file)
+        stats = snapshot.stats
+        print(f"  ✓ System prompt: {config.system_prompt_file} ({len(snapshot.system_prompt)} символов)")
+        print(f"  ✓ Источник: {snapshot.source}")
+        print(f"  ✓ Загружено файлов: {len({chunk['file'] for chunk in snapshot.chunks if chunk['file']})}")
         print(f"  ✓ Символов: {stats['chars']:,}")
         print(f"  ✓ Слов: {stats['words']:,}")
         print(f"  ✓ Строк: {stats['lines']:,}")
+        print(f"  ✓ Токенов: {sum(snapshot.indexes['chunk_tokens']['counts']):,} ({get_tokenizer_name()})")
+        print(f"  ✓ Версия: {snapshot.version}")
     except Exception as e:
         print(f"\n❌ Ошибка загрузки контекста: {e}")
         sys.exit(1)
 
+    # Наблюдение за изменениями контекста
+    print("\n[3/4] Горячая перезагрузка контекста...")
+    watcher = ContextWatcher(
+        config.result_dir, config.system_prompt_file, snapshot,
+        on_reload=on_context_reload,
+        snapshot_file=config.snapshot_file
+    )
+    if config.reload_interval > 0:
+        print(f"  ✓ Проверка изменений каждые {config.reload_interval} с")
+    else:
+        print("  ✓ Отключена (RELOAD_INTERVAL=0)")
+
     # Инициализация Hydra AI клиента
     try:
         print("\n[4/4] Инициализация Hydra AI клиента...")
         hydra_client = HydraAIClient(
             api_key=config.api_key,
             api_url=config.api_url,
-            model=config.model
+            model=config.model,
+            compress=config.api_gzip,
+            pool_size=config.api_workers
         )
         print(f"  ✓ API URL: {config.api_url}")
         print(f"  ✓ Модель: {config.model}")
@@ -232,24 +622,132 @@ def main():
         print(f"\n❌ Ошибка инициализации клиента: {e}")
         sys.exit(1)
 
-    # Создание приложения бота
-    print("\n[*] Запуск Telegram бота...")
-    application = Application.builder().token(config.telegram_token).build()
-
-    # Регистрация обработчиков
+    # Выбор модели по вопросу
+    if config.router_enabled and config.fast_model == config.model:
+        print("\n[*] ROUTER_ENABLED без отдельной FAST_MODEL: маршрутизация выключена")
+    elif config.router_enabled:
+        router = QuestionRouter()
+        print(f"\n[*] Простые вопросы: {config.fast_model}, max_tokens {config.fast_max_tokens}")
+
+    # Пул потоков для блокирующих операций
+    init_executor(config.executor_workers, config.api_workers)
+    print(f"\n[*] Пул потоков для блокирующих операций: {config.executor_workers}, "
+          f"для запросов к API: {config.api_workers}")
+
+    # История диалогов
+    conversations = ConversationStore(
+        db_path=config.conversation_db or None,
+        max_chats=config.history_max_chats,
+        max_turns=config.history_turns
+    )
+    print(f"\n[*] История диалогов: {config.conversation_db or 'только в памяти'}")
+
+    # Кэш ответов (inline-режим)
+    answer_cache = AnswerCache(
+        db_path=config.answer_cache_db or None,
+        faq_questions=config.faq_questions,
+        min_users=config.popular_min_users
+    )
+    answer_cache.set_version(snapshot.version)
+    print(f"\n[*] Кэш ответов: {config.answer_cache_db or 'только в памяти'} "
+          f"({len(answer_cache)} ответов для версии {snapshot.version})")
+
+    # Локальные ответы команд /stats, /who, /when, /search
+    local_answers = LocalAnswers(config.chat_index_db, config.participant_stats_file)
+    print(f"\n[*] Быстрые ответы: {config.chat_index_db}"
+          f"{'' if config.chat_index_db.exists() else ' (не построен)'}, "
+          f"{config.participant_stats_file}{'' if config.participant_stats_file.exists() else ' (нет)'}")
+
+    # Векторный индекс исходных сообщений (необязательный)
+    if config.chat_vectors_top_k > 0:
+        chat_vectors = open_index(config.chat_vectors_dir)
+        if chat_vectors:
+            print(f"\n[*] Индекс сообщений чата: {config.chat_vectors_dir} "
+                  f"({len(chat_vectors)} окон, {chat_vectors.meta['model']})")
+
+
+def create_application(with_updater=True, **callbacks):
+    """
+    Создать приложение python-telegram-bot.
+
+    Args:
+        with_updater: Получать обновления самостоятельно (polling/webhook);
+                      False - для воркеров, которым обновления передаёт ingress
+        callbacks: post_init, post_shutdown и т.п. для ApplicationBuilder
+
+    Returns:
+        Application: Приложение бота
+    """
+    builder = Application.builder().token(config.telegram_token)
+    if config.telegram_api_url:
+        builder = builder.base_url(f"{config.telegram_api_url.rstrip('/')}/bot")
+    if not with_updater:
+        builder = builder.updater(None)
+    for name, callback in callbacks.items():
+        builder = getattr(builder, name)(callback)
+    return builder.build()
+
+
+def register_handlers(application):
+    """Регистрация обработчиков команд и сообщений"""
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("reset", reset_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("who", who_command))
+    application.add_handler(CommandHandler("when", when_command))
+    application.add_handler(CommandHandler("search", search_command))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    application.add_handler(InlineQueryHandler(inline_query))
     application.add_error_handler(error_handler)
 
-    # Запуск бота
+
+def run_application(application):
+    """Получать обновления через webhook или polling (блокирующий вызов)"""
     print(f"\n✅ Бот запущен успешно!")
     print(f"Время запуска: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 80)
     print("\nБот работает. Нажмите Ctrl+C для остановки.\n")
 
-    # Запуск polling
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if config.bot_mode == 'webhook':
+        # Локальный HTTP-сервер за reverse proxy; Telegram присылает обновления сам
+        webhook_url = f"{config.webhook_url.rstrip('/')}/{config.webhook_path}"
+        print(f"Webhook: {webhook_url} -> {config.webhook_listen}:{config.webhook_port}\n")
+        application.run_webhook(
+            listen=config.webhook_listen,
+            port=config.webhook_port,
+            url_path=config.webhook_path,
+            webhook_url=webhook_url,
+            secret_token=config.webhook_secret,
+            allowed_updates=ALLOWED_UPDATES
+        )
+    else:
+        # Запуск polling
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
+
+
+def main():
+    """Основная функция запуска бота"""
+    print("=" * 80)
+    print("🤖 Telegram Bot с Hydra AI интеграцией")
+    print("=" * 80)
+
+    load_config()
+
+    if config.bot_workers > 0:
+        # Этот процесс только принимает обновления и раздаёт их воркерам
+        from worker_pool import run_ingress
+        run_ingress(sys.modules[__name__], config.bot_workers)
+        return
+
+    init_runtime()
+
+    # Создание приложения бота
+    print("\n[*] Запуск Telegram бота...")
+    application = create_application(post_init=post_init)
+    register_handlers(application)
+
+    run_application(application)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,71 @@
+"""
+Нормализация русского текста для поиска: основа слова (stem) и выражение
+FTS5 MATCH для запроса.
+
+Общая для бота (local_answers.py, context_search.py) и utils/chat_index.py:
+индекс строится и опрашивается одинаково. Модуль не зависит от бота и
+Telegram, поэтому утилиты импортируют его без загрузки бота.
+"""
+
+import re
+
+try:
+    import snowballstemmer
+except ImportError:
+    snowballstemmer = None
+
+
+# Окончания, отбрасываемые без стеммера (от длинных к коротким):
+# основа ищется как префикс, поэтому "проекты" находит "проект", "проекта", "проектов"
+RUSSIAN_ENDINGS = sorted(
+    set("""
+    иями ями ами ими ыми его ого ему ому ией ях ах ов ев ей ий ый ой ая яя ое ее
+    ые ие ую юю ом ем ам ям ых их ть ет ют ут ит ат ят ешь ишь им ла ли ло
+    а я о е ы и у ю ь й
+    """.split()),
+    key=len, reverse=True
+)
+
+WORD_RE = re.compile(r'"[^"]+"|\w+')
+
+# Способ выделения основы: сохранённые индексы, построенные другим способом, перестраиваются
+STEMMER = 'snowball' if snowballstemmer else 'endings'
+
+if snowballstemmer:
+    _stemmer = snowballstemmer.stemmer('russian')
+
+
+def normalize(text):
+    """Нормализация для индекса и запроса: "ё" не отличается от "е" """
+    return (text or '').replace('ё', 'е').replace('Ё', 'Е')
+
+
+def stem(word):
+    """Основа слова (стеммер Snowball, без него - отбрасывание окончания), "ё" не отличается от "е" """
+    word = normalize(word).lower()
+    if snowballstemmer:
+        return _stemmer.stemWord(word)
+    if len(word) <= 3 or not re.search('[а-я]', word):
+        return word
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def build_match(query):
+    """
+    Превратить запрос пользователя в выражение FTS5 MATCH.
+
+    Каждое слово ищется по основе как префикс ("проект"*), фразы в
+    кавычках - точно; все слова должны присутствовать.
+    """
+    terms = []
+    for token in WORD_RE.findall(normalize(query)):
+        if token.startswith('"'):
+            phrase = token.strip('"').replace('"', '')
+            if phrase.strip():
+                terms.append(f'"{phrase}"')
+        else:
+            terms.append(f'"{stem(token)}"*')
+    return ' AND '.join(terms)
@@ -0,0 +1,209 @@
+"""
+Подсчёт токенов и бюджет контекста для запросов к AI.
+
+Использует tiktoken (локальный токенизатор OpenAI), если он установлен,
+иначе - приближённую оценку. Количество токенов каждого фрагмента контекста
+считается один раз и хранится в снимке (индекс chunk_tokens).
+"""
+
+import math
+import re
+from functools import lru_cache
+
+from context_loader import EncodedText, register_index_builder
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# Кодировка по умолчанию (gpt-4o, gpt-4o-mini)
+DEFAULT_ENCODING = 'o200k_base'
+
+# Служебные токены формата chat: на каждое сообщение и на начало ответа
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+# Сколько разных бюджетов помнить на снимок (бюджет зависит от длины истории и вопроса)
+SELECT_MEMO_SIZE = 32
+
+# Порядок важности файлов контекста при урезании: первые сохраняются дольше
+CONTEXT_PRIORITY = [
+    '02-chat_participants.md',
+    '03-projects.md',
+    '07-positions_matrix.md',
+    '04-vision_evolution.md',
+    '05-positions_by_participant.md',
+    '06-positions_evolution.md',
+    '01-methodology.md'
+]
+
+# Слова и серии одинаковых знаков для приближённой оценки
+_WORD_RE = re.compile(r'\w+|([^\w\s])\1*')
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """Получить кодировку tiktoken (None, если tiktoken не установлен)"""
+    if tiktoken is None:
+        return None
+    return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def get_tokenizer_name():
+    """Название используемого токенизатора (для логов и снимка)"""
+    return f"tiktoken/{DEFAULT_ENCODING}" if get_encoding() else "estimate"
+
+
+def estimate_tokens(text):
+    """
+    Приближённо оценить количество токенов без токенизатора.
+
+    Каждое слово даёт примерно один токен на 4 символа (латиница)
+    или на 3 символа (кириллица и прочее), серия одинаковых знаков
+    (например, разделитель из '=') - один токен на 8 знаков.
+
+    Args:
+        text: Текст
+
+    Returns:
+        int: Оценка количества токенов
+    """
+    total = 0
+    for match in _WORD_RE.finditer(text):
+        word = match.group()
+        if match.group(1):
+            chars_per_token = 8
+        else:
+            chars_per_token = 4 if word.isascii() else 3
+        total += math.ceil(len(word) / chars_per_token)
+    return total
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    """
+    Посчитать количество токенов в тексте (с кэшированием).
+
+    Args:
+        text: Текст
+
+    Returns:
+        int: Количество токенов
+    """
+    encoding = get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def build_chunk_tokens(snapshot):
+    """
+    Построить индекс chunk_tokens: количество токенов каждого фрагмента снимка.
+
+    Args:
+        snapshot: ContextSnapshot
+
+    Returns:
+        dict: {'tokenizer': название, 'counts': [токены фрагмента, ...]}
+    """
+    return {
+        'tokenizer': get_tokenizer_name(),
+        'counts': [
+            count_tokens(snapshot.chunk_text(i))
+            for i in range(len(snapshot.chunks))
+        ]
+    }
+
+
+# Число токенов из артефакта, посчитанное другим токенизатором (например, без tiktoken), пересчитывается
+register_index_builder(
+    'chunk_tokens', build_chunk_tokens, persist=True,
+    is_current=lambda index: index.get('tokenizer') == get_tokenizer_name()
+)
+
+
+def count_message_tokens(messages):
+    """
+    Оценить размер запроса в токенах (как prompt_tokens в ответе API).
+
+    Args:
+        messages: Массив сообщений в формате OpenAI
+
+    Returns:
+        int: Количество токенов
+    """
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(message['content'])
+    return total
+
+
+def _select_context(snapshot, budget):
+    """Выбрать фрагменты контекста в пределах бюджета (запоминается в снимке по бюджету)"""
+    selections = snapshot.memo.setdefault('select_context', {})
+    result = selections.get(budget)
+    if result is None:
+        if len(selections) >= SELECT_MEMO_SIZE:
+            selections.clear()
+        result = selections[budget] = _select_chunks(snapshot, budget)
+    return result
+
+
+def _select_chunks(snapshot, budget):
+    """Фрагменты важнейших файлов, помещающиеся в бюджет"""
+    counts = snapshot.indexes['chunk_tokens']['counts']
+    priority = {filename: i for i, filename in enumerate(CONTEXT_PRIORITY)}
+
+    # Сначала более важные файлы, внутри файла - в порядке следования
+    order = sorted(
+        range(len(snapshot.chunks)),
+        key=lambda i: (priority.get(snapshot.chunks[i]['file'], len(priority)), i)
+    )
+
+    selected = []
+    used = 0
+    for i in order:
+        if used + counts[i] <= budget:
+            selected.append(i)
+            used += counts[i]
+
+    selected.sort()
+    context = EncodedText(snapshot.chunk_json(i) for i in selected)
+    return context, used, len(snapshot.chunks) - len(selected)
+
+
+def fit_context(snapshot, user_question, max_input_tokens, history=None):
+    """
+    Подобрать контекст так, чтобы весь запрос уложился в бюджет токенов.
+
+    Если контекст помещается целиком, он возвращается без изменений.
+    Иначе фрагменты менее важных файлов (см. CONTEXT_PRIORITY) отбрасываются.
+
+    Args:
+        snapshot: ContextSnapshot
+        user_question: Вопрос пользователя
+        max_input_tokens: Бюджет на весь запрос (0 - без ограничения)
+        history: Сообщения истории диалога, которые войдут в запрос
+
+    Returns:
+        tuple: (контекст EncodedText, оценка prompt_tokens, количество отброшенных фрагментов)
+    """
+    context_tokens = sum(snapshot.indexes['chunk_tokens']['counts'])
+
+    # Всё, кроме контекста: system prompt, заголовок контекста, история, вопрос, служебные токены
+    overhead = (
+        TOKENS_PER_REPLY + 2 * TOKENS_PER_MESSAGE
+        + count_tokens(snapshot.system_prompt)
+        + count_tokens("\n\n# КОНТЕКСТ\n\n")
+        + count_tokens(user_question)
+    )
+    if history:
+        overhead += count_message_tokens(history) - TOKENS_PER_REPLY
+
+    if not max_input_tokens or overhead + context_tokens <= max_input_tokens:
+        return snapshot.encoded_context, overhead + context_tokens, 0
+
+    context, used, dropped = _select_context(snapshot, max(max_input_tokens - overhead, 0))
+    return context, overhead + used, dropped
@@ -0,0 +1,237 @@
+"""
+Многопроцессный режим Telegram-бота.
+
+Один процесс (ingress) получает обновления через polling или webhook и
+раздаёт их пулу процессов-воркеров через очереди multiprocessing. Обновления
+одного чата всегда попадают в один и тот же воркер (chat_id % N) и внутри
+него обрабатываются по порядку, поэтому порядок ответов в чате сохраняется.
+
+Каждый воркер загружает снимок контекста сам. Если используется артефакт
+снимка (SNAPSHOT_FILE), текст контекста остаётся в отображённом в память
+файле (memoryview) и копируется только в тело очередного запроса к API,
+поэтому в памяти он один на все воркеры (page cache ОС). Заголовок
+артефакта - таблица фрагментов, статистика и индексы - разбирается каждым
+воркером в собственные объекты.
+
+Ingress следит за воркерами: упавший воркер (OOM killer, segfault в
+нативной библиотеке) перезапускается с новой очередью, а если воркер
+падает снова и снова, ingress останавливается с ошибкой, а не продолжает
+складывать обновления в очередь, которую никто не читает.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import signal
+import sys
+import time
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+
+logger = logging.getLogger(__name__)
+
+# Как часто ingress проверяет, живы ли воркеры (секунды)
+MONITOR_INTERVAL = 1.0
+
+# Больше стольких перезапусков одного воркера за RESTART_WINDOW секунд - остановка бота
+MAX_RESTARTS = 3
+RESTART_WINDOW = 60
+
+
+def run_ingress(bot, worker_count):
+    """
+    Запустить воркеры и принимать обновления в текущем процессе.
+
+    Args:
+        bot: Модуль telegram_bot (уже с загруженной конфигурацией)
+        worker_count: Количество процессов-воркеров
+    """
+    # spawn: воркеры не наследуют потоки и event loop главного процесса
+    ctx = multiprocessing.get_context('spawn')
+    queues = [None] * worker_count
+    processes = [None] * worker_count
+    restarts = [[] for _ in range(worker_count)]
+    state = {'monitor': None, 'failed': None}
+
+    def start_worker(i):
+        """Запустить воркер i с новой очередью"""
+        queues[i] = ctx.Queue()
+        processes[i] = ctx.Process(
+            target=run_worker, args=(i, queues[i]), name=f'bot-worker-{i}', daemon=True
+        )
+        processes[i].start()
+
+    def restart_worker(i, application):
+        """
+        Перезапустить упавший воркер.
+
+        Очередь заменяется новой: упавший процесс мог держать её блокировку
+        чтения. Обновления, оставшиеся в старой очереди и обрабатывавшиеся
+        воркером в момент падения, теряются - это пишется в лог.
+
+        Returns:
+            bool: False, если воркер падает слишком часто и бот остановлен
+        """
+        process, queue = processes[i], queues[i]
+        try:
+            pending = queue.qsize()
+        except NotImplementedError:  # macOS
+            pending = '?'
+        logger.error(
+            f"Воркер {i} завершился (код {process.exitcode}), "
+            f"потеряно обновлений из очереди: {pending}"
+        )
+        # Старую очередь больше никто не читает: при выходе не ждём её фонового потока
+        queue.cancel_join_thread()
+        queue.close()
+
+        now = time.monotonic()
+        restarts[i] = [moment for moment in restarts[i] if now - moment < RESTART_WINDOW] + [now]
+        if len(restarts[i]) > MAX_RESTARTS:
+            state['failed'] = (
+                f"Воркер {i} завершился {len(restarts[i])} раз за {RESTART_WINDOW} с, бот остановлен"
+            )
+            logger.critical(state['failed'])
+            application.stop_running()
+            return False
+
+        start_worker(i)
+        logger.warning(f"Воркер {i} перезапущен (pid {processes[i].pid})")
+        return True
+
+    async def monitor_workers(application):
+        """Проверять воркеры каждые MONITOR_INTERVAL секунд"""
+        while True:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            if not application.running:
+                return
+            for i in range(worker_count):
+                if not processes[i].is_alive() and not restart_worker(i, application):
+                    return
+
+    print(f"\n[*] Запуск {worker_count} воркеров...")
+    for i in range(worker_count):
+        start_worker(i)
+
+    async def dispatch_update(update: Update, context_obj):
+        """Передать обновление воркеру, закреплённому за чатом"""
+        chat = update.effective_chat
+        key = chat.id if chat else update.update_id
+        queues[key % worker_count].put(update.to_dict())
+
+    async def post_init(application):
+        """Начать наблюдение за воркерами"""
+        state['monitor'] = asyncio.create_task(monitor_workers(application))
+
+    async def post_shutdown(application):
+        """Остановить воркеры после остановки приёма обновлений"""
+        # Сначала наблюдение: воркеры, завершающиеся по команде, не перезапускаются
+        if state['monitor']:
+            state['monitor'].cancel()
+        for i in range(worker_count):
+            if processes[i].is_alive():
+                queues[i].put(None)
+        for process in processes:
+            await asyncio.to_thread(process.join, 10)
+            if process.is_alive():
+                process.terminate()
+
+    application = bot.create_application(post_init=post_init, post_shutdown=post_shutdown)
+    application.add_handler(TypeHandler(Update, dispatch_update))
+
+    bot.run_application(application)
+
+    if state['failed']:
+        print(f"\n❌ {state['failed']}")
+        sys.exit(1)
+
+
+def run_worker(index, queue):
+    """
+    Точка входа процесса-воркера.
+
+    Args:
+        index: Номер воркера
+        queue: Очередь обновлений (словари Update.to_dict(), None - остановка)
+    """
+    import telegram_bot as bot
+
+    # Ctrl+C получает вся группа процессов: воркеры останавливает ingress (None в очереди)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    bot.worker_index = index
+    bot.load_config()
+    bot.init_runtime()
+
+    asyncio.run(worker_loop(bot, index, queue))
+
+
+async def worker_loop(bot, index, queue):
+    """
+    Обрабатывать обновления из очереди.
+
+    Обновления разных чатов обрабатываются параллельно (до
+    WORKER_CONCURRENCY одновременно), одного чата - строго по очереди.
+
+    Args:
+        bot: Модуль telegram_bot с инициализированным состоянием
+        index: Номер воркера
+        queue: Очередь обновлений
+    """
+    application = bot.create_application(with_updater=False)
+    bot.register_handlers(application)
+
+    semaphore = asyncio.Semaphore(bot.config.worker_concurrency)
+    chat_locks = {}
+    chat_pending = {}
+    tasks = set()
+
+    async def process(chat_id, update):
+        # Сначала блокировка чата, затем слот: обновления, ждущие свой чат, не занимают слоты
+        lock = chat_locks.setdefault(chat_id, asyncio.Lock())
+        try:
+            async with lock:
+                async with semaphore:
+                    await application.process_update(update)
+        finally:
+            chat_pending[chat_id] -= 1
+            if not chat_pending[chat_id]:
+                del chat_pending[chat_id]
+                del chat_locks[chat_id]
+
+    loop = asyncio.get_running_loop()
+
+    async with application:
+        await application.start()
+        existing = asyncio.all_tasks()
+        await bot.post_init(application)
+        # Фоновые задачи post_init (очередь отправки, наблюдение за контекстом) бесконечны
+        background = asyncio.all_tasks() - existing
+        logger.info(f"Воркер {index} готов")
+
+        while True:
+            data = await loop.run_in_executor(None, queue.get)
+            if data is None:
+                break
+
+            update = Update.de_json(data, application.bot)
+            chat = update.effective_chat
+            chat_id = chat.id if chat else update.update_id
+            chat_pending[chat_id] = chat_pending.get(chat_id, 0) + 1
+
+            task = asyncio.create_task(process(chat_id, update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Ответы отправлены; stop() ждёт все задачи приложения, включая бесконечные фоновые
+        for task in background:
+            task.cancel()
+
+        await application.stop()
+
+    logger.info(f"Воркер {index} остановлен")
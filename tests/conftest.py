@@ -0,0 +1,6 @@
+"""Модули бота импортируются плоско (как при запуске из app/)"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'app'))
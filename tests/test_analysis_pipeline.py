@@ -0,0 +1,55 @@
+"""
+Окна анализа: новые сообщения (тёзка нового участника, ответ на старое
+сообщение) не меняют текст прежних окон, поэтому их ответы берутся из кэша.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'utils'))
+from analysis_pipeline import build_windows, split_days  # noqa: E402
+
+
+def record(message_id, day, author, text, reply_to_id=None):
+    return {
+        'id': message_id, 'date': f"2025-03-{day:02d}T12:{message_id % 60:02d}:00", 'author': author,
+        'reply_to_id': reply_to_id, 'forwarded_from': None, 'text': text, 'transcript': None,
+        'voice_seconds': None, 'media': None, 'reactions': [],
+    }
+
+
+def history():
+    authors = ['Анна Смирнова', 'Борис Иванов', 'Ан Ли']
+    return [
+        record(i, 1 + i // 6, authors[i % 3], f"сообщение {i} про проект и сервер " * 5)
+        for i in range(1, 60)
+    ]
+
+
+def test_appending_messages_keeps_earlier_windows():
+    records = history()
+    before = build_windows(split_days(records), 400)
+    assert len(before) > 3
+
+    # Тёзка Анны (короткие имена стали бы "Анна С." и "Анна П.") и ответ на самое первое сообщение
+    records += [
+        record(100, 20, 'Анна Петрова', "новая участница"),
+        record(101, 20, 'Борис Иванов', "ответ на первое сообщение", reply_to_id=1),
+    ]
+    after = build_windows(split_days(records), 400)
+
+    assert [w['text'] for w in after[:len(before) - 1]] == [w['text'] for w in before[:-1]]
+
+
+def test_legend_lists_only_window_authors():
+    records = [
+        record(1, 1, 'Ан Ли', "привет"),
+        record(2, 1, 'Борис Иванов', "привет"),
+        record(3, 2, 'Анна Смирнова', "Анна на связи, Анна готова"),
+    ]
+
+    first, second = build_windows(split_days(records), 30)
+
+    # Короткое имя "Ан" - префикс "Анна": расшифровка берётся из заголовков сообщений окна
+    assert 'Ан Ли' in first['text'] and 'Анна Смирнова' not in first['text']
+    assert second['text'].startswith('Участники: Анна = Анна Смирнова\n')
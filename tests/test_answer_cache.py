@@ -0,0 +1,78 @@
+"""
+Поиск по кэшу ответов (inline-режим) не показывает личные вопросы:
+только FAQ и вопросы, заданные несколькими разными пользователями.
+"""
+
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache
+
+FAQ = ["Что такое проект MyBox?"]
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache(request, tmp_path):
+    db_path = tmp_path / 'answers.db' if request.param == 'sqlite' else None
+    cache = AnswerCache(db_path=db_path, faq_questions=FAQ, min_users=3)
+    cache.set_version('v1')
+    return cache
+
+
+def ask(cache, question, user_id, answer):
+    cache.record_question(question, user_id)
+    cache.put(question, answer, 'v1')
+
+
+def test_private_question_is_not_searchable(cache):
+    ask(cache, "Почему Борис ушёл из команды, мне он лично писал?", 1, "Ответ про Бориса")
+
+    assert cache.search("Борис") == []
+
+
+def test_faq_is_searchable(cache):
+    cache.put(FAQ[0], "MyBox - домашний сервер", 'v1')
+
+    assert cache.search("mybox") == [(FAQ[0], "MyBox - домашний сервер")]
+
+
+def test_question_of_many_users_is_shown_normalized(cache, monkeypatch):
+    monkeypatch.setattr(answer_cache, 'REFRESH_INTERVAL', 0)
+    for user_id in (1, 2):
+        ask(cache, "Кто такой БОРИС?!", user_id, "Борис - разработчик")
+    assert cache.search("борис") == []
+
+    ask(cache, "кто такой Борис", 3, "Борис - разработчик")
+
+    assert cache.search("борис") == [("Кто такой борис?", "Борис - разработчик")]
+    # Для ответа заранее (prewarm) берётся последняя формулировка, а не ключ
+    assert cache.top_questions(5) == ["кто такой Борис"]
+
+
+def test_repeats_of_one_user_do_not_count(cache, monkeypatch):
+    monkeypatch.setattr(answer_cache, 'REFRESH_INTERVAL', 0)
+    for _ in range(5):
+        ask(cache, "Кто такой Борис?", 1, "Борис - разработчик")
+
+    assert cache.search("борис") == []
+    assert cache.top_questions(5) == []
+
+
+def test_popular_questions_are_shared_between_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(answer_cache, 'REFRESH_INTERVAL', 0)
+    writer = AnswerCache(db_path=tmp_path / 'answers.db', min_users=2)
+    reader = AnswerCache(db_path=tmp_path / 'answers.db', min_users=2)
+    writer.set_version('v1')
+    reader.set_version('v1')
+
+    for user_id in (1, 2):
+        ask(writer, "Кто такой Борис?", user_id, "Борис - разработчик")
+
+    assert reader.search("борис") == [("Кто такой борис?", "Борис - разработчик")]
+
+
+def test_database_uses_wal(tmp_path):
+    cache = AnswerCache(db_path=tmp_path / 'answers.db')
+
+    # Запись одного воркера не блокирует чтение остальных
+    assert cache._db.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
@@ -0,0 +1,122 @@
+"""
+Снимок контекста из артефакта: контекст остаётся в mmap, а тело запроса
+к API совпадает с json.dumps обычных сообщений.
+"""
+
+import gc
+import json
+import weakref
+
+import pytest
+
+import context_search  # noqa: F401
+import token_counter  # noqa: F401
+from context_loader import CONTEXT_FILES, load_all_context, load_snapshot
+from context_search import search_chunks
+from hydra_client import encode_payload
+from message_handler import build_messages
+from snapshot_artifact import build_snapshot_artifact
+from token_counter import fit_context
+
+
+@pytest.fixture
+def context_dir(tmp_path):
+    result_dir = tmp_path / 'result'
+    result_dir.mkdir()
+    for i, filename in enumerate(CONTEXT_FILES):
+        sections = '\n'.join(
+            f"## Раздел {j} «{filename}»\n\nТекст с \"кавычками\", \\ и \tтабуляцией, 😀🇷🇺 {'проект ' * (i + j)}\n"
+            for j in range(5)
+        )
+        (result_dir / filename).write_text(f"Вступление {i}\n\n{sections}", encoding='utf-8')
+
+    prompt_file = tmp_path / 'system_prompt.txt'
+    prompt_file.write_text('Ты - ассистент "Майя".', encoding='utf-8')
+    return result_dir, prompt_file
+
+
+@pytest.fixture(params=['artifact', 'result'])
+def snapshot(request, context_dir, tmp_path):
+    result_dir, prompt_file = context_dir
+    snapshot_file = None
+    if request.param == 'artifact':
+        snapshot_file = tmp_path / 'context.snapshot'
+        build_snapshot_artifact(result_dir, snapshot_file)
+    return load_snapshot(result_dir, prompt_file, snapshot_file)
+
+
+def test_artifact_context_stays_in_mmap(context_dir, tmp_path):
+    result_dir, prompt_file = context_dir
+    snapshot_file = tmp_path / 'context.snapshot'
+    build_snapshot_artifact(result_dir, snapshot_file)
+
+    snapshot = load_snapshot(result_dir, prompt_file, snapshot_file)
+
+    assert isinstance(snapshot.context_json, memoryview)
+    assert snapshot.context == load_all_context(str(result_dir))
+
+
+def test_chunks_match_context(snapshot, context_dir):
+    context = load_all_context(str(context_dir[0]))
+
+    texts = [snapshot.chunk_text(i) for i in range(len(snapshot.chunks))]
+
+    assert ''.join(texts) == context
+    assert [chunk['title'] for chunk in snapshot.chunks if chunk['title'].startswith('Раздел')]
+
+
+@pytest.mark.parametrize('budget', [0, 400])
+def test_payload_matches_json_dumps(snapshot, budget):
+    history = [{'role': 'user', 'content': 'прошлый вопрос'}, {'role': 'assistant', 'content': 'ответ'}]
+    context, _, dropped = fit_context(snapshot, 'Кто такой "Борис"?', budget, history)
+    assert bool(dropped) == bool(budget)
+
+    messages = build_messages(snapshot.system_prompt, context, 'Кто такой "Борис"?', history)
+    body = encode_payload('gpt-4o-mini', messages, 0.7, 2000)
+
+    expected = {
+        'model': 'gpt-4o-mini',
+        'messages': [
+            {'role': 'system', 'content': f"{snapshot.system_prompt}\n\n# КОНТЕКСТ\n\n{context}"},
+            *history,
+            {'role': 'user', 'content': 'Кто такой "Борис"?'},
+        ],
+        'temperature': 0.7,
+        'max_tokens': 2000,
+    }
+    assert json.loads(body) == expected
+
+
+@pytest.mark.parametrize('use_artifact', [True, False])
+def test_caches_do_not_keep_old_snapshots(context_dir, tmp_path, use_artifact):
+    result_dir, prompt_file = context_dir
+    snapshot_file = None
+    if use_artifact:
+        snapshot_file = tmp_path / 'context.snapshot'
+        build_snapshot_artifact(result_dir, snapshot_file)
+    snapshot = load_snapshot(result_dir, prompt_file, snapshot_file)
+    for budget in (0, 400):
+        context, _, _ = fit_context(snapshot, 'Кто такой Борис?', budget)
+        encode_payload('gpt-4o-mini', build_messages(snapshot.system_prompt, context, 'Кто такой Борис?'), 0.7, 2000)
+    assert search_chunks(snapshot, 'прое')
+
+    ref = weakref.ref(snapshot)
+    del snapshot, context
+    gc.collect()
+
+    assert ref() is None
+
+
+def test_stale_result_is_reported(context_dir, tmp_path, caplog):
+    result_dir, prompt_file = context_dir
+    snapshot_file = tmp_path / 'context.snapshot'
+    build_snapshot_artifact(result_dir, snapshot_file)
+
+    with caplog.at_level('INFO', logger='context_loader'):
+        assert load_snapshot(result_dir, prompt_file, snapshot_file).source.startswith('снимок')
+
+        (result_dir / CONTEXT_FILES[0]).write_text('Старая версия', encoding='utf-8')
+        snapshot = load_snapshot(result_dir, prompt_file, snapshot_file)
+
+    assert snapshot.source == f"файлы {result_dir}"
+    assert any(record.levelname == 'WARNING' for record in caplog.records)
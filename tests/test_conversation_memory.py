@@ -0,0 +1,26 @@
+"""
+Сворачивание истории: пары, вытесненные за время запроса summary, остаются
+в pending, даже если совпадают со свёрнутыми.
+"""
+
+from conversation_memory import ConversationStore
+
+
+def test_repeated_turn_survives_summary(tmp_path):
+    store = ConversationStore(db_path=tmp_path / 'conversations.db', max_turns=1)
+    store.add_turn(1, "Привет", "Здравствуйте")
+    store.add_turn(1, "Что нового?", "Ничего")
+
+    summary, folded = store.take_pending(1)
+    assert folded == [("Привет", "Здравствуйте")]
+
+    # Пока сворачивание идёт, пользователь повторил тот же вопрос и получил тот же ответ
+    store.add_turn(1, "Привет", "Здравствуйте")
+    store.add_turn(1, "Пока", "До свидания")
+    store.finish_summary(1, folded, "Поздоровались")
+
+    assert store.get(1).pending == [("Что нового?", "Ничего"), ("Привет", "Здравствуйте")]
+
+    reloaded = ConversationStore(db_path=tmp_path / 'conversations.db', max_turns=1)
+    assert reloaded.get(1).summary == "Поздоровались"
+    assert reloaded.get(1).pending == [("Что нового?", "Ничего"), ("Привет", "Здравствуйте")]
@@ -0,0 +1,40 @@
+"""
+Основа слова и запрос FTS5 общие для бота и utils/chat_index.py;
+повреждённая статистика даёт ошибку, которую ловит обработчик команды.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+import local_answers
+import text_normalize
+from local_answers import LocalAnswers
+from text_normalize import build_match, stem
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'utils'))
+import chat_index  # noqa: E402
+
+
+def test_chat_index_uses_bot_query_builder():
+    assert chat_index.build_match is local_answers.build_match is build_match
+    assert chat_index.normalize is text_normalize.normalize
+
+
+def test_stem_ignores_case_and_yo():
+    assert stem("Ёлки") == stem("елки")
+    assert build_match('проекты "голосовой ассистент"') == f'"{stem("проекты")}"* AND "голосовой ассистент"'
+
+
+def test_corrupt_stats_raise_and_recover(tmp_path):
+    stats_file = tmp_path / 'stats.json'
+    stats_file.write_text('{"authors": [', encoding='utf-8')
+    answers = LocalAnswers(tmp_path / 'missing.db', stats_file)
+
+    with pytest.raises(json.JSONDecodeError):
+        answers.stats()
+
+    stats_file.write_text(json.dumps({'messages': 0, 'authors': []}), encoding='utf-8')
+    assert answers.stats().startswith("📊 Активность участников (0 сообщений)")
@@ -0,0 +1,138 @@
+"""
+Свойства split_long_message: лимит в UTF-16, сохранность текста,
+сбалансированные блоки кода и завершение на эмодзи вне BMP, ZWJ и флагах.
+"""
+
+import signal
+from contextlib import contextmanager
+
+import pytest
+
+from message_handler import _FENCE_RE, split_long_message, utf16_length
+
+
+@contextmanager
+def deadline(seconds=5):
+    """Зависание разбиения - падение теста, а не вечный прогон"""
+    def expire(signum, frame):
+        raise TimeoutError(f"split_long_message не завершился за {seconds} с")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.alarm(seconds)
+    try:
+        yield
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def split(text, max_length=4000):
+    with deadline():
+        return split_long_message(text, max_length)
+
+
+def stripped(text):
+    """Текст без строк-оград и пробельных символов: так сравниваются исходник и части"""
+    return ''.join(_FENCE_RE.sub('', text).split())
+
+
+def check_parts(text, parts, max_length, fences=True):
+    assert parts
+    for part in parts:
+        assert utf16_length(part) <= max_length
+        if fences:
+            assert len(_FENCE_RE.findall(part)) % 2 == 0, part
+    assert stripped('\n'.join(parts)) == stripped(text)
+
+
+def test_short_message_is_returned_as_is():
+    assert split("привет 👋", 10) == ["привет 👋"]
+
+
+def test_only_astral_characters():
+    # Регрессия: окно целиком из символов вне BMP не продвигалось
+    text = '😀' * 5000
+    parts = split(text)
+    check_parts(text, parts, 4000)
+    assert ''.join(parts) == text
+
+
+def test_fences_and_flags_with_small_limit():
+    # Регрессия: зависание на пустом блоке кода перед эмодзи и флагами
+    text = '```\n```\n😀🇷🇺🇷🇺😀'
+    parts = split(text, 10)
+    for part in parts:
+        assert utf16_length(part) <= 10
+    assert stripped('\n'.join(parts)) == stripped(text)
+
+
+@pytest.mark.parametrize('sequence', [
+    '👨‍👩‍👧‍👦',   # ZWJ-семья
+    '🇷🇺',                          # флаг
+    '👍🏽',                          # модификатор цвета кожи
+    'é',                      # комбинирующий знак
+])
+def test_grapheme_sequences_terminate(sequence):
+    for max_length in (2, 3, 5, 7, 11, 4000):
+        text = sequence * (3 * max_length)
+        parts = split(text, max_length)
+        check_parts(text, parts, max_length)
+
+
+def test_graphemes_are_not_split_when_they_fit():
+    text = '🇷🇺' * 100
+    for part in split(text, 50):
+        assert len(part) % 2 == 0
+
+
+def test_code_block_is_reopened():
+    code = '\n'.join(f'line_{i} = {i}' for i in range(200))
+    text = f"Пример:\n\n```python\n{code}\n```\n\nКонец."
+    parts = split(text, 300)
+    check_parts(text, parts, 300)
+    assert len(parts) > 2
+    for part in parts[1:-1]:
+        assert part.startswith('```python\n')
+
+
+hypothesis = pytest.importorskip('hypothesis')
+from hypothesis import given, settings, strategies as st  # noqa: E402
+
+WORDS = ['проект', 'бот', 'context', 'x' * 50, '😀', '👍🏽', '🇷🇺', '👨‍👩‍👧', 'é', 'код;']
+SEPARATORS = [' ', '\n', '\n\n', '\t', '. ']
+
+word = st.sampled_from(WORDS)
+paragraph = st.lists(word, min_size=1, max_size=40).map(' '.join)
+code_block = st.tuples(
+    st.sampled_from(['```', '```python', '```json']),
+    st.lists(paragraph.map(lambda line: '    ' + line), min_size=1, max_size=20),
+).map(lambda block: '\n' + '\n'.join([block[0], *block[1], '```']) + '\n')
+markdown = st.lists(
+    st.tuples(st.one_of(paragraph, paragraph, code_block), st.sampled_from(SEPARATORS)),
+    max_size=30,
+).map(lambda chunks: ''.join(chunk + separator for chunk, separator in chunks))
+
+
+@settings(max_examples=300, deadline=None)
+@given(markdown, st.integers(min_value=40, max_value=2000))
+def test_markdown_properties(text, max_length):
+    check_parts(text, split(text, max_length), max_length)
+
+
+@settings(max_examples=300, deadline=None)
+@given(st.text(), st.integers(min_value=2, max_value=200))
+def test_any_text_terminates_within_limit(text, max_length):
+    parts = split(text, max_length)
+    for part in parts:
+        assert utf16_length(part) <= max_length
+
+
+@settings(max_examples=200, deadline=None)
+@given(
+    st.lists(st.sampled_from(['😀', '🇷🇺', '‍', '🏽', '️', 'a', '```', '\n']), max_size=300).map(''.join),
+    st.integers(min_value=2, max_value=50),
+)
+def test_emoji_soup_terminates(text, max_length):
+    parts = split(text, max_length)
+    for part in parts:
+        assert utf16_length(part) <= max_length
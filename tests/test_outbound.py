@@ -0,0 +1,34 @@
+"""
+Ответ из нескольких частей: первая часть цитирует вопрос, части уходят по порядку.
+"""
+
+import asyncio
+
+from outbound import OutboundDispatcher
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text, kwargs))
+        return text
+
+
+def test_first_part_replies_to_question():
+    async def main():
+        bot = FakeBot()
+        dispatcher = OutboundDispatcher(bot, private_interval=0.0)
+        runner = asyncio.create_task(dispatcher.run())
+        try:
+            return bot, await dispatcher.send_parts(42, ['один', 'два', 'три'], reply_to='question')
+        finally:
+            runner.cancel()
+
+    bot, messages = asyncio.run(main())
+
+    assert messages == ['один', 'два', 'три']
+    assert [text for _, text, _ in bot.sent] == messages
+    assert bot.sent[0][2] == {'reply_parameters': 'question'}
+    assert [kwargs for _, _, kwargs in bot.sent[1:]] == [{}, {}]
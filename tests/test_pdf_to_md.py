@@ -0,0 +1,54 @@
+"""
+Пакетная конвертация: имена MD файлов не меняются при появлении документов
+с тем же именем, конвертеры доходят до процессов-воркеров.
+"""
+
+import functools
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'utils'))
+import pdf_to_md  # noqa: E402
+from pdf_to_md import convert_directory, load_manifest, plan_outputs, register_converter  # noqa: E402
+
+
+def convert_txt(src_path, output_path, **options):
+    """Тестовый конвертер: копирует текст"""
+    Path(output_path).write_text(Path(src_path).read_text(encoding='utf-8'), encoding='utf-8')
+    return 1
+
+
+def test_new_namesake_does_not_take_existing_output(tmp_path):
+    docs = [tmp_path / 'report.docx', tmp_path / 'report.pdf']
+    previous = {'report.pdf': {'sha256': 'x', 'output': 'report.md'}}
+
+    assert plan_outputs(docs, tmp_path, previous) == {
+        'report.pdf': 'report.md',
+        'report.docx': 'report.docx.md',
+    }
+    assert plan_outputs(docs, tmp_path) == {'report.docx': 'report.md', 'report.pdf': 'report.pdf.md'}
+
+
+def test_registered_converter_reaches_spawned_workers(tmp_path, monkeypatch):
+    # spawn: воркеры не наследуют CONVERTERS родителя (как на macOS и Windows)
+    monkeypatch.setattr(pdf_to_md, 'ProcessPoolExecutor', functools.partial(
+        ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn')
+    ))
+    monkeypatch.setattr(pdf_to_md, 'CONVERTERS', dict(pdf_to_md.CONVERTERS))
+    register_converter('.txt', convert_txt)
+    register_converter('.text', convert_txt)
+    input_dir, output_dir = tmp_path / 'files', tmp_path / 'out'
+    input_dir.mkdir()
+    (input_dir / 'report.txt').write_text('первый', encoding='utf-8')
+
+    convert_directory(input_dir, output_dir, workers=2)
+    # report.text раньше report.txt по порядку и без манифеста получил бы report.md
+    (input_dir / 'report.text').write_text('второй', encoding='utf-8')
+    convert_directory(input_dir, output_dir, workers=2)
+
+    manifest = load_manifest(output_dir)
+    assert manifest['report.txt']['output'] == 'report.md'
+    assert (output_dir / 'report.md').read_text(encoding='utf-8') == 'первый'
+    assert len({entry['output'] for entry in manifest.values()}) == len(manifest)
@@ -0,0 +1,42 @@
+"""
+Правила выбора модели: основы слов совпадают только с начала слова,
+продолжение диалога - всегда сложный вопрос.
+"""
+
+import pytest
+
+from question_router import COMPLEX, COMPLEX_RE, EXAMPLES, QuestionRouter, normalize
+
+
+@pytest.fixture(scope='module')
+def router():
+    return QuestionRouter()
+
+
+@pytest.mark.parametrize('question', [
+    "Кто занимается спортом?",
+    "Что такое психоанализ?",
+    "Как меня зовут?",
+])
+def test_stems_do_not_match_inside_other_words(question):
+    assert COMPLEX_RE.search(normalize(question)) is None
+
+
+@pytest.mark.parametrize('question', [
+    "Почему спорили о бэкапах?",
+    "Как менялся состав команды?",
+    "Опиши историю проекта",
+])
+def test_complex_rules(router, question):
+    assert router.classify(question) == {'label': COMPLEX, 'reason': 'rule', 'score': 1.0}
+
+
+def test_follow_up_goes_to_strong_model(router):
+    history = [{'role': 'user', 'content': "Кто такой Борис?"}, {'role': 'assistant', 'content': "Разработчик"}]
+
+    assert router.classify("А Анна?", history)['label'] == COMPLEX
+    assert router.classify("Кто такой Борис?", history)['reason'] == 'history'
+
+
+def test_examples_are_classified_by_label(router):
+    assert [label for label, _ in EXAMPLES] == [router.classify(question)['label'] for _, question in EXAMPLES]
@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""
+Анализ чата через LLM: черновики документов result/ по экспорту.
+
+Map-reduce по окнам переписки:
+
+1. Экспорт разбирается (telegram_export.py) и записывается в компактном
+   формате (compact_chat.py) по дням; дни группируются в окна не больше
+   --window-tokens токенов (длинный день делится по строкам).
+2. Map: для каждого окна модель извлекает заметки по разделам
+   (участники, проекты, видение, позиции). Окна обрабатываются
+   параллельно (--concurrency) через HydraAIClient бота, временные ошибки
+   API (таймаут, 429, 5xx, обрыв соединения) повторяются с паузой.
+3. Reduce: для каждого документа из заметок всех окон берутся нужные
+   разделы и сводятся в документ; если заметки не помещаются в
+   --reduce-tokens, они сводятся по частям, затем частичные итоги - вместе.
+
+Ответы модели кэшируются в SQLite по хэшу запроса (версия промптов, модель,
+сообщения, параметры), поэтому после нового экспорта заново
+обрабатываются только изменившиеся окна (обычно последние) и документы,
+в которые попали их заметки. 01-methodology.md и таблицы активности в
+02-chat_participants.md (participant_stats.py) считаются без модели.
+
+Документы пишутся в data/analysis/, а не в result/: в result/ лежат
+выверенные вручную документы, которые читает бот; черновики переносятся
+туда после проверки.
+
+Проверка без сети: --mock запускает локальный mock API
+(benchmarks/mock_llm_server.py), который отвечает по разделам промпта
+и на 5% запросов возвращает ошибку 500 - так проверяются и повторы.
+
+Использование:
+    python utils/analysis_pipeline.py <папка_экспорта|messages.html> [папка_транскрипций] [--output data/analysis]
+
+Примеры:
+    python utils/analysis_pipeline.py "ChatExport/" data/transcriptions
+    python utils/analysis_pipeline.py "ChatExport/" --mock --output /tmp/result
+    python utils/analysis_pipeline.py "ChatExport/" --only 03-projects.md --concurrency 4
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import requests
+except ImportError:
+    print("Ошибка: Необходимо установить библиотеку requests")
+    print("Установите её командой: pip install requests")
+    sys.exit(1)
+
+try:
+    from dotenv import load_dotenv
+except ImportError:
+    print("Ошибка: Необходимо установить библиотеку python-dotenv")
+    print("Установите её командой: pip install python-dotenv")
+    sys.exit(1)
+
+from compact_chat import LEGEND, compact_days, participants_line
+from telegram_export import find_pages, iter_records
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+from hydra_client import HydraAIClient  # noqa: E402
+from token_counter import count_tokens  # noqa: E402
+
+
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_OUTPUT = BASE_DIR / 'data' / 'analysis'
+DEFAULT_CACHE = BASE_DIR / 'data' / 'analysis_cache.db'
+
+# Меняется при изменении смысла промптов: все кэшированные ответы становятся недействительными
+PROMPT_VERSION = 1
+
+TEMPERATURE = 0.2
+MAP_MAX_TOKENS = 1500
+REDUCE_MAX_TOKENS = 4000
+
+# Повторы временных ошибок API: число попыток и первая пауза (удваивается)
+RETRIES = 4
+RETRY_DELAY = 2.0
+
+MAP_PROMPT = """Ты анализируешь фрагмент переписки Telegram-чата проекта "Майя" (персональный AI-ассистент).
+Извлеки из фрагмента только факты, без интерпретаций. Указывай даты (YYYY-MM-DD) и номера
+сообщений (#N), если они есть. Пиши по-русски, кратко, списками. Раздел без фактов пропусти.
+
+Формат ответа - строго эти разделы:
+
+## Участники
+- Имя: роль, чем занимается, что предлагает (дата)
+
+## Проекты
+- Название проекта: суть, кто предложил и развивает, статус (дата)
+
+## Видение
+- Как в этом фрагменте описывается продукт и его концепция, что изменилось (дата, кто)
+
+## Позиции
+- Имя | тема | позиция (за/против/предложение, суть) | дата"""
+
+# Документы result/: разделы заметок, которые в них сводятся, и задание на свод
+DOCUMENTS = {
+    '02-chat_participants.md': {
+        'sections': ['Участники'],
+        'title': 'Участники чата',
+        'task': (
+            'Составь документ об участниках: для каждого - роль в проекте, зона ответственности, '
+            'основные темы и вклад, период активности. Объедини сведения об одном человеке '
+            'из разных фрагментов. Отсортируй по активности.'
+        ),
+        # Дописать таблицы активности (participant_stats.py), посчитанные без модели
+        'stats': True,
+    },
+    '03-projects.md': {
+        'sections': ['Проекты'],
+        'title': 'Проекты',
+        'task': (
+            'Составь каталог проектов, которые обсуждались: описание, кто предложил и развивает, '
+            'история обсуждения по датам, текущий статус, связи с другими проектами.'
+        ),
+    },
+    '04-vision_evolution.md': {
+        'sections': ['Видение'],
+        'title': 'Эволюция концепции',
+        'task': (
+            'Опиши, как менялось видение продукта: этапы по датам, что менялось и по чьей '
+            'инициативе, ключевые решения. Хронологически.'
+        ),
+    },
+    '05-positions_by_participant.md': {
+        'sections': ['Позиции'],
+        'title': 'Позиции по участникам',
+        'task': (
+            'Сгруппируй позиции по участникам: для каждого - его позиции по темам с датами '
+            'и номерами сообщений.'
+        ),
+    },
+    '06-positions_evolution.md': {
+        'sections': ['Позиции', 'Видение'],
+        'title': 'Эволюция позиций',
+        'task': (
+            'Опиши, как менялись позиции участников со временем: по темам, кто и когда '
+            'изменил мнение, к чему пришли.'
+        ),
+    },
+    '07-positions_matrix.md': {
+        'sections': ['Позиции'],
+        'title': 'Матрица позиций',
+        'task': (
+            'Составь markdown-таблицу: строки - участники, столбцы - ключевые темы, в ячейках - '
+            'краткая позиция (за/против/нейтрально и суть). После таблицы - пояснения к темам.'
+        ),
+    },
+}
+
+REDUCE_PROMPT = """Ты составляешь документ базы знаний проекта "Майя" по заметкам, извлечённым из переписки
+чата по фрагментам (в хронологическом порядке). Используй только факты из заметок, без домыслов;
+сохраняй даты и номера сообщений (#N). Ответ - готовый markdown-документ, начинающийся
+с заголовка "# {title}".
+
+{task}"""
+
+PARTIAL_NOTE = "Это часть заметок: составь промежуточный свод, его потом объединят с остальными."
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    kind TEXT,
+    content TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    created TEXT
+);
+"""
+
+
+class ResponseCache:
+    """Кэш ответов модели в SQLite по хэшу запроса"""
+
+    def __init__(self, db_path):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(db_path))
+        self.db.executescript(CACHE_SCHEMA)
+
+    @staticmethod
+    def key(model, messages, max_tokens):
+        """Хэш запроса: версия промптов, модель, сообщения, параметры"""
+        payload = json.dumps(
+            [PROMPT_VERSION, model, messages, TEMPERATURE, max_tokens],
+            ensure_ascii=False, separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        row = self.db.execute("SELECT content FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, kind, content, usage):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, content, usage.get('prompt_tokens'), usage.get('completion_tokens'),
+                 time.strftime('%Y-%m-%dT%H:%M:%S'))
+            )
+
+    def close(self):
+        self.db.close()
+
+
+def split_days(records):
+    """
+    Сообщения по дням (сообщение без даты относится к предыдущему дню, как в compact_days).
+
+    Returns:
+        list: [(день "YYYY-MM-DD", [записи])]
+    """
+    days = []
+    for record in records:
+        day = record['date'][:10] if record['date'] else (days[-1][0] if days else '')
+        if not days or day != days[-1][0]:
+            days.append((day, []))
+        days[-1][1].append(record)
+    return days
+
+
+def render_window(records):
+    """
+    Текст окна: расшифровка имён, легенда и сообщения в компактном формате.
+
+    Короткие имена и номера сообщений (#N) считаются только по сообщениям
+    окна: новый участник-тёзка или ответ на старое сообщение в следующих
+    окнах не меняют текст старого окна и его ответ в кэше.
+    """
+    aliases, days = compact_days(records)
+    return participants_line(aliases) + '\n' + LEGEND + '\n\n' + '\n\n'.join(text for _, text in days)
+
+
+def build_windows(days, window_tokens):
+    """
+    Сгруппировать дни переписки в окна не больше window_tokens токенов.
+
+    Дни идут целиком; день больше окна делится по сообщениям. Окна
+    собираются от начала истории, а размер дня считается только по его
+    сообщениям, поэтому новые сообщения меняют только последние окна.
+
+    Args:
+        days: [(день, [записи])] (split_days)
+        window_tokens: Бюджет окна
+
+    Returns:
+        list: [{'first_day', 'last_day', 'text', 'tokens'}]
+    """
+    # День больше окна - частями; в окне у каждой части свой заголовок дня
+    parts = []
+    for day, records in days:
+        tokens = count_tokens(compact_days(records)[1][0][1])
+        if tokens <= window_tokens:
+            parts.append((day, records, tokens))
+            continue
+        chunk, used = [], 0
+        for record in records:
+            record_tokens = count_tokens(compact_days([record])[1][0][1])
+            if chunk and used + record_tokens > window_tokens:
+                parts.append((day, chunk, used))
+                chunk, used = [], 0
+            chunk.append(record)
+            used += record_tokens
+        if chunk:
+            parts.append((day, chunk, used))
+
+    windows = []
+    current = []
+    used = 0
+    for day, records, tokens in parts:
+        if current and used + tokens > window_tokens:
+            windows.append(current)
+            current, used = [], 0
+        current.append((day, records))
+        used += tokens
+    if current:
+        windows.append(current)
+
+    result = []
+    for window in windows:
+        text = render_window([record for _, records in window for record in records])
+        result.append({
+            'first_day': window[0][0], 'last_day': window[-1][0],
+            'text': text, 'tokens': count_tokens(text),
+        })
+    return result
+
+
+def split_sections(notes):
+    """Разделы заметок окна: {'Участники': текст, ...}"""
+    sections = {}
+    name = None
+    for line in notes.splitlines():
+        if line.startswith('## '):
+            name = line[3:].strip()
+            sections[name] = []
+        elif name:
+            sections[name].append(line)
+    return {name: '\n'.join(lines).strip() for name, lines in sections.items() if '\n'.join(lines).strip()}
+
+
+def is_transient(error):
+    """Стоит ли повторять запрос после такой ошибки"""
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+class LLMRunner:
+    """Параллельные запросы к модели с повторами и кэшем"""
+
+    def __init__(self, client, cache, concurrency):
+        self.client = client
+        self.cache = cache
+        self.concurrency = concurrency
+        self.stats = {'cached': 0, 'requests': 0, 'retries': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        self._lock = threading.Lock()
+
+    def complete(self, messages, max_tokens):
+        """Один запрос с повторами временных ошибок; возвращает (текст, usage)"""
+        delay = RETRY_DELAY
+        for attempt in range(RETRIES + 1):
+            try:
+                response = self.client.chat_completion(
+                    messages, temperature=TEMPERATURE, max_tokens=max_tokens
+                )
+                return self.client.extract_message_content(response), response.get('usage', {})
+            except requests.exceptions.RequestException as e:
+                if attempt == RETRIES or not is_transient(e):
+                    raise
+                with self._lock:
+                    self.stats['retries'] += 1
+                time.sleep(delay)
+                delay *= 2
+
+    def run(self, kind, requests_list, max_tokens):
+        """
+        Выполнить запросы (из кэша или параллельно через API).
+
+        Args:
+            kind: Метка запросов в кэше ('map', 'reduce')
+            requests_list: [messages, ...]
+            max_tokens: Лимит ответа
+
+        Returns:
+            list: Тексты ответов в порядке запросов
+        """
+        keys = [self.cache.key(self.client.model, messages, max_tokens) for messages in requests_list]
+        results = [self.cache.get(key) for key in keys]
+        pending = [i for i, result in enumerate(results) if result is None]
+        self.stats['cached'] += len(results) - len(pending)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                futures = {
+                    executor.submit(self.complete, requests_list[i], max_tokens): i for i in pending
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    content, usage = future.result()
+                    # Кэш пишется из основного потока, сразу: прерванный запуск не теряет готовое
+                    self.cache.put(keys[i], kind, content, usage)
+                    results[i] = content
+                    self.stats['requests'] += 1
+                    self.stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+                    self.stats['completion_tokens'] += usage.get('completion_tokens', 0)
+
+        return results
+
+
+def map_windows(runner, windows):
+    """Map: заметки по каждому окну"""
+    requests_list = [
+        [
+            {"role": "system", "content": MAP_PROMPT},
+            {"role": "user", "content": window['text']},
+        ]
+        for window in windows
+    ]
+    return runner.run('map', requests_list, MAP_MAX_TOKENS)
+
+
+def reduce_document(runner, document, notes, reduce_tokens):
+    """
+    Reduce: свести заметки в документ, при необходимости - по частям.
+
+    Args:
+        runner: LLMRunner
+        document: Описание документа из DOCUMENTS
+        notes: Заметки окон для этого документа, по порядку
+        reduce_tokens: Бюджет заметок на один запрос
+
+    Returns:
+        str: Документ
+    """
+    system = REDUCE_PROMPT.format(title=document['title'], task=document['task'])
+
+    while True:
+        groups = []
+        current, used = [], 0
+        for note in notes:
+            tokens = count_tokens(note)
+            if current and used + tokens > reduce_tokens:
+                groups.append(current)
+                current, used = [], 0
+            current.append(note)
+            used += tokens
+        if current:
+            groups.append(current)
+
+        # Частичный итог может не влезть в бюджет вместе с соседним: тогда число групп
+        # не уменьшается и свод зацикливается. Сводим итоги попарно - запрос выйдет
+        # длиннее бюджета, но каждый круг вдвое сокращает число итогов.
+        if len(notes) > 1 and len(groups) >= len(notes):
+            groups = [notes[i:i + 2] for i in range(0, len(notes), 2)]
+
+        final = len(groups) <= 1
+        prompt = system if final else f"{system}\n\n{PARTIAL_NOTE}"
+        results = runner.run('reduce', [
+            [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": '\n\n'.join(group) or '(заметок нет)'},
+            ]
+            for group in groups or [[]]
+        ], REDUCE_MAX_TOKENS)
+        if final:
+            return results[0]
+        notes = results
+
+
+def methodology(export, windows, records_count, model, window_tokens):
+    """01-methodology.md: как получены документы (без модели)"""
+    return f"""# Методология
+
+Документы базы знаний собраны автоматически по экспорту чата (`utils/analysis_pipeline.py`).
+
+- Экспорт: `{export}`, сообщений: {records_count}
+- Период: {windows[0]['first_day']} - {windows[-1]['last_day']}
+- Переписка разбита на {len(windows)} окон по дням (до {window_tokens} токенов)
+- Модель: {model}, версия промптов: {PROMPT_VERSION}
+
+Для каждого окна модель извлекла факты по разделам: участники, проекты, видение,
+позиции. Затем заметки всех окон сведены в документы. В документах используются
+только факты из переписки; даты и номера сообщений (#N) указывают на источник.
+
+Сгенерировано: {datetime.now().strftime('%Y-%m-%d %H:%M')}
+"""
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Анализ чата через LLM: черновики документов result/')
+    parser.add_argument('export', help='Папка экспорта или messages.html')
+    parser.add_argument('transcriptions', nargs='?', default=None, help='Папка транскрипций голосовых')
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help=f'Папка документов (по умолчанию: {DEFAULT_OUTPUT})')
+    parser.add_argument('--cache', default=str(DEFAULT_CACHE), help=f'Кэш ответов (по умолчанию: {DEFAULT_CACHE})')
+    parser.add_argument('--only', default=None, help='Собрать только эти документы (через запятую)')
+    parser.add_argument('--window-tokens', type=int, default=8000, help='Размер окна в токенах (по умолчанию: 8000)')
+    parser.add_argument('--reduce-tokens', type=int, default=60000, help='Заметок на один запрос свода (по умолчанию: 60000)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Параллельных запросов к API (по умолчанию: 8)')
+    parser.add_argument('--api-url', default=os.getenv('API_URL'), help='API (по умолчанию: API_URL из .env)')
+    parser.add_argument('--model', default=os.getenv('HYDRA_MODEL', 'gpt-4o-mini'), help='Модель (по умолчанию: HYDRA_MODEL)')
+    parser.add_argument('--mock', action='store_true', help='Локальный mock API вместо настоящего')
+    args = parser.parse_args()
+
+    # Частичный итог свода - до REDUCE_MAX_TOKENS: в запрос должны влезать хотя бы два
+    if args.reduce_tokens < 2 * REDUCE_MAX_TOKENS:
+        print(f"Ошибка: --reduce-tokens должен быть не меньше {2 * REDUCE_MAX_TOKENS}")
+        sys.exit(1)
+
+    pages = find_pages(args.export)
+    if not pages:
+        print(f"Ошибка: В {args.export} нет файлов messages*.html")
+        sys.exit(1)
+
+    names = list(DOCUMENTS)
+    if args.only:
+        names = [name.strip() for name in args.only.split(',')]
+        unknown = [name for name in names if name not in DOCUMENTS]
+        if unknown:
+            print(f"Ошибка: Неизвестные документы: {', '.join(unknown)}")
+            sys.exit(1)
+
+    if args.mock:
+        sys.path.insert(0, str(Path(__file__).parent / 'benchmarks'))
+        from mock_llm_server import start_server
+        _, api_url = start_server(latency=0.05, tps=2000, error_rate=0.05)
+        api_key = 'mock'
+    else:
+        api_url, api_key = args.api_url, os.getenv('API_KEY')
+        if not api_url or not api_key:
+            print("Ошибка: API_URL и API_KEY не найдены в .env (или используйте --mock)")
+            sys.exit(1)
+
+    transcriptions = None
+    if args.transcriptions:
+        from inject_transcriptions import load_transcriptions
+        with contextlib.redirect_stdout(None):
+            transcriptions = load_transcriptions(args.transcriptions)
+        print(f"Транскрипций: {len(transcriptions)}")
+
+    started = time.perf_counter()
+    records = list(iter_records(pages, transcriptions))
+    days = split_days(records)
+    windows = build_windows(days, args.window_tokens)
+    print(f"Сообщений: {len(records)}, дней: {len(days)}, окон: {len(windows)}")
+
+    client = HydraAIClient(api_key=api_key, api_url=api_url, model=args.model)
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+    client.session.mount('http://', adapter)
+    client.session.mount('https://', adapter)
+
+    cache = ResponseCache(args.cache)
+    runner = LLMRunner(client, cache, args.concurrency)
+    try:
+        print("\n[1/2] Заметки по окнам...")
+        notes = [split_sections(text) for text in map_windows(runner, windows)]
+        print(f"  ✓ Из кэша: {runner.stats['cached']}, запросов: {runner.stats['requests']}")
+
+        print("\n[2/2] Документы...")
+        output_dir = Path(args.output)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for name in names:
+            document = DOCUMENTS[name]
+            document_notes = []
+            for window, sections in zip(windows, notes):
+                parts = [sections[section] for section in document['sections'] if section in sections]
+                if parts:
+                    document_notes.append(
+                        f"### {window['first_day']} - {window['last_day']}\n" + '\n'.join(parts)
+                    )
+            text = reduce_document(runner, document, document_notes, args.reduce_tokens)
+            if document.get('stats'):
+                from participant_stats import MessageColumns, compute_stats, format_markdown
+                text = text.strip() + '\n\n' + format_markdown(compute_stats(MessageColumns.from_records(records)))
+            (output_dir / name).write_text(text.strip() + '\n', encoding='utf-8')
+            print(f"  ✓ {name} ({len(document_notes)} окон с заметками)")
+
+        if not args.only:
+            (output_dir / '01-methodology.md').write_text(
+                methodology(args.export, windows, len(records), args.model, args.window_tokens),
+                encoding='utf-8'
+            )
+            print("  ✓ 01-methodology.md")
+    finally:
+        cache.close()
+
+    stats = runner.stats
+    print(f"\n✅ Готово за {time.perf_counter() - started:.1f} с: {args.output}")
+    print(f"Ответов из кэша: {stats['cached']}, запросов к API: {stats['requests']} "
+          f"(повторов: {stats['retries']}), токены: {stats['prompt_tokens']} + {stats['completion_tokens']}")
+
+
+if __name__ == '__main__':
+    main()
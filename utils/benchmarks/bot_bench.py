@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Офлайн-бенчмарк пути ответа бота на вопрос.
+
+Прогоняет фиксированный набор вопросов через тот же код, что бот выполняет
+для каждого сообщения - бюджет контекста (fit_context), build_messages,
+HydraAIClient и split_long_message - против локального mock API
+(mock_llm_server.py), без Telegram и без сети.
+
+Для каждого уровня параллельности выводятся перцентили задержки (полной и
+только локальной подготовки запроса), пропускная способность и токены
+запроса на вопрос. Отдельно замеряется fit_context: когда контекст
+помещается целиком и когда урезается под вдвое меньший бюджет. С --api-url
+те же вопросы уходят в настоящий API, а в ответах проверяются ожидаемые
+ключевые слова из questions.txt (грубая оценка качества).
+
+Использование:
+    python utils/benchmarks/bot_bench.py [--result-dir result] [--prompt app/config/system_prompt.txt]
+                                         [--concurrency 1,4,16] [--requests 100] [--json]
+
+Примеры:
+    python utils/benchmarks/bot_bench.py --latency 0.05 --tps 2000
+    python utils/benchmarks/bot_bench.py --json > bench.json
+    API_KEY=sk-... python utils/benchmarks/bot_bench.py --api-url https://api.hydraai.ru/v1/chat/completions -c 1 -n 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent.parent
+sys.path.insert(0, str(REPO_DIR / 'app'))
+
+from context_loader import load_snapshot  # noqa: E402
+from hydra_client import HydraAIClient  # noqa: E402
+from message_handler import build_messages, split_long_message  # noqa: E402
+from token_counter import fit_context, get_tokenizer_name  # noqa: E402
+
+from mock_llm_server import MockLLMHandler, start_server  # noqa: E402
+
+
+def load_questions(path):
+    """
+    Прочитать questions.txt.
+
+    Returns:
+        list: [(вопрос, [ожидаемые ключевые слова])]
+    """
+    questions = []
+    for line in Path(path).read_text(encoding='utf-8').splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        question, _, keywords = line.partition(' | ')
+        questions.append((question.strip(), [k.strip() for k in keywords.split(',') if k.strip()]))
+    return questions
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль отсортированного списка (nearest-rank)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(values):
+    """Среднее и перцентили задержек (в секундах) в миллисекундах"""
+    values = sorted(values)
+    return {
+        'mean': round(statistics.mean(values) * 1000, 3) if values else 0.0,
+        'p50': round(percentile(values, 0.50) * 1000, 3),
+        'p95': round(percentile(values, 0.95) * 1000, 3),
+        'p99': round(percentile(values, 0.99) * 1000, 3),
+    }
+
+
+def bench_fit_context(snapshot, questions, rounds=200):
+    """
+    Замер fit_context по вопросам набора.
+
+    Первый вызов каждого режима - отдельно (подсчёт токенов вопроса и выбор
+    фрагментов ещё не закэшированы), остальные - серией.
+
+    Returns:
+        dict: {режим: {'budget', 'first_ms', 'latency_ms', 'estimated_tokens', 'dropped'}}
+    """
+    # Бюджет 0 - без ограничения: контекст целиком; урезанный - вдвое меньше полного запроса
+    _, full_tokens, _ = fit_context(snapshot, '', 0)
+    modes = {
+        'full': 0,
+        'trimmed': max(1, full_tokens // 2),
+    }
+
+    report = {}
+    for mode, budget in modes.items():
+        started = time.perf_counter()
+        _, estimated, dropped = fit_context(snapshot, questions[0][0], budget)
+        first = time.perf_counter() - started
+
+        timings = []
+        for i in range(rounds):
+            question = questions[i % len(questions)][0]
+            started = time.perf_counter()
+            fit_context(snapshot, question, budget)
+            timings.append(time.perf_counter() - started)
+
+        report[mode] = {
+            'budget': budget,
+            'first_ms': round(first * 1000, 3),
+            'latency_ms': latency_summary(timings),
+            'estimated_tokens': estimated,
+            'dropped': dropped,
+        }
+    return report
+
+
+def ask(snapshot, client, question, max_input_tokens):
+    """
+    Ответить на один вопрос так же, как handle_message.
+
+    Returns:
+        dict: Замеры времени, токены, ответ и ошибка (если была)
+    """
+    started = time.perf_counter()
+    context, estimated, dropped = fit_context(snapshot, question, max_input_tokens)
+    messages = build_messages(snapshot.system_prompt, context, question)
+    prepared = time.perf_counter()
+
+    result = {'prepare': prepared - started, 'estimated_tokens': estimated, 'dropped': dropped}
+    try:
+        response = client.chat_completion(messages)
+        answer = client.extract_message_content(response)
+        result['parts'] = len(split_long_message(answer))
+        result['prompt_tokens'] = response.get('usage', {}).get('prompt_tokens')
+        result['answer'] = answer
+    except Exception as e:
+        result['error'] = str(e)
+
+    result['total'] = time.perf_counter() - started
+    return result
+
+
+def score_answers(questions, results):
+    """Доля найденных в ответах ожидаемых ключевых слов (только вопросы с ключевыми словами)"""
+    found = expected = 0
+    for (question, keywords), result in zip(questions, results):
+        answer = (result.get('answer') or '').lower()
+        expected += len(keywords)
+        found += sum(1 for keyword in keywords if keyword.lower() in answer)
+    return round(found / expected, 3) if expected else None
+
+
+def run_level(snapshot, client, questions, concurrency, total, max_input_tokens, score=False):
+    """
+    Задать total вопросов (по кругу из набора) в concurrency потоков.
+
+    С score=True в ответах проверяются ожидаемые ключевые слова
+    (с mock API бессмысленно: он повторяет вопрос).
+
+    Returns:
+        dict: Отчёт для уровня параллельности
+    """
+    batch = [questions[i % len(questions)] for i in range(total)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda item: ask(snapshot, client, item[0], max_input_tokens), batch
+        ))
+    elapsed = time.perf_counter() - started
+
+    ok = [result for result in results if 'error' not in result]
+    prompt_tokens = [result['prompt_tokens'] for result in ok if result.get('prompt_tokens')]
+
+    report = {
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': len(results) - len(ok),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': latency_summary([result['total'] for result in ok]),
+        'prepare_ms': latency_summary([result['prepare'] for result in results]),
+        'estimated_prompt_tokens': round(statistics.mean(r['estimated_tokens'] for r in results)),
+        'api_prompt_tokens': round(statistics.mean(prompt_tokens)) if prompt_tokens else None,
+        'dropped_chunks': max(result['dropped'] for result in results),
+    }
+
+    keyword_score = score_answers(batch, results) if score else None
+    if keyword_score is not None:
+        report['keyword_score'] = keyword_score
+
+    return report
+
+
+def print_report(report):
+    """Отчёт в читаемом виде"""
+    print(f"Контекст: {report['context_chars']:,} символов, версия {report['context_version']}, "
+          f"токенизатор {report['tokenizer']}")
+    print(f"API: {report['api']}")
+
+    print("\nfit_context:")
+    for mode, info in report['fit_context'].items():
+        latency = info['latency_ms']
+        budget = f"{info['budget']:,}" if info['budget'] else 'без ограничения'
+        print(f"  {mode:<8} бюджет {budget}: первый вызов {info['first_ms']} мс, "
+              f"далее среднее {latency['mean']} мс, p99 {latency['p99']} мс "
+              f"(токенов {info['estimated_tokens']:,}, отброшено фрагментов {info['dropped']})")
+
+    for level in report['levels']:
+        latency = level['latency_ms']
+        prepare = level['prepare_ms']
+        print(f"\nПараллельно {level['concurrency']}: {level['requests']} запросов "
+              f"за {level['elapsed_s']} с, ошибок {level['errors']}")
+        print(f"  Пропускная способность: {level['throughput_rps']} вопросов/с")
+        print(f"  Задержка:   среднее {latency['mean']} мс, p50 {latency['p50']} мс, "
+              f"p95 {latency['p95']} мс, p99 {latency['p99']} мс")
+        print(f"  Подготовка: среднее {prepare['mean']} мс, p95 {prepare['p95']} мс, "
+              f"p99 {prepare['p99']} мс")
+        print(f"  Токены запроса: оценка {level['estimated_prompt_tokens']:,}, "
+              f"API {level['api_prompt_tokens']}, отброшено фрагментов {level['dropped_chunks']}")
+        if 'keyword_score' in level:
+            print(f"  Ключевые слова: найдено {level['keyword_score']:.0%}")
+    if 'mock_api' in report:
+        print(f"\nMock API: {report['mock_api']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Офлайн-бенчмарк ответа бота на вопрос')
+    parser.add_argument('--result-dir', default=str(REPO_DIR / 'result'), help='Директория контекста')
+    parser.add_argument('--prompt', default=str(REPO_DIR / 'app' / 'config' / 'system_prompt.txt'),
+                        help='Файл system prompt')
+    parser.add_argument('--snapshot', default=None, help='Артефакт снимка (вместо --result-dir)')
+    parser.add_argument('--questions', default=str(BENCH_DIR / 'questions.txt'), help='Набор вопросов')
+    parser.add_argument('-c', '--concurrency', default='1,4,16', help='Уровни параллельности (по умолчанию: 1,4,16)')
+    parser.add_argument('-n', '--requests', type=int, default=100, help='Вопросов на уровень (по умолчанию: 100)')
+    parser.add_argument('--max-input-tokens', type=int, default=100000, help='Бюджет запроса (по умолчанию: 100000)')
+    parser.add_argument('--latency', type=float, default=0.3, help='Mock: время до первого токена, с (по умолчанию: 0.3)')
+    parser.add_argument('--tps', type=float, default=80.0, help='Mock: токенов в секунду (по умолчанию: 80)')
+    parser.add_argument('--completion-tokens', type=int, default=150, help='Mock: токенов в ответе')
+    parser.add_argument('--gzip', action='store_true', help='Сжимать тело запроса (API_GZIP)')
+    parser.add_argument('--api-url', default=None, help='Настоящий API вместо mock (нужен API_KEY)')
+    parser.add_argument('--model', default='gpt-4o-mini', help='Модель для --api-url (по умолчанию: gpt-4o-mini)')
+    parser.add_argument('--json', action='store_true', help='Вывести отчёт в JSON')
+    args = parser.parse_args()
+
+    snapshot_file = Path(args.snapshot) if args.snapshot else None
+    snapshot = load_snapshot(Path(args.result_dir), Path(args.prompt), snapshot_file)
+    questions = load_questions(args.questions)
+
+    if args.api_url:
+        api_url, api_key = args.api_url, os.getenv('API_KEY', '')
+    else:
+        _, api_url = start_server(
+            latency=args.latency, tps=args.tps, completion_tokens=args.completion_tokens
+        )
+        api_key = 'mock'
+
+    client = HydraAIClient(api_key=api_key, api_url=api_url, model=args.model, compress=args.gzip)
+    # Пул соединений по наибольшему уровню параллельности, как пул потоков бота
+    levels = [int(level) for level in args.concurrency.split(',')]
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(levels))
+    client.session.mount('http://', adapter)
+    client.session.mount('https://', adapter)
+
+    report = {
+        'context_chars': snapshot.stats['chars'],
+        'context_version': snapshot.version,
+        'tokenizer': get_tokenizer_name(),
+        'api': 'real' if args.api_url else 'mock',
+        'questions': len(questions),
+        'fit_context': bench_fit_context(snapshot, questions),
+        'levels': [
+            run_level(
+                snapshot, client, questions, level, args.requests, args.max_input_tokens,
+                score=bool(args.api_url)
+            )
+            for level in levels
+        ],
+    }
+    if not args.api_url:
+        report['mock_api'] = dict(MockLLMHandler.stats)
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
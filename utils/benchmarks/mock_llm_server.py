@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Mock-сервер chat/completions, совместимый с OpenAI, для офлайн-бенчмарков.
+
+На каждый POST отвечает синтетическим ответом после имитации задержки:
+фиксированное время до первого токена плюс генерация с заданной скоростью.
+Токены запроса оцениваются по телу, поэтому usage в ответе похож на
+настоящий. Принимаются тела, сжатые gzip (API_GZIP=true в боте). Если
+system prompt перечисляет заголовки "## Раздел" (analysis_pipeline.py),
+ответ состоит из этих разделов.
+
+Использование:
+    python utils/benchmarks/mock_llm_server.py [--port 8900] [--latency 0.3] [--tps 80]
+
+Бот или bot_bench.py направляются на http://127.0.0.1:8900/v1/chat/completions.
+"""
+
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Слова синтетических ответов
+ANSWER_WORDS = [
+    "проект", "участник", "обсуждение", "видение", "позиция", "бот",
+    "контекст", "решение", "задача", "команда", "идея", "развитие",
+]
+
+
+# Заголовки разделов markdown, запрошенные в system prompt ("## Раздел")
+SECTION_RE = re.compile(r'^## .+$', re.MULTILINE)
+
+
+def estimate_prompt_tokens(messages):
+    """Грубая оценка размера запроса: ~3 символа на токен плюс 4 токена на сообщение"""
+    return sum(4 + len(message.get('content') or '') // 3 for message in messages) + 3
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """Обработчик mock API; настройки - атрибуты класса, задаются start_server()"""
+
+    latency = 0.3
+    tokens_per_second = 80.0
+    completion_tokens = 150
+    jitter = 0.1
+    error_rate = 0.0
+
+    # Статистика запросов, общая для всех экземпляров обработчика
+    stats = {'requests': 0, 'errors': 0, 'prompt_tokens': 0, 'body_bytes': 0}
+    stats_lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+
+        try:
+            payload = json.loads(body)
+            messages = payload['messages']
+        except (ValueError, KeyError):
+            self.respond(400, {'error': {'message': 'invalid request body'}})
+            return
+
+        prompt_tokens = estimate_prompt_tokens(messages)
+        max_tokens = payload.get('max_tokens') or self.completion_tokens
+        completion_tokens = min(self.completion_tokens, max_tokens)
+
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['prompt_tokens'] += prompt_tokens
+            self.stats['body_bytes'] += length
+
+        delay = self.latency + completion_tokens / self.tokens_per_second
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, delay))
+
+        if self.error_rate and random.random() < self.error_rate:
+            with self.stats_lock:
+                self.stats['errors'] += 1
+            self.respond(500, {'error': {'message': 'simulated server error'}})
+            return
+
+        question = messages[-1].get('content', '')
+        words = [random.choice(ANSWER_WORDS) for _ in range(max(1, completion_tokens // 2))]
+        headings = SECTION_RE.findall(messages[0].get('content', '')) if messages[0].get('role') == 'system' else []
+        if headings:
+            # Промпт просит ответ по разделам: по пункту на каждый запрошенный раздел
+            per_section = max(1, len(words) // len(headings))
+            content = '\n\n'.join(
+                f"{heading}\n- " + ' '.join(words[i * per_section:(i + 1) * per_section])
+                for i, heading in enumerate(headings)
+            )
+        else:
+            content = f"Ответ на вопрос «{question[:80]}»: " + ' '.join(words)
+
+        self.respond(200, {
+            'id': f"chatcmpl-mock-{time.time_ns()}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        })
+
+    def respond(self, status, data):
+        payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0, latency=0.3, tps=80.0, completion_tokens=150, jitter=0.1, error_rate=0.0):
+    """
+    Запустить mock-сервер в фоновом потоке.
+
+    Args:
+        port: TCP-порт (0 - любой свободный)
+        latency: Время до первого токена, секунды
+        tps: Скорость генерации, токенов в секунду
+        completion_tokens: Токенов в каждом ответе
+        jitter: Относительный случайный разброс задержки (0.1 = ±10%)
+        error_rate: Доля запросов, на которые отвечается HTTP 500
+
+    Returns:
+        tuple: (сервер, URL эндпоинта chat/completions)
+    """
+    MockLLMHandler.latency = latency
+    MockLLMHandler.tokens_per_second = tps
+    MockLLMHandler.completion_tokens = completion_tokens
+    MockLLMHandler.jitter = jitter
+    MockLLMHandler.error_rate = error_rate
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockLLMHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock API, совместимый с OpenAI')
+    parser.add_argument('--port', type=int, default=8900, help='Порт (по умолчанию: 8900)')
+    parser.add_argument('--latency', type=float, default=0.3, help='Время до первого токена, с (по умолчанию: 0.3)')
+    parser.add_argument('--tps', type=float, default=80.0, help='Токенов в секунду (по умолчанию: 80)')
+    parser.add_argument('--completion-tokens', type=int, default=150, help='Токенов в ответе (по умолчанию: 150)')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Относительный разброс задержки (по умолчанию: 0.1)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов HTTP 500')
+    args = parser.parse_args()
+
+    server, url = start_server(
+        args.port, args.latency, args.tps, args.completion_tokens, args.jitter, args.error_rate
+    )
+    print(f"Mock API: {url}")
+    print("Для остановки нажмите Ctrl+C")
+
+    try:
+        while True:
+            time.sleep(60)
+            print(f"  {MockLLMHandler.stats}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк утилит подготовки данных на синтетических входных данных.
+
+Генерирует синтетический экспорт Telegram, PDF и видеоклипы
+(synthetic_data.py), затем замеряет каждую утилиту в отдельном процессе
+и записывает её пиковый RSS (и пиковый RSS её собственных процессов-воркеров,
+например пула процессов pdf_to_md):
+
+  html_to_txt             convert_html_to_txt для каждой страницы messagesN.html
+  inject_transcriptions   convert_with_transcriptions для каждой страницы
+  pdf_to_md               convert_pdf_to_md синтетического PDF
+  extract_audio           process_folder по клипам (пропускается без FFmpeg)
+
+В JSON-отчёт входят коммит git и параметры генерации, поэтому отчёты
+разных коммитов можно сравнить через --compare.
+
+Использование:
+    python utils/benchmarks/prep_bench.py [--messages 20000] [--pdf-pages 200] [--clips 5]
+                                          [--repeat 3] [--output report.json] [--compare base.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+UTILS_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(UTILS_DIR))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from synthetic_data import generate_clips, generate_export, generate_pdf  # noqa: E402
+
+
+def pages_of(export_dir):
+    """messages.html, messages2.html, ... в порядке страниц"""
+    def number(path):
+        digits = path.stem[len('messages'):]
+        return int(digits) if digits else 1
+    return sorted(Path(export_dir).glob('messages*.html'), key=number)
+
+
+def stage_html_to_txt(data_dir, out_dir):
+    from html_to_txt import convert_html_to_txt
+    for page in pages_of(data_dir / 'export'):
+        convert_html_to_txt(page, out_dir / f"{page.stem}.txt")
+
+
+def stage_inject_transcriptions(data_dir, out_dir):
+    from inject_transcriptions import convert_with_transcriptions
+    for page in pages_of(data_dir / 'export'):
+        convert_with_transcriptions(
+            page, data_dir / 'export' / 'transcriptions', out_dir / f"{page.stem}+audio.txt"
+        )
+
+
+def stage_pdf_to_md(data_dir, out_dir):
+    from pdf_to_md import convert_pdf_to_md
+    convert_pdf_to_md(data_dir / 'document.pdf', out_dir / 'document.md')
+
+
+def stage_extract_audio(data_dir, out_dir):
+    from extract_audio import process_folder
+    process_folder(data_dir / 'video_files', out_dir, skip_existing=False)
+
+
+STAGES = {
+    'html_to_txt': stage_html_to_txt,
+    'inject_transcriptions': stage_inject_transcriptions,
+    'pdf_to_md': stage_pdf_to_md,
+    'extract_audio': stage_extract_audio,
+}
+
+
+def peak_rss_mb(who):
+    """Пиковый RSS в МБ (ru_maxrss - в КБ на Linux и в байтах на macOS)"""
+    if resource is None:
+        return None
+
+    if who == resource.RUSAGE_SELF:
+        # На Linux ru_maxrss переживает exec() и включал бы пик родителя;
+        # VmHWM сбрасывается вместе с новым адресным пространством
+        try:
+            for line in Path('/proc/self/status').read_text().splitlines():
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+
+    maxrss = resource.getrusage(who).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(maxrss / divisor, 1)
+
+
+def run_stage_here(name, data_dir, out_dir):
+    """Выполнить один этап в этом процессе и напечатать замеры в JSON"""
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    # Утилиты печатают прогресс; в вывод замеров он не входит
+    with contextlib.redirect_stdout(io.StringIO()):
+        STAGES[name](data_dir, out_dir)
+    seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        'seconds': round(seconds, 3),
+        'peak_rss_mb': peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        'children_peak_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+        'output_bytes': sum(path.stat().st_size for path in out_dir.rglob('*') if path.is_file()),
+    }))
+
+
+def run_stage(name, data_dir, out_dir):
+    """Выполнить этап в новом интерпретаторе, чтобы пиковый RSS относился только к нему"""
+    result = subprocess.run(
+        [sys.executable, __file__, '--stage', name, '--data', str(data_dir), '--out', str(out_dir)],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        return {'error': (result.stderr or result.stdout).strip().splitlines()[-1:]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    """Текущий коммит репозитория (None вне git)"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=UTILS_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def run_benchmark(data_dir, args):
+    """Сгенерировать входные данные, выполнить все этапы и собрать отчёт"""
+    inputs = {}
+
+    started = time.perf_counter()
+    inputs['export'] = generate_export(data_dir / 'export', args.messages, args.seed)
+    if args.pdf_pages:
+        inputs['pdf'] = generate_pdf(data_dir / 'document.pdf', args.pdf_pages, args.seed)
+    if args.clips:
+        inputs['clips'] = generate_clips(data_dir / 'video_files', args.clips, seed=args.seed)
+    generation_seconds = round(time.perf_counter() - started, 3)
+
+    stages = {}
+    for name in args.stages.split(','):
+        if name == 'pdf_to_md' and 'pdf' not in inputs:
+            stages[name] = {'skipped': 'нет PDF (--pdf-pages 0)'}
+            continue
+        if name == 'extract_audio' and not inputs.get('clips'):
+            stages[name] = {'skipped': 'FFmpeg не найден или --clips 0'}
+            continue
+
+        # Лучший из N запусков: меньше всего искажён другой нагрузкой на машине
+        runs = [run_stage(name, data_dir, data_dir / 'out' / f"{name}_{i}") for i in range(args.repeat)]
+        ok = [run for run in runs if 'error' not in run]
+        if not ok:
+            stages[name] = runs[0]
+            continue
+        best = min(ok, key=lambda run: run['seconds'])
+        best['runs'] = [run['seconds'] for run in ok]
+        stages[name] = best
+
+    messages = inputs['export']['messages']
+    for name in ('html_to_txt', 'inject_transcriptions'):
+        if 'seconds' in stages.get(name, {}):
+            stages[name]['messages_per_s'] = round(messages / stages[name]['seconds'])
+    if 'seconds' in stages.get('pdf_to_md', {}):
+        stages['pdf_to_md']['pages_per_s'] = round(inputs['pdf']['pages'] / stages['pdf_to_md']['seconds'], 1)
+
+    return {
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {
+            'messages': args.messages, 'pdf_pages': args.pdf_pages,
+            'clips': args.clips, 'seed': args.seed, 'repeat': args.repeat,
+        },
+        'generation_s': generation_seconds,
+        'inputs': inputs,
+        'stages': stages,
+    }
+
+
+def print_report(report, baseline=None):
+    """Отчёт в читаемом виде, с изменениями относительно базового отчёта"""
+    print(f"Коммит {report['commit']}, Python {report['python']}, {report['params']}")
+    print(f"Входные данные сгенерированы за {report['generation_s']} с: "
+          f"{report['inputs']['export']['html_bytes'] / 1024 / 1024:.1f} МБ HTML, "
+          f"{report['inputs']['export']['pages']} страниц")
+
+    for name, stage in report['stages'].items():
+        if 'seconds' not in stage:
+            print(f"  {name:<22} {stage.get('skipped') or stage.get('error')}")
+            continue
+
+        line = (f"  {name:<22} {stage['seconds']:>8.3f} с   пиковый RSS {stage['peak_rss_mb']} МБ"
+                f" (воркеры {stage['children_peak_rss_mb']} МБ)")
+        base = (baseline or {}).get('stages', {}).get(name, {})
+        if 'seconds' in base:
+            line += f"   время x{stage['seconds'] / base['seconds']:.2f} к {baseline.get('commit')}"
+            if stage['peak_rss_mb'] and base.get('peak_rss_mb'):
+                line += f", RSS x{stage['peak_rss_mb'] / base['peak_rss_mb']:.2f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк утилит подготовки данных')
+    parser.add_argument('--messages', type=int, default=20000, help='Сообщений в экспорте (по умолчанию: 20000)')
+    parser.add_argument('--pdf-pages', type=int, default=200, help='Страниц PDF (по умолчанию: 200)')
+    parser.add_argument('--clips', type=int, default=5, help='Видеоклипов для extract_audio (по умолчанию: 5)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed генератора (по умолчанию: 42)')
+    parser.add_argument('--repeat', type=int, default=3, help='Запусков на этап, в отчёт - лучший (по умолчанию: 3)')
+    parser.add_argument('--stages', default=','.join(STAGES), help='Этапы через запятую')
+    parser.add_argument('--workdir', default=None, help='Сохранить сгенерированные данные здесь (по умолчанию: временно)')
+    parser.add_argument('--output', default=None, help='Записать JSON-отчёт в этот файл')
+    parser.add_argument('--compare', default=None, help='Базовый JSON-отчёт для сравнения')
+    parser.add_argument('--json', action='store_true', help='Вывести отчёт в JSON')
+    # Служебное: выполнить один этап в этом процессе
+    parser.add_argument('--stage', help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        run_stage_here(args.stage, Path(args.data), Path(args.out))
+        return
+
+    if args.workdir:
+        data_dir = Path(args.workdir)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        report = run_benchmark(data_dir, args)
+    else:
+        with tempfile.TemporaryDirectory(prefix='prep_bench_') as tmp:
+            report = run_benchmark(Path(tmp), args)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8')) if args.compare else None
+        print_report(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
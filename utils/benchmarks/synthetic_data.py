@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Синтетические входные данные для бенчмарка утилит подготовки данных.
+
+Детерминированно по seed генерируются:
+  - HTML-экспорт Telegram (messages.html, messages2.html, ...) со служебными
+    сообщениями, сообщениями подряд от одного автора (joined), ответами,
+    пересылками, реакциями, голосовыми, видео и документами - в разметке
+    экспорта Telegram Desktop;
+  - файлы транскрипций голосовых в формате transcribe_audio.py;
+  - многостраничный PDF с кириллицей (нужен PyMuPDF);
+  - короткие видеоклипы со звуковой дорожкой (нужен FFmpeg).
+
+Использование:
+    python utils/benchmarks/synthetic_data.py <output_dir> [--messages 20000] [--pdf-pages 200] [--clips 5]
+"""
+
+import argparse
+import html
+import math
+import random
+import shutil
+import struct
+import subprocess
+import wave
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+# Telegram Desktop кладёт по 1000 сообщений на каждую страницу messagesN.html
+MESSAGES_PER_PAGE = 1000
+
+AUTHORS = [
+    "Анна Смирнова", "Борис Иванов", "Виктор Петров", "Галина Козлова",
+    "Дмитрий Орлов", "Елена Новикова", "Жанна Морозова", "Игорь Волков",
+]
+
+WORDS = (
+    "проект майя ассистент персональный идея видение команда задача решение "
+    "разработка бот контекст данные модель пользователь интерфейс голос память "
+    "приватность сервер архитектура прототип релиз обсуждение позиция mybox "
+    "интеграция telegram api агент знания документ встреча план неделя"
+).split()
+
+REACTIONS = ["👍", "🔥", "❤", "😁", "🤔", "👏"]
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html>
+ <head>
+  <meta charset="utf-8"/>
+  <title>Exported Data</title>
+  <link href="css/style.css" rel="stylesheet"/>
+ </head>
+ <body>
+  <div class="page_wrap">
+   <div class="page_header">
+    <div class="content">
+     <div class="text bold">
+{title}
+     </div>
+    </div>
+   </div>
+   <div class="page_body chat_page">
+    <div class="history">
+"""
+
+PAGE_TAIL = """    </div>
+   </div>
+  </div>
+ </body>
+</html>
+"""
+
+
+def sentence(rng, min_words=3, max_words=40):
+    """Случайное предложение из русских слов"""
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    words[0] = words[0].capitalize()
+    return ' '.join(words) + rng.choice(['.', '?', '!', '...'])
+
+
+def text_html(rng):
+    """Текст сообщения с переводами строк, экранированный для HTML"""
+    lines = [sentence(rng) for _ in range(rng.choices([1, 2, 3, 5], weights=[6, 3, 2, 1])[0])]
+    return '<br>'.join(html.escape(line) for line in lines)
+
+
+def reactions_html(rng):
+    """Блок реакций с аватарками"""
+    spans = []
+    for emoji in rng.sample(REACTIONS, rng.randint(1, 3)):
+        userpics = ''.join(
+            '<div class="userpic userpic1" style="width: 20px; height: 20px">'
+            '<div class="initials" style="line-height: 20px">А</div></div>'
+            for _ in range(rng.randint(1, 4))
+        )
+        spans.append(
+            f'<span class="reaction"><span class="emoji">{emoji}</span>'
+            f'<span class="userpics">{userpics}</span></span>'
+        )
+    return f'<span class="reactions">{"".join(spans)}</span>'
+
+
+def voice_name(message_id, date):
+    """Имя файла голосового без расширения, как в экспорте Telegram"""
+    return f"audio_{message_id}@{date.strftime('%d-%m-%Y_%H-%M-%S')}"
+
+
+def message_html(rng, message_id, date, author, joined, stats):
+    """
+    Одно обычное сообщение в разметке экспорта Telegram.
+
+    Returns:
+        tuple: (html, имя файла голосового без расширения или None)
+    """
+    body = [
+        f'<div class="pull_right date details" title="{date.strftime("%d.%m.%Y %H:%M:%S")} UTC+03:00">'
+        f'{date.strftime("%H:%M")}</div>'
+    ]
+    if not joined:
+        body.append(f'<div class="from_name">{html.escape(author)}</div>')
+
+    if message_id > 1 and rng.random() < 0.2:
+        target = rng.randint(max(1, message_id - 200), message_id - 1)
+        body.append(
+            f'<div class="reply_to details">In reply to <a href="#go_to_message{target}" '
+            f'onclick="return GoToMessage({target})">this message</a></div>'
+        )
+        stats['replies'] += 1
+
+    if rng.random() < 0.05:
+        body.append(
+            '<div class="forwarded body">'
+            f'<div class="from_name">{html.escape(rng.choice(AUTHORS))} '
+            f'<span class="date details" title="{date.strftime("%d.%m.%Y %H:%M:%S")}"> '
+            f'{date.strftime("%d.%m.%Y %H:%M:%S")}</span></div>'
+            f'<div class="text">{text_html(rng)}</div></div>'
+        )
+        stats['forwards'] += 1
+
+    voice = None
+    kind = rng.random()
+    if kind < 0.08:
+        voice = voice_name(message_id, date)
+        seconds = rng.randint(2, 180)
+        body.append(
+            '<div class="media_wrap clearfix">'
+            f'<a class="media_voice_message clearfix pull_left block_link" href="voice_messages/{voice}.ogg">'
+            '<div class="fill pull_left"></div><div class="body">'
+            '<div class="title bold">Voice message</div>'
+            f'<div class="status details">{seconds // 60:02d}:{seconds % 60:02d}</div>'
+            '</div></a></div>'
+        )
+        stats['voice'] += 1
+    elif kind < 0.11:
+        name = f"video_{message_id}@{date.strftime('%d-%m-%Y_%H-%M-%S')}.mp4"
+        body.append(
+            '<div class="media_wrap clearfix">'
+            f'<a class="video_file_wrap clearfix pull_left" href="video_files/{name}">'
+            '<div class="video_play_bg"><div class="video_play"></div></div>'
+            f'<div class="video_duration">00:{rng.randint(5, 59):02d}</div></a>'
+            '<div class="title bold">Video</div></div>'
+        )
+        stats['video'] += 1
+    elif kind < 0.13:
+        body.append(
+            '<div class="media_wrap clearfix"><div class="media clearfix pull_left media_file">'
+            '<div class="fill pull_left"></div><div class="body file">'
+            f'<div class="name bold">Документ {message_id}.pdf</div>'
+            f'<div class="details">{rng.randint(10, 5000)} KB</div></div></div></div>'
+        )
+
+    if voice is None or rng.random() < 0.3:
+        body.append(f'<div class="text">{text_html(rng)}</div>')
+
+    if rng.random() < 0.15:
+        body.append(reactions_html(rng))
+        stats['reactions'] += 1
+
+    classes = 'message default clearfix joined' if joined else 'message default clearfix'
+    userpic = '' if joined else (
+        '<div class="pull_left userpic_wrap"><div class="userpic userpic3" style="width: 42px; height: 42px">'
+        '<div class="initials" style="line-height: 42px">А</div></div></div>'
+    )
+    return (
+        f'     <div class="{classes}" id="message{message_id}">\n'
+        f'      {userpic}\n'
+        f'      <div class="body">\n       {"".join(body)}\n      </div>\n'
+        f'     </div>\n'
+    ), voice
+
+
+def service_html(service_id, text):
+    """Служебное сообщение (разделитель дат)"""
+    return (
+        f'     <div class="message service" id="message-{service_id}">\n'
+        f'      <div class="body details">\n{html.escape(text)}\n      </div>\n'
+        f'     </div>\n'
+    )
+
+
+def write_transcription(path, rng):
+    """Файл транскрипции в формате transcribe_audio.py"""
+    text = ' '.join(sentence(rng, 5, 25) for _ in range(rng.randint(1, 6)))
+    path.write_text(
+        f"Файл: {path.stem}.ogg\n"
+        + "=" * 80 + "\n"
+        + text + "\n"
+        + "=" * 80 + "\n"
+        + "[00:00 - 00:10] " + text[:80] + "\n",
+        encoding='utf-8'
+    )
+
+
+def generate_export(output_dir, messages=20000, seed=42, title="Проект Майя"):
+    """
+    Сгенерировать HTML-экспорт Telegram и транскрипции голосовых.
+
+    Args:
+        output_dir: Директория экспорта (messages*.html) и transcriptions/
+        messages: Количество обычных сообщений
+        seed: Seed генератора
+        title: Название чата
+
+    Returns:
+        dict: Количество сгенерированных сообщений по видам, страниц и байт HTML
+    """
+    rng = random.Random(seed)
+    output_dir = Path(output_dir)
+    transcriptions_dir = output_dir / 'transcriptions'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    transcriptions_dir.mkdir(exist_ok=True)
+
+    stats = {'messages': messages, 'replies': 0, 'forwards': 0, 'voice': 0, 'video': 0, 'reactions': 0}
+    date = datetime(2025, 3, 1, 9, 0, 0)
+    service_id = 0
+    pages = []
+    previous_author = None
+    current_day = None
+    out = None
+
+    for message_id in range(1, messages + 1):
+        if (message_id - 1) % MESSAGES_PER_PAGE == 0:
+            if out:
+                out.write(PAGE_TAIL)
+                out.close()
+            page = len(pages) + 1
+            path = output_dir / ('messages.html' if page == 1 else f'messages{page}.html')
+            pages.append(path)
+            out = open(path, 'w', encoding='utf-8')
+            out.write(PAGE_HEAD.format(title=html.escape(title)))
+            previous_author = None
+
+        date += timedelta(seconds=rng.randint(5, 3600))
+        if date.date() != current_day:
+            current_day = date.date()
+            service_id += 1
+            out.write(service_html(service_id, date.strftime('%d %B %Y')))
+            previous_author = None
+
+        # Сообщения подряд от одного автора - "joined" (без from_name)
+        author = previous_author if previous_author and rng.random() < 0.35 else rng.choice(AUTHORS)
+        joined = author == previous_author
+        markup, voice = message_html(rng, message_id, date, author, joined, stats)
+        out.write(markup)
+        previous_author = author
+
+        if voice:
+            write_transcription(transcriptions_dir / f"{voice}.txt", rng)
+
+    if out:
+        out.write(PAGE_TAIL)
+        out.close()
+
+    stats['pages'] = len(pages)
+    stats['html_bytes'] = sum(path.stat().st_size for path in pages)
+    return stats
+
+
+def generate_pdf(path, pages=200, seed=42):
+    """
+    Сгенерировать PDF с текстом на кириллице (PyMuPDF).
+
+    Args:
+        path: Путь к выходному PDF
+        pages: Количество страниц
+        seed: Seed генератора
+
+    Returns:
+        dict: {'pages', 'bytes'}
+    """
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    font = fitz.Font('cjk')  # Встроенный шрифт с кириллицей
+
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_font(fontname='F0', fontbuffer=font.buffer)
+        text = f"Глава {number + 1}\n\n" + '\n\n'.join(
+            ' '.join(sentence(rng, 8, 30) for _ in range(4)) for _ in range(6)
+        )
+        page.insert_textbox(fitz.Rect(50, 50, 545, 792), text, fontname='F0', fontsize=10)
+
+    doc.subset_fonts()
+    doc.save(str(path), garbage=3, deflate=True)
+    doc.close()
+    return {'pages': pages, 'bytes': Path(path).stat().st_size}
+
+
+def write_tone(path, seconds, frequency=440, rate=16000):
+    """Моно WAV 16 бит с синусоидальным тоном"""
+    with wave.open(str(path), 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        frames = b''.join(
+            struct.pack('<h', int(8000 * math.sin(2 * math.pi * frequency * i / rate)))
+            for i in range(int(seconds * rate))
+        )
+        out.writeframes(frames)
+
+
+def generate_clips(output_dir, clips=5, seconds=5, seed=42):
+    """
+    Сгенерировать короткие клипы MP4 (чёрное видео + тон) для extract_audio.py.
+
+    Нужен FFmpeg; если он не установлен, возвращается None.
+
+    Returns:
+        dict: {'clips', 'bytes'} или None
+    """
+    if shutil.which('ffmpeg') is None:
+        return None
+
+    rng = random.Random(seed)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    total = 0
+    for number in range(clips):
+        tone = output_dir / f"tone_{number}.wav"
+        write_tone(tone, seconds, frequency=rng.randint(200, 900))
+        clip = output_dir / f"clip_{number}.mp4"
+        subprocess.run(
+            [
+                'ffmpeg', '-y', '-loglevel', 'error',
+                '-f', 'lavfi', '-i', f'color=c=black:s=160x120:d={seconds}',
+                '-i', str(tone), '-shortest',
+                '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac',
+                str(clip)
+            ],
+            check=True
+        )
+        tone.unlink()
+        total += clip.stat().st_size
+
+    return {'clips': clips, 'bytes': total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Синтетические входные данные для бенчмарков')
+    parser.add_argument('output_dir', help='Выходная директория')
+    parser.add_argument('--messages', type=int, default=20000, help='Сообщений в экспорте (по умолчанию: 20000)')
+    parser.add_argument('--pdf-pages', type=int, default=200, help='Страниц PDF (по умолчанию: 200, 0 - без PDF)')
+    parser.add_argument('--clips', type=int, default=5, help='Видеоклипов (по умолчанию: 5, 0 - без клипов)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed генератора (по умолчанию: 42)')
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    export = generate_export(output_dir / 'export', args.messages, args.seed)
+    print(f"Экспорт: {export}")
+
+    if args.pdf_pages:
+        print(f"PDF: {generate_pdf(output_dir / 'document.pdf', args.pdf_pages, args.seed)}")
+
+    if args.clips:
+        clips = generate_clips(output_dir / 'video_files', args.clips, seed=args.seed)
+        print(f"Клипы: {clips if clips else 'пропущены (FFmpeg не найден)'}")
+
+
+if __name__ == "__main__":
+    main()
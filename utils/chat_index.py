@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Полнотекстовый индекс истории чата в SQLite FTS5.
+
+Индекс строится по записям telegram_export.py (текст сообщений и
+транскрипции голосовых) и позволяет искать по всей истории за
+миллисекунды вместо просмотра многомегабайтного messages+audio.txt.
+
+Поиск рассчитан на русский текст: регистр и "ё" не различаются, слова
+запроса ищутся с учётом окончаний (по основе слова: "проекты" найдёт
+"проект", "проекта", "проектов"). Если установлен snowballstemmer,
+основа берётся из стеммера Snowball, иначе - отбрасыванием типичных
+окончаний (app/text_normalize.py: индекс и команды бота /search, /who,
+/when ищут одинаково). Слово в кавычках ищется точно.
+
+Для каждого сообщения хранится корень его ветки ответов (reply_threads.py),
+поэтому вся ветка обсуждения выбирается по индексу, без обхода истории.
+
+Использование:
+    python utils/chat_index.py build <папка_экспорта|messages.html> [папка_транскрипций] [--db data/chat_index.db]
+    python utils/chat_index.py search "запрос" [--author Имя] [--from 2025-03-01] [--to 2025-04-01] [--limit 20]
+    python utils/chat_index.py thread <ID сообщения>
+
+Примеры:
+    python utils/chat_index.py build "ChatExport/" data/transcriptions
+    python utils/chat_index.py search "голосовой ассистент" --author Анна --from 2025-03-01
+"""
+
+import argparse
+import contextlib
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from reply_threads import ReplyGraph
+from telegram_export import find_pages, iter_records
+
+# Основа слова и запрос FTS5 - общие с ботом: индекс должен строиться так же, как
+# его опрашивают команды /search, /who, /when. text_normalize.py лежит в app/ и не
+# тянет за собой модули бота, поэтому app/ добавляется в путь только ради него
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+from text_normalize import build_match, normalize  # noqa: E402
+
+
+DEFAULT_DB = Path(__file__).parent.parent / 'data' / 'chat_index.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    date TEXT,
+    author TEXT,
+    reply_to_id INTEGER,
+    thread_id INTEGER,
+    forwarded_from TEXT,
+    forwarded_date TEXT,
+    text TEXT,
+    transcript TEXT,
+    voice_seconds INTEGER,
+    reactions TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_date ON messages(date);
+CREATE INDEX IF NOT EXISTS messages_author ON messages(author);
+CREATE INDEX IF NOT EXISTS messages_thread ON messages(thread_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text, transcript,
+    tokenize = "unicode61 remove_diacritics 2",
+    prefix = '2 3 4'
+);
+"""
+
+def build_index(records, db_path):
+    """
+    Построить индекс заново.
+
+    Args:
+        records: Записи сообщений (telegram_export.iter_records)
+        db_path: Путь к базе SQLite
+
+    Returns:
+        int: Количество проиндексированных сообщений
+    """
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = db_path.with_name(db_path.name + '.tmp')
+    tmp_path.unlink(missing_ok=True)
+
+    db = sqlite3.connect(str(tmp_path))
+    db.execute("PRAGMA journal_mode = OFF")
+    db.execute("PRAGMA synchronous = OFF")
+    db.executescript(SCHEMA)
+
+    count = 0
+    batch = []
+    # Корень ветки ответов вычисляется на лету: цель ответа проиндексирована раньше
+    threads = ReplyGraph()
+
+    def flush():
+        db.executemany(
+            "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [row for row, _ in batch]
+        )
+        db.executemany(
+            "INSERT INTO messages_fts (rowid, text, transcript) VALUES (?, ?, ?)",
+            [fts for _, fts in batch]
+        )
+        batch.clear()
+
+    with db:
+        for record in records:
+            threads.add(record['id'], record['reply_to_id'])
+            batch.append((
+                (
+                    record['id'], record['date'], record['author'], record['reply_to_id'],
+                    threads.root[record['id']], record['forwarded_from'], record['forwarded_date'],
+                    record['text'], record['transcript'],
+                    record['voice_seconds'],
+                    json.dumps(record['reactions'], ensure_ascii=False) if record['reactions'] else None
+                ),
+                (record['id'], normalize(record['text']), normalize(record['transcript']))
+            ))
+            count += 1
+            if len(batch) >= 1000:
+                flush()
+        if batch:
+            flush()
+        db.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+
+    db.close()
+    # Атомарная замена: поиск не видит полупостроенный индекс
+    tmp_path.replace(db_path)
+    return count
+
+
+def search(db_path, query, author=None, date_from=None, date_to=None, limit=20):
+    """
+    Найти сообщения.
+
+    Args:
+        db_path: Путь к базе SQLite
+        query: Запрос (слова, "точные фразы")
+        author: Часть имени автора или None
+        date_from: Начало периода, "YYYY-MM-DD" (включительно) или None
+        date_to: Конец периода, "YYYY-MM-DD" (включительно) или None
+        limit: Максимум результатов
+
+    Returns:
+        list: [{'id', 'date', 'author', 'reply_to_id', 'snippet'}], лучшие совпадения первыми
+    """
+    match = build_match(query)
+    if not match:
+        return []
+
+    sql = [
+        "SELECT m.id, m.date, m.author, m.reply_to_id,",
+        "       snippet(messages_fts, -1, '[', ']', '…', 16)",
+        "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid",
+        "WHERE messages_fts MATCH ?"
+    ]
+    params = [match]
+    if author:
+        sql.append("AND m.author LIKE ?")
+        params.append(f"%{author}%")
+    if date_from:
+        sql.append("AND m.date >= ?")
+        params.append(date_from)
+    if date_to:
+        # Конец периода включительно: 'T99' больше любого времени этого дня
+        sql.append("AND m.date < ?")
+        params.append(date_to + 'T99')
+    sql.append("ORDER BY bm25(messages_fts) LIMIT ?")
+    params.append(limit)
+
+    db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = db.execute('\n'.join(sql), params).fetchall()
+    finally:
+        db.close()
+
+    return [
+        {'id': row[0], 'date': row[1], 'author': row[2], 'reply_to_id': row[3], 'snippet': row[4]}
+        for row in rows
+    ]
+
+
+def thread(db_path, message_id):
+    """
+    Вся ветка ответов, в которую входит сообщение.
+
+    Ветка выбирается по индексу thread_id, время пропорционально её размеру.
+
+    Args:
+        db_path: Путь к базе SQLite
+        message_id: ID любого сообщения ветки
+
+    Returns:
+        list: [{'id', 'date', 'author', 'reply_to_id', 'text'}] по порядку
+    """
+    db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = db.execute(
+            "SELECT id, date, author, reply_to_id, coalesce(nullif(text, ''), transcript, '') "
+            "FROM messages WHERE thread_id = (SELECT thread_id FROM messages WHERE id = ?) "
+            "ORDER BY id",
+            (message_id,)
+        ).fetchall()
+    finally:
+        db.close()
+
+    return [
+        {'id': row[0], 'date': row[1], 'author': row[2], 'reply_to_id': row[3], 'text': row[4]}
+        for row in rows
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Полнотекстовый индекс истории чата (SQLite FTS5)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Построить индекс по экспорту')
+    build.add_argument('export', help='Папка экспорта или messages.html')
+    build.add_argument('transcriptions', nargs='?', default=None, help='Папка транскрипций голосовых')
+    build.add_argument('--db', default=str(DEFAULT_DB), help=f'База индекса (по умолчанию: {DEFAULT_DB})')
+
+    find = commands.add_parser('search', help='Поиск по индексу')
+    find.add_argument('query', help='Запрос; "фраза в кавычках" ищется точно')
+    find.add_argument('--author', default=None, help='Часть имени автора')
+    find.add_argument('--from', dest='date_from', default=None, help='С даты YYYY-MM-DD')
+    find.add_argument('--to', dest='date_to', default=None, help='По дату YYYY-MM-DD')
+    find.add_argument('--limit', type=int, default=20, help='Максимум результатов (по умолчанию: 20)')
+    find.add_argument('--db', default=str(DEFAULT_DB), help=f'База индекса (по умолчанию: {DEFAULT_DB})')
+    find.add_argument('--json', action='store_true', help='Вывести результаты в JSON')
+
+    show = commands.add_parser('thread', help='Ветка ответов, в которую входит сообщение')
+    show.add_argument('message_id', type=int, help='ID сообщения')
+    show.add_argument('--db', default=str(DEFAULT_DB), help=f'База индекса (по умолчанию: {DEFAULT_DB})')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        pages = find_pages(args.export)
+        if not pages:
+            print(f"Ошибка: В {args.export} нет файлов messages*.html")
+            sys.exit(1)
+
+        transcriptions = None
+        if args.transcriptions:
+            from inject_transcriptions import load_transcriptions
+            with contextlib.redirect_stdout(None):
+                transcriptions = load_transcriptions(args.transcriptions)
+            print(f"Транскрипций: {len(transcriptions)}")
+
+        print(f"Страниц экспорта: {len(pages)}")
+        started = time.perf_counter()
+        count = build_index(iter_records(pages, transcriptions), args.db)
+        print(f"\n✅ Проиндексировано сообщений: {count} за {time.perf_counter() - started:.1f} с")
+        print(f"Индекс: {args.db} ({Path(args.db).stat().st_size / 1024 / 1024:.1f} MB)")
+        return
+
+    if not Path(args.db).exists():
+        print(f"Ошибка: Индекс {args.db} не найден. Сначала выполните: python {sys.argv[0]} build ...")
+        sys.exit(1)
+
+    if args.command == 'thread':
+        started = time.perf_counter()
+        messages = thread(args.db, args.message_id)
+        elapsed = time.perf_counter() - started
+        if not messages:
+            print(f"Ошибка: Сообщение {args.message_id} не найдено")
+            sys.exit(1)
+        for message in messages:
+            marker = '▶ ' if message['id'] == args.message_id else ''
+            reply = f" ↩️ {message['reply_to_id']}" if message['reply_to_id'] else ''
+            print(f"{marker}#{message['id']} {message['date']} {message['author']}{reply}")
+            print(f"  {' '.join(message['text'].split())[:300]}\n")
+        print(f"Сообщений в ветке: {len(messages)} ({elapsed * 1000:.1f} мс)")
+        return
+
+    started = time.perf_counter()
+    results = search(args.db, args.query, args.author, args.date_from, args.date_to, args.limit)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    for result in results:
+        reply = f" ↩️ {result['reply_to_id']}" if result['reply_to_id'] else ''
+        print(f"#{result['id']} {result['date']} {result['author']}{reply}")
+        print(f"  {result['snippet']}\n")
+    print(f"Найдено: {len(results)} ({elapsed * 1000:.1f} мс)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Векторный индекс исходных сообщений чата для бота.
+
+Каждое сообщение с текстом или транскрипцией голосового становится "окном":
+само сообщение, соседние сообщения до и после него и цепочка сообщений,
+на которые оно отвечает (reply_threads.py). Окна переводятся в эмбеддинги локально на CPU моделью
+sentence-transformers и сохраняются в папке индекса:
+
+  vectors.npy     матрица эмбеддингов int8 (N x dim), бот читает её через mmap
+  scales.npy      масштаб строки float32 (вектор = vectors[i] * scales[i])
+  centroids.npy   центроиды IVF float32 (nlist x dim)
+  offsets.npy     границы списков IVF: строки списка j - offsets[j]:offsets[j+1]
+  windows.db      SQLite: сообщения (строка окна, дата, автор) и состав окна
+                  (ID сообщений) по номеру строки матрицы
+  meta.json       модель, размерность, число строк и списков
+
+Строки отсортированы по спискам IVF, поэтому бот (app/chat_search.py)
+читает только строки нескольких ближайших к вопросу списков.
+
+Построение инкрементальное: эмбеддинги окон, текст которых не изменился,
+берутся из прежнего индекса, модель считает только новые окна. Центроиды
+переобучаются, когда число строк выросло вдвое с момента обучения (или с
+--retrain). Новый индекс пишется рядом и подменяет прежний целиком.
+
+Использование:
+    python utils/chat_vectors.py <папка_экспорта|messages.html> [папка_транскрипций] [--out data/chat_vectors]
+
+Примеры:
+    pip install sentence-transformers
+    python utils/chat_vectors.py "ChatExport/" data/transcriptions
+    python utils/chat_vectors.py "ChatExport/" data/transcriptions --retrain
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import shutil
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    print("Ошибка: Необходимо установить библиотеку numpy")
+    print("Установите её командой: pip install numpy")
+    sys.exit(1)
+
+from reply_threads import ReplyGraph
+from telegram_export import find_pages, iter_records
+
+
+DEFAULT_OUT = Path(__file__).parent.parent / 'data' / 'chat_vectors'
+
+# Многоязычная модель (русский текст), 384 измерения, быстро работает на CPU
+DEFAULT_MODEL = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+
+# Соседние сообщения в окне и ограничения длины
+WINDOW_BEFORE = 2
+WINDOW_AFTER = 2
+ANCHOR_CHARS = 1600
+MESSAGE_CHARS = 400
+REPLY_CHARS = 200
+# Сколько сообщений цепочки ответов (вверх по ветке) добавлять к окну
+REPLY_DEPTH = 2
+
+# Списков IVF ~ 2 * sqrt(N); k-means учится на выборке до TRAIN_PER_LIST строк на список
+LISTS_PER_SQRT = 2
+TRAIN_PER_LIST = 64
+KMEANS_ITERATIONS = 12
+
+WINDOWS_SCHEMA = """
+CREATE TABLE messages (
+    id INTEGER PRIMARY KEY,
+    date TEXT,
+    author TEXT,
+    line TEXT
+);
+CREATE TABLE windows (
+    row INTEGER PRIMARY KEY,
+    message_id INTEGER,
+    message_ids TEXT,
+    digest TEXT
+);
+"""
+
+
+def message_line(record, limit):
+    """Строка окна: "[#id] Автор: текст 🎤 транскрипция" (обрезанная до limit)"""
+    parts = [record['text']] if record['text'] else []
+    if record['transcript']:
+        parts.append(f"🎤 {record['transcript']}")
+    text = ' '.join(' '.join(parts).split())
+    if len(text) > limit:
+        text = text[:limit].rstrip() + '…'
+    return f"[#{record['id']}] {record['author'] or '?'}: {text}"
+
+
+def build_windows(records):
+    """
+    Окна для эмбеддингов: по одному на сообщение с текстом или транскрипцией.
+
+    Args:
+        records: Записи сообщений по порядку (telegram_export.iter_records)
+
+    Returns:
+        list: [{'message_id', 'date', 'author', 'line', 'message_ids', 'text'}],
+              line - строка самого сообщения, text - текст окна для эмбеддинга
+    """
+    records = [r for r in records if r['text'] or r['transcript']]
+    by_id = {record['id']: i for i, record in enumerate(records)}
+    graph = ReplyGraph(records)
+
+    windows = []
+    for i, record in enumerate(records):
+        lines = []
+        members = []
+        first = max(0, i - WINDOW_BEFORE)
+        # Цепочка ответов - от дальнего сообщения к ближнему, кроме попавших в окно
+        for ancestor in reversed(graph.ancestors(record['id'], REPLY_DEPTH)):
+            reply = by_id[ancestor]
+            if reply < first:
+                lines.append('↩️ ' + message_line(records[reply], REPLY_CHARS))
+                members.append(ancestor)
+        for j in range(first, min(len(records), i + WINDOW_AFTER + 1)):
+            # Само сообщение - полностью, соседи - с обрезкой
+            lines.append(message_line(records[j], MESSAGE_CHARS if j != i else ANCHOR_CHARS))
+            members.append(records[j]['id'])
+        windows.append({
+            'message_id': record['id'],
+            'date': record['date'],
+            'author': record['author'],
+            'line': message_line(record, ANCHOR_CHARS),
+            'message_ids': members,
+            'text': '\n'.join(lines),
+        })
+    return windows
+
+
+def load_model(name):
+    """
+    Загрузить модель эмбеддингов.
+
+    Returns:
+        callable: texts -> np.ndarray float32 (len(texts) x dim), строки нормированы
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("Ошибка: Необходимо установить библиотеку sentence-transformers")
+        print("Установите её командой: pip install sentence-transformers")
+        sys.exit(1)
+
+    model = SentenceTransformer(name, device='cpu')
+
+    def embed(texts):
+        return model.encode(
+            texts, batch_size=64, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=len(texts) > 1000
+        ).astype(np.float32)
+
+    return embed
+
+
+def quantize(vectors):
+    """
+    Квантование строк в int8 с масштабом на строку.
+
+    Returns:
+        tuple: (np.ndarray int8, np.ndarray float32 масштабов)
+    """
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def nearest(vectors, centroids, batch=8192):
+    """Номер ближайшего (по скалярному произведению) центроида для каждой строки"""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch):
+        labels[start:start + batch] = np.argmax(vectors[start:start + batch] @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(vectors, nlist, seed=0):
+    """
+    Сферический k-means на выборке строк.
+
+    Args:
+        vectors: Нормированные эмбеддинги float32
+        nlist: Число списков IVF
+        seed: Зерно выборки
+
+    Returns:
+        np.ndarray: Центроиды float32 (nlist x dim)
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * TRAIN_PER_LIST)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        labels = nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+        # Пустой список получает случайную строку выборки
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+
+    return centroids.astype(np.float32)
+
+
+def load_previous(out_dir):
+    """
+    Прежний индекс для инкрементального построения.
+
+    Returns:
+        tuple: ({digest: номер строки}, vectors, scales, centroids, meta) или None
+    """
+    meta_path = out_dir / 'meta.json'
+    if not meta_path.exists():
+        return None
+
+    meta = json.loads(meta_path.read_text(encoding='utf-8'))
+    db = sqlite3.connect(str(out_dir / 'windows.db'))
+    try:
+        rows = {digest: row for row, digest in db.execute("SELECT row, digest FROM windows")}
+    finally:
+        db.close()
+
+    return (
+        rows,
+        np.load(out_dir / 'vectors.npy', mmap_mode='r'),
+        np.load(out_dir / 'scales.npy'),
+        np.load(out_dir / 'centroids.npy'),
+        meta,
+    )
+
+
+def build_vectors(windows, out_dir, embed, model_name, retrain=False):
+    """
+    Построить (или обновить) векторный индекс.
+
+    Args:
+        windows: Окна (build_windows)
+        out_dir: Папка индекса
+        embed: Функция эмбеддингов (load_model)
+        model_name: Название модели (записывается в meta.json)
+        retrain: Обучить центроиды заново
+
+    Returns:
+        dict: meta.json нового индекса
+    """
+    out_dir = Path(out_dir)
+    if not windows:
+        raise ValueError("Нет сообщений для индексации")
+
+    for window in windows:
+        window['digest'] = hashlib.sha1(window['text'].encode('utf-8')).hexdigest()
+
+    previous = load_previous(out_dir)
+    if previous and previous[4]['model'] != model_name:
+        print(f"Модель изменилась ({previous[4]['model']}), индекс строится заново")
+        previous = None
+
+    # Эмбеддинги: из прежнего индекса по хэшу текста окна, остальные - моделью
+    vectors = None
+    reused = []
+    fresh = []
+    for i, window in enumerate(windows):
+        row = previous[0].get(window['digest']) if previous else None
+        (reused if row is not None else fresh).append((i, row))
+
+    if reused:
+        old_vectors, old_scales = previous[1], previous[2]
+        rows = np.array([row for _, row in reused])
+        vectors = np.empty((len(windows), old_vectors.shape[1]), dtype=np.float32)
+        vectors[[i for i, _ in reused]] = old_vectors[rows].astype(np.float32) * old_scales[rows, None]
+    print(f"Окон: {len(windows)}, из прежнего индекса: {len(reused)}, новых: {len(fresh)}")
+
+    if fresh:
+        started = time.perf_counter()
+        embedded = embed([windows[i]['text'] for i, _ in fresh])
+        print(f"Эмбеддинги: {len(fresh)} окон за {time.perf_counter() - started:.1f} с")
+        if vectors is None:
+            vectors = np.empty((len(windows), embedded.shape[1]), dtype=np.float32)
+        vectors[[i for i, _ in fresh]] = embedded
+
+    # Центроиды IVF: прежние, пока индекс не вырос вдвое
+    nlist = max(1, min(len(windows), round(LISTS_PER_SQRT * len(windows) ** 0.5)))
+    centroids = previous[3] if previous else None
+    trained_count = previous[4]['trained_count'] if previous else 0
+    if retrain or centroids is None or len(windows) > 2 * trained_count:
+        started = time.perf_counter()
+        centroids = train_centroids(vectors, nlist)
+        trained_count = len(windows)
+        print(f"Центроиды: {nlist} списков за {time.perf_counter() - started:.1f} с")
+
+    # Строки сортируются по спискам: список читается одним срезом
+    labels = nearest(vectors, centroids)
+    order = np.argsort(labels, kind='stable')
+    offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(labels, minlength=len(centroids)))
+    quantized, scales = quantize(vectors[order])
+
+    meta = {
+        'model': model_name,
+        'dim': int(vectors.shape[1]),
+        'count': len(windows),
+        'nlist': len(centroids),
+        'trained_count': trained_count,
+        'built': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+    tmp_dir = out_dir.with_name(out_dir.name + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    np.save(tmp_dir / 'vectors.npy', quantized)
+    np.save(tmp_dir / 'scales.npy', scales)
+    np.save(tmp_dir / 'centroids.npy', centroids)
+    np.save(tmp_dir / 'offsets.npy', offsets)
+
+    # Текст сообщения хранится один раз, окно - списком ID сообщений
+    db = sqlite3.connect(str(tmp_dir / 'windows.db'))
+    with db:
+        db.executescript(WINDOWS_SCHEMA)
+        db.executemany(
+            "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?)",
+            ((w['message_id'], w['date'], w['author'], w['line']) for w in windows)
+        )
+        db.executemany(
+            "INSERT INTO windows VALUES (?, ?, ?, ?)",
+            (
+                (row, windows[i]['message_id'], json.dumps(windows[i]['message_ids']), windows[i]['digest'])
+                for row, i in enumerate(order.tolist())
+            )
+        )
+    db.close()
+    (tmp_dir / 'meta.json').write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    # Подмена целиком: прежняя папка убирается только после того, как новая готова
+    old_dir = out_dir.with_name(out_dir.name + '.old')
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if out_dir.exists():
+        out_dir.rename(old_dir)
+    tmp_dir.rename(out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Векторный индекс исходных сообщений чата')
+    parser.add_argument('export', help='Папка экспорта или messages.html')
+    parser.add_argument('transcriptions', nargs='?', default=None, help='Папка транскрипций голосовых')
+    parser.add_argument('--out', default=str(DEFAULT_OUT), help=f'Папка индекса (по умолчанию: {DEFAULT_OUT})')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help=f'Модель sentence-transformers (по умолчанию: {DEFAULT_MODEL})')
+    parser.add_argument('--retrain', action='store_true', help='Обучить центроиды IVF заново')
+    args = parser.parse_args()
+
+    pages = find_pages(args.export)
+    if not pages:
+        print(f"Ошибка: В {args.export} нет файлов messages*.html")
+        sys.exit(1)
+
+    transcriptions = None
+    if args.transcriptions:
+        from inject_transcriptions import load_transcriptions
+        with contextlib.redirect_stdout(None):
+            transcriptions = load_transcriptions(args.transcriptions)
+        print(f"Транскрипций: {len(transcriptions)}")
+
+    started = time.perf_counter()
+    windows = build_windows(iter_records(pages, transcriptions))
+    print(f"Страниц экспорта: {len(pages)}, разобрано за {time.perf_counter() - started:.1f} с")
+
+    embed = load_model(args.model)
+    meta = build_vectors(windows, args.out, embed, args.model, retrain=args.retrain)
+
+    size = sum(path.stat().st_size for path in Path(args.out).iterdir())
+    print(f"\n✅ Индекс: {args.out} ({meta['count']} окон, {meta['nlist']} списков, {size / 1024 / 1024:.1f} MB)")
+    print(f"Время: {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == '__main__':
+    main()
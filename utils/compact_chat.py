@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Компактный текст чата для анализа в LLM.
+
+Формат messages.txt / messages+audio.txt удобен для чтения, но на каждое
+сообщение тратит десятки токенов на служебные строки: разделители из "─",
+"Сообщение ID:", подписи "Дата:" и "От:", полную дату с часовым поясом,
+полное имя автора. Здесь тот же экспорт записывается компактно:
+
+    ## 2025-03-22
+    11:41 Анна: текст сообщения
+     ещё одно сообщение Анны через пару минут
+    11:45 #57 Борис: сообщение, на которое потом ответят
+    11:50 Анна ↩57: ответ 🎤 транскрипция голосового [👍3]
+
+- дата - заголовком дня, у сообщения только время;
+- автор - коротким именем (расшифровка в начале файла);
+- сообщения подряд от одного автора в пределах COLLAPSE_MINUTES минут -
+  строками с отступом, без времени и имени;
+- номер сообщения (#57) пишется только у тех, на которые есть ответы,
+  ответ ссылается на него (↩57).
+
+С --report печатается сравнение форматов: токены всего и на сообщение
+(токенизатор бота: tiktoken, если установлен, иначе оценка).
+
+Использование:
+    python utils/compact_chat.py <папка_экспорта|messages.html> [папка_транскрипций] [--output data/messages.compact.txt] [--report]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from telegram_export import find_pages, iter_records
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+from token_counter import count_tokens, get_tokenizer_name  # noqa: E402
+
+
+DEFAULT_OUTPUT = Path(__file__).parent.parent / 'data' / 'messages.compact.txt'
+
+# Сообщения одного автора с промежутком не больше стольких минут сворачиваются
+COLLAPSE_MINUTES = 5
+
+LEGEND = (
+    'Формат: "ЧЧ:ММ Автор: текст"; строка с отступом - следующее сообщение того же автора; '
+    '#N - номер сообщения, ↩N - ответ на него; ⤷Имя - переслано от; '
+    '🎤 - голосовое (транскрипция); [👍3] - реакции.'
+)
+
+
+def make_aliases(authors):
+    """
+    Короткие имена участников: имя, а при совпадении имён - имя и первая буква фамилии.
+
+    Args:
+        authors: Полные имена
+
+    Returns:
+        dict: {полное имя: короткое имя}
+    """
+    authors = sorted(set(authors))
+    first_names = Counter(author.split()[0] for author in authors if author.split())
+
+    aliases = {}
+    for author in authors:
+        words = author.split()
+        if not words:
+            aliases[author] = '?'
+        elif first_names[words[0]] == 1 or len(words) == 1:
+            aliases[author] = words[0]
+        else:
+            aliases[author] = f"{words[0]} {words[1][0]}."
+
+    # Если и так совпало - оставляем полное имя
+    counts = Counter(aliases.values())
+    return {author: alias if counts[alias] == 1 else author for author, alias in aliases.items()}
+
+
+def message_body(record, aliases):
+    """Текст сообщения в одну строку: пересылка, текст, голосовое, вложение, реакции"""
+    parts = []
+    if record['forwarded_from']:
+        parts.append(f"⤷{aliases.get(record['forwarded_from'], record['forwarded_from'])}:")
+    if record['text']:
+        parts.append(' '.join(record['text'].split()))
+    if record['transcript']:
+        parts.append(f"🎤 {' '.join(record['transcript'].split())}")
+    elif record['voice_seconds'] is not None:
+        parts.append('🎤')
+    if record['media']:
+        parts.append(record['media'])
+    if record['reactions']:
+        parts.append('[' + ' '.join(f"{r['emoji']}{r['count']}" for r in record['reactions']) + ']')
+    return ' '.join(parts)
+
+
+def compact_days(records):
+    """
+    Сообщения в компактном формате, по дням.
+
+    Дни независимы (сворачивание сообщений не переходит через полночь),
+    поэтому их можно группировать в окна для анализа по частям.
+
+    Args:
+        records: Записи сообщений по порядку (telegram_export.iter_records)
+
+    Returns:
+        tuple: ({полное имя: короткое имя}, [(день "YYYY-MM-DD", текст дня с заголовком "## день")])
+    """
+    records = list(records)
+    aliases = make_aliases(record['author'] or '?' for record in records)
+    replied = {record['reply_to_id'] for record in records if record['reply_to_id']}
+
+    days = []
+    lines = None
+    previous = None
+    for record in records:
+        when = datetime.fromisoformat(record['date']) if record['date'] else None
+        day = when.date().isoformat() if when else (days[-1][0] if days else '')
+        if lines is None or (when and day != days[-1][0]):
+            lines = [f"## {day}"]
+            days.append((day, lines))
+            previous = None
+
+        body = message_body(record, aliases)
+        marker = f"#{record['id']} " if record['id'] in replied else ''
+        reply = f" ↩{record['reply_to_id']}" if record['reply_to_id'] else ''
+
+        collapse = (
+            previous is not None and when is not None
+            and previous[0] == record['author'] and not reply
+            and (when - previous[1]).total_seconds() <= COLLAPSE_MINUTES * 60
+        )
+        if collapse:
+            lines.append(f" {marker}{body}")
+        else:
+            time_text = when.strftime('%H:%M') if when else '--:--'
+            lines.append(f"{time_text} {marker}{aliases[record['author'] or '?']}{reply}: {body}")
+
+        if when:
+            previous = (record['author'], when)
+
+    return aliases, [(day, '\n'.join(lines)) for day, lines in days]
+
+
+def participants_line(aliases):
+    """Расшифровка коротких имён: "Участники: Анна = Анна Смирнова; ..." """
+    return 'Участники: ' + '; '.join(
+        f"{alias} = {author}" if alias != author else author
+        for author, alias in sorted(aliases.items(), key=lambda item: item[1])
+    )
+
+
+def render_compact(records):
+    """
+    Записать сообщения в компактном формате.
+
+    Args:
+        records: Записи сообщений по порядку (telegram_export.iter_records)
+
+    Returns:
+        str: Текст
+    """
+    aliases, days = compact_days(records)
+    blocks = [participants_line(aliases) + '\n' + LEGEND] + [text for _, text in days]
+    return '\n\n'.join(blocks) + '\n'
+
+
+def format_report(pages, transcriptions_dir, compact_text):
+    """
+    Сравнение форматов по токенам.
+
+    Returns:
+        list: [(название, символов, токенов)]
+    """
+    from html_to_txt import convert_html_to_txt
+    from inject_transcriptions import convert_with_transcriptions
+
+    formats = []
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        texts = []
+        for page in pages:
+            output = Path(tmp) / f"{page.stem}.txt"
+            convert_html_to_txt(page, output)
+            texts.append(output.read_text(encoding='utf-8'))
+        formats.append(('messages.txt (html_to_txt)', ''.join(texts)))
+
+        if transcriptions_dir:
+            texts = []
+            for page in pages:
+                output = Path(tmp) / f"{page.stem}+audio.txt"
+                convert_with_transcriptions(page, transcriptions_dir, output, index_path=None)
+                texts.append(output.read_text(encoding='utf-8'))
+            formats.append(('messages+audio.txt (inject_transcriptions)', ''.join(texts)))
+
+    formats.append(('компактный (compact_chat)', compact_text))
+    return [(name, len(text), count_tokens(text)) for name, text in formats]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Компактный текст чата для анализа в LLM')
+    parser.add_argument('export', help='Папка экспорта или messages.html')
+    parser.add_argument('transcriptions', nargs='?', default=None, help='Папка транскрипций голосовых')
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help=f'Выходной файл (по умолчанию: {DEFAULT_OUTPUT})')
+    parser.add_argument('--report', action='store_true', help='Сравнить форматы по токенам')
+    args = parser.parse_args()
+
+    pages = find_pages(args.export)
+    if not pages:
+        print(f"Ошибка: В {args.export} нет файлов messages*.html")
+        sys.exit(1)
+
+    transcriptions = None
+    if args.transcriptions:
+        from inject_transcriptions import load_transcriptions
+        with contextlib.redirect_stdout(None):
+            transcriptions = load_transcriptions(args.transcriptions)
+        print(f"Транскрипций: {len(transcriptions)}")
+
+    records = list(iter_records(pages, transcriptions))
+    text = render_compact(records)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(text, encoding='utf-8')
+    print(f"✅ Готово! Файл сохранен: {output_path}")
+    print(f"Сообщений: {len(records)}, размер: {output_path.stat().st_size / 1024:.2f} KB")
+
+    if args.report:
+        print(f"\nТокены ({get_tokenizer_name()}):")
+        report = format_report(pages, args.transcriptions, text)
+        # Проценты - от исходного формата (с транскрипциями, если они есть)
+        base = report[-2][2]
+        for name, chars, tokens in report:
+            print(f"  {name:<44} {chars:>10,} симв. {tokens:>10,} ток. "
+                  f"{tokens / max(1, len(records)):>6.1f} ток./сообщ. ({tokens / base:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -67,8 +67,15 @@ def main():
     if not run_command(f"{ssh_cmd} 'mkdir -p {REMOTE_DIR}'"):
         sys.exit(1)
 
-    print("\n[2/6] Копирование файлов на сервер...")
-    if not run_command(f"{scp_cmd} app result .env root@{VPS_IP}:{REMOTE_DIR}/"):
+    print("\n[2/6] Сборка снимка контекста и копирование файлов на сервер...")
+    # Вместо директории result/ на сервер копируется готовый снимок app/context.snapshot
+    if not run_command(f"{sys.executable} app/snapshot_artifact.py result app/context.snapshot"):
+        sys.exit(1)
+    if not run_command(f"{scp_cmd} app .env root@{VPS_IP}:{REMOTE_DIR}/"):
+        sys.exit(1)
+    # Прежние деплои копировали result/: бот сверил бы с ним новый снимок, отверг бы его
+    # и загрузил устаревшие файлы. Контекст на сервере - только снимок
+    if not run_command(f"{ssh_cmd} 'rm -rf {REMOTE_DIR}/result'"):
         sys.exit(1)
 
     print("\n[3/6] Установка зависимостей на сервере...")
@@ -14,6 +14,8 @@ except ImportError:
     print("Установите её командой: pip install beautifulsoup4")
     sys.exit(1)
 
+from telegram_export import forwarded_origin, process_text_element, reply_target_id
+
 
 def parse_message(msg_div):
     """Извлекает информацию из одного сообщения"""
@@ -42,23 +44,29 @@ def parse_message(msg_div):
         result.append(f"Дата: {date_text}")
 
     # Имя отправителя
-    from_name = body.find('div', class_='from_name')
+    from_name = body.find('div', class_='from_name', recursive=False)
     if from_name:
         result.append(f"От: {from_name.get_text(strip=True)}")
 
     # Проверяем, есть ли ответ на сообщение
     reply_to = body.find('div', class_='reply_to')
     if reply_to:
-        reply_text = reply_to.get_text(strip=True)
-        result.append(f"↩️ {reply_text}")
+        reply_text = reply_to.get_text(' ', strip=True)
+        target_id = reply_target_id(reply_to)
+        if target_id is not None:
+            result.append(f"↩️ Ответ на message{target_id}: {reply_text}")
+        else:
+            result.append(f"↩️ {reply_text}")
 
     # Проверяем, есть ли пересланное сообщение
     forwarded = body.find('div', class_='forwarded')
     if forwarded:
         result.append("--- Пересланное сообщение ---")
-        fwd_from = forwarded.find('div', class_='from_name')
-        if fwd_from:
-            result.append(f"От: {fwd_from.get_text(strip=True)}")
+        fwd_author, fwd_date = forwarded_origin(forwarded)
+        if fwd_author:
+            result.append(f"От: {fwd_author}")
+        if fwd_date:
+            result.append(f"Дата оригинала: {fwd_date}")
         fwd_text = forwarded.find('div', class_='text')
         if fwd_text:
             # Обрабатываем текст с сохранением переносов строк
@@ -96,22 +104,6 @@ def parse_message(msg_div):
     return result
 
 
-def process_text_element(text_elem):
-    """Обрабатывает текстовый элемент, сохраняя форматирование"""
-    # Заменяем <br> на переносы строк
-    for br in text_elem.find_all('br'):
-        br.replace_with('\n')
-
-    # Получаем текст
-    text = text_elem.get_text()
-
-    # Удаляем лишние пробелы, но сохраняем переносы строк
-    lines = [line.strip() for line in text.split('\n')]
-    text = '\n'.join(lines)
-
-    return text.strip()
-
-
 def process_media(media_wrap):
     """Обрабатывает медиафайлы"""
     result = []
@@ -5,7 +5,6 @@
 """
 
 import sys
-import re
 from pathlib import Path
 
 try:
@@ -15,6 +14,8 @@ except ImportError:
     print("Установите её командой: pip install beautifulsoup4")
     sys.exit(1)
 
+from telegram_export import forwarded_origin, process_text_element, reply_target_id
+
 
 def load_transcriptions(transcriptions_dir):
     """Загружает все транскрипции, индексирует по имени файла"""
@@ -68,23 +69,29 @@ def parse_message(msg_div, transcriptions):
         result.append(f"Дата: {date_text}")
 
     # Имя отправителя
-    from_name = body.find('div', class_='from_name')
+    from_name = body.find('div', class_='from_name', recursive=False)
     if from_name:
         result.append(f"От: {from_name.get_text(strip=True)}")
 
     # Ответ на сообщение
     reply_to = body.find('div', class_='reply_to')
     if reply_to:
-        reply_text = reply_to.get_text(strip=True)
-        result.append(f"↩️ {reply_text}")
+        reply_text = reply_to.get_text(' ', strip=True)
+        target_id = reply_target_id(reply_to)
+        if target_id is not None:
+            result.append(f"↩️ Ответ на message{target_id}: {reply_text}")
+        else:
+            result.append(f"↩️ {reply_text}")
 
     # Пересланное сообщение
     forwarded = body.find('div', class_='forwarded')
     if forwarded:
         result.append("--- Пересланное сообщение ---")
-        fwd_from = forwarded.find('div', class_='from_name')
-        if fwd_from:
-            result.append(f"От: {fwd_from.get_text(strip=True)}")
+        fwd_author, fwd_date = forwarded_origin(forwarded)
+        if fwd_author:
+            result.append(f"От: {fwd_author}")
+        if fwd_date:
+            result.append(f"Дата оригинала: {fwd_date}")
         fwd_text = forwarded.find('div', class_='text')
         if fwd_text:
             text = process_text_element(fwd_text)
@@ -126,15 +133,6 @@ def parse_message(msg_div, transcriptions):
     return result
 
 
-def process_text_element(text_elem):
-    """Обрабатывает текстовый элемент, сохраняя форматирование"""
-    for br in text_elem.find_all('br'):
-        br.replace_with('\n')
-    text = text_elem.get_text()
-    lines = [line.strip() for line in text.split('\n')]
-    return '\n'.join(lines).strip()
-
-
 def process_voice_message(voice_elem, transcriptions):
     """Обрабатывает голосовое сообщение с транскрипцией"""
     result = []
@@ -205,8 +203,13 @@ def process_media(media_wrap, transcriptions):
     return result if result else ["📎 Медиафайл"]
 
 
-def convert_with_transcriptions(html_path, transcriptions_dir, output_path):
-    """Конвертирует HTML в текст с транскрипциями голосовых"""
+def convert_with_transcriptions(html_path, transcriptions_dir, output_path, index_path=None):
+    """
+    Конвертирует HTML в текст с транскрипциями голосовых.
+
+    Если указан index_path, по тем же сообщениям строится полнотекстовый
+    индекс SQLite FTS5 (см. chat_index.py).
+    """
 
     print(f"Загружаю транскрипции из: {transcriptions_dir}")
     transcriptions = load_transcriptions(transcriptions_dir)
@@ -229,12 +232,25 @@ def convert_with_transcriptions(html_path, transcriptions_dir, output_path):
     messages = soup.find_all('div', class_='message')
     print(f"Найдено сообщений: {len(messages)}")
 
+    # Записи для индекса собираются из того же разобранного HTML
+    records = []
+    previous_author = None
+    if index_path:
+        from telegram_export import parse_record
+
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write("=" * 80 + "\n")
         f.write(f"{chat_title}\n")
         f.write("=" * 80 + "\n\n")
 
         for i, msg in enumerate(messages, 1):
+            if index_path:
+                # parse_record разбирает исходный div до того, как parse_message заменит в нём <br>
+                record = parse_record(msg, transcriptions, previous_author)
+                previous_author = record['author'] if record else None
+                if record:
+                    records.append(record)
+
             msg_lines = parse_message(msg, transcriptions)
             if msg_lines:
                 msg_id = msg.get('id', '')
@@ -255,6 +271,11 @@ def convert_with_transcriptions(html_path, transcriptions_dir, output_path):
     print(f"\n✅ Готово! Файл сохранен: {output_path}")
     print(f"Размер: {output_path.stat().st_size / 1024:.2f} KB")
 
+    if index_path:
+        from chat_index import build_index
+        count = build_index(records, index_path)
+        print(f"✅ Индекс: {index_path} ({count} сообщений)")
+
 
 def main():
     base_dir = Path(__file__).parent.parent
@@ -271,7 +292,12 @@ def main():
     if len(sys.argv) >= 4:
         output_path = Path(sys.argv[3])
 
-    convert_with_transcriptions(html_path, transcriptions_dir, output_path)
+    # Полнотекстовый индекс рядом с текстом (пустая строка - не строить)
+    index_path = output_path.parent / "chat_index.db"
+    if len(sys.argv) >= 5:
+        index_path = Path(sys.argv[4]) if sys.argv[4] else None
+
+    convert_with_transcriptions(html_path, transcriptions_dir, output_path, index_path)
 
 
 if __name__ == '__main__':
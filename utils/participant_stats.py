@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Статистика активности участников чата (векторизованно, NumPy).
+
+Сообщения загружаются в столбцы NumPy (ID, время, код автора, ID цели
+ответа, число слов, секунды голосовых, число реакций) - из экспорта
+(telegram_export.py) или, быстрее, из уже построенного индекса
+chat_index.db. Все показатели считаются операциями над массивами
+(bincount, unique, searchsorted) без цикла по сообщениям:
+
+- сообщения, слова, минуты голосовых, полученные реакции по авторам;
+- ответы: сколько раз автор отвечал другим и сколько ответов получил,
+  самый частый собеседник;
+- первый и последний день активности, число активных дней;
+- тепловые карты: день недели x час и автор x неделя.
+
+Результат - markdown-таблицы для 02-chat_participants.md или JSON для
+команд бота /stats и /who.
+
+Использование:
+    python utils/participant_stats.py <папка_экспорта|messages.html|chat_index.db> [--output data/participant_stats.md] [--json]
+    python utils/participant_stats.py data/chat_index.db --json --output data/participant_stats.json
+    python utils/participant_stats.py --benchmark 1000000
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    print("Ошибка: Необходимо установить библиотеку numpy")
+    print("Установите её командой: pip install numpy")
+    sys.exit(1)
+
+
+WEEKDAYS = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+
+# Уровни для строки активности по неделям
+SPARK = ' ▁▂▃▄▅▆▇█'
+
+
+class MessageColumns:
+    """Сообщения чата в столбцах NumPy"""
+
+    def __init__(self, ids, dates, authors, reply_to, words, voice_seconds, reactions):
+        """
+        Args:
+            ids: ID сообщений
+            dates: Даты ISO ("2025-03-22T11:41:52") или None
+            authors: Имена авторов
+            reply_to: ID цели ответа или None
+            words: Число слов
+            voice_seconds: Длительность голосового или None
+            reactions: Число полученных реакций
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.times = np.array([d or 'NaT' for d in dates], dtype='datetime64[s]')
+        self.names, self.authors = np.unique(np.array([a or '?' for a in authors], dtype=object),
+                                             return_inverse=True)
+        self.names = [str(name) for name in self.names]
+        self.reply_to = np.array([-1 if r is None else r for r in reply_to], dtype=np.int64)
+        self.words = np.asarray(words, dtype=np.int64)
+        self.voice_seconds = np.array([v or 0 for v in voice_seconds], dtype=np.int64)
+        self.reactions = np.asarray(reactions, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_records(cls, records):
+        """Из записей telegram_export.iter_records"""
+        ids, dates, authors, reply_to, words, voice, reactions = [], [], [], [], [], [], []
+        for record in records:
+            ids.append(record['id'])
+            dates.append(record['date'])
+            authors.append(record['author'])
+            reply_to.append(record['reply_to_id'])
+            words.append(len(record['text'].split()) + len((record['transcript'] or '').split()))
+            voice.append(record['voice_seconds'])
+            reactions.append(sum(reaction['count'] for reaction in record['reactions']))
+        return cls(ids, dates, authors, reply_to, words, voice, reactions)
+
+    @classmethod
+    def from_index(cls, db_path):
+        """Из индекса chat_index.db (реакции суммируются в SQLite)"""
+        db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            rows = db.execute(
+                "SELECT id, date, author, reply_to_id, "
+                "       coalesce(text, '') || ' ' || coalesce(transcript, ''), voice_seconds, "
+                "       coalesce((SELECT sum(json_extract(value, '$.count')) "
+                "                 FROM json_each(messages.reactions)), 0) "
+                "FROM messages ORDER BY id"
+            ).fetchall()
+        finally:
+            db.close()
+
+        if not rows:
+            return cls([], [], [], [], [], [], [])
+        ids, dates, authors, reply_to, texts, voice, reactions = zip(*rows)
+        return cls(ids, dates, authors, reply_to, [len(text.split()) for text in texts], voice, reactions)
+
+
+def compute_stats(columns):
+    """
+    Показатели по авторам и тепловые карты.
+
+    Args:
+        columns: MessageColumns
+
+    Returns:
+        dict: {'authors': [...], 'weekday_hour': [[...]], 'weeks': [...], 'author_weeks': [[...]]}
+    """
+    n = len(columns.names)
+    author = columns.authors
+
+    messages = np.bincount(author, minlength=n)
+    words = np.bincount(author, weights=columns.words, minlength=n)
+    voice_minutes = np.bincount(author, weights=columns.voice_seconds, minlength=n) / 60
+    reactions = np.bincount(author, weights=columns.reactions, minlength=n)
+
+    # Ответы: автор цели ищется по отсортированным ID (searchsorted), ответы самому себе не считаются
+    order = np.argsort(columns.ids)
+    sorted_ids = columns.ids[order]
+    position = np.clip(np.searchsorted(sorted_ids, columns.reply_to), 0, max(len(sorted_ids) - 1, 0))
+    is_reply = (columns.reply_to >= 0) & (sorted_ids[position] == columns.reply_to) if len(columns) else \
+        np.zeros(0, dtype=bool)
+    target = author[order][position]
+    is_reply &= target != author
+    replies_out = np.bincount(author[is_reply], minlength=n)
+    replies_in = np.bincount(target[is_reply], minlength=n)
+    pairs = np.bincount(author[is_reply] * n + target[is_reply], minlength=n * n).reshape(n, n)
+    partners = pairs + pairs.T
+
+    # Дни и недели активности
+    valid = ~np.isnat(columns.times)
+    days = columns.times[valid].astype('datetime64[D]')
+    day_author = author[valid]
+    first = np.full(n, np.datetime64('NaT'), dtype='datetime64[D]')
+    last = np.full(n, np.datetime64('NaT'), dtype='datetime64[D]')
+    active_days = np.zeros(n, dtype=np.int64)
+    if len(days):
+        day_numbers = days.astype(np.int64)
+        first_numbers = np.full(n, np.iinfo(np.int64).max)
+        last_numbers = np.full(n, np.iinfo(np.int64).min)
+        np.minimum.at(first_numbers, day_author, day_numbers)
+        np.maximum.at(last_numbers, day_author, day_numbers)
+        seen = first_numbers != np.iinfo(np.int64).max
+        first[seen] = first_numbers[seen].astype('datetime64[D]')
+        last[seen] = last_numbers[seen].astype('datetime64[D]')
+        span = day_numbers.max() - day_numbers.min() + 1
+        unique_pairs = np.unique(day_author * span + (day_numbers - day_numbers.min()))
+        active_days = np.bincount(unique_pairs // span, minlength=n)
+
+    # День недели x час (1970-01-01 - четверг) и автор x неделя (с понедельника)
+    seconds = columns.times[valid].astype(np.int64)
+    weekday = ((seconds // 86400) + 3) % 7
+    hour = (seconds // 3600) % 24
+    weekday_hour = np.bincount(weekday * 24 + hour, minlength=7 * 24).reshape(7, 24)
+
+    weeks = []
+    author_weeks = np.zeros((n, 0), dtype=np.int64)
+    if len(days):
+        week = (days.astype(np.int64) + 3) // 7
+        week_min = week.min()
+        week_count = week.max() - week_min + 1
+        author_weeks = np.bincount(
+            day_author * week_count + (week - week_min), minlength=n * week_count
+        ).reshape(n, week_count)
+        weeks = [str(np.datetime64(int((week_min + i) * 7 - 3), 'D')) for i in range(week_count)]
+
+    authors = []
+    for i in np.argsort(-messages, kind='stable'):
+        partner = int(np.argmax(partners[i])) if partners[i].any() else None
+        authors.append({
+            'author': columns.names[i],
+            'messages': int(messages[i]),
+            'words': int(words[i]),
+            'words_per_message': round(float(words[i] / messages[i]), 1) if messages[i] else 0.0,
+            'voice_minutes': round(float(voice_minutes[i]), 1),
+            'reactions_received': int(reactions[i]),
+            'replies_out': int(replies_out[i]),
+            'replies_in': int(replies_in[i]),
+            'top_partner': columns.names[partner] if partner is not None else None,
+            'first_day': None if np.isnat(first[i]) else str(first[i]),
+            'last_day': None if np.isnat(last[i]) else str(last[i]),
+            'active_days': int(active_days[i]),
+            'weekly': author_weeks[i].tolist(),
+        })
+
+    return {
+        'messages': len(columns),
+        'authors': authors,
+        'weekday_hour': weekday_hour.tolist(),
+        'weeks': weeks,
+    }
+
+
+def sparkline(values):
+    """Строка активности: символ на неделю, высота - доля от максимума автора"""
+    values = np.asarray(values)
+    if not len(values) or values.max() == 0:
+        return ''
+    levels = np.ceil(values / values.max() * (len(SPARK) - 1)).astype(int)
+    return ''.join(SPARK[level] for level in levels)
+
+
+def format_markdown(stats):
+    """Таблицы статистики в markdown"""
+    lines = [
+        '## Активность участников',
+        '',
+        f"Сообщений: {stats['messages']}, участников: {len(stats['authors'])}.",
+        '',
+        '| Участник | Сообщений | Слов | Слов/сообщ. | Голосовые, мин | Реакций получено '
+        '| Ответил | Получил ответов | Частый собеседник | Активен | Дней |',
+        '|---|---:|---:|---:|---:|---:|---:|---:|---|---|---:|',
+    ]
+    for a in stats['authors']:
+        lines.append(
+            f"| {a['author']} | {a['messages']} | {a['words']} | {a['words_per_message']} "
+            f"| {a['voice_minutes']} | {a['reactions_received']} | {a['replies_out']} | {a['replies_in']} "
+            f"| {a['top_partner'] or '-'} | {a['first_day'] or '-'} - {a['last_day'] or '-'} | {a['active_days']} |"
+        )
+
+    if stats['weeks']:
+        lines += [
+            '',
+            f"## Активность по неделям ({stats['weeks'][0]} - {stats['weeks'][-1]})",
+            '',
+            '```',
+        ]
+        width = max(len(a['author']) for a in stats['authors'])
+        for a in stats['authors']:
+            lines.append(f"{a['author']:<{width}} {sparkline(a['weekly'])}")
+        lines.append('```')
+
+    lines += [
+        '',
+        '## Сообщения по дням недели и часам',
+        '',
+        '| | ' + ' | '.join(f"{hour:02d}" for hour in range(24)) + ' |',
+        '|---|' + '---:|' * 24,
+    ]
+    for name, row in zip(WEEKDAYS, stats['weekday_hour']):
+        lines.append(f"| {name} | " + ' | '.join(str(value) for value in row) + ' |')
+
+    return '\n'.join(lines) + '\n'
+
+
+def load_columns(source, transcriptions_dir=None):
+    """Загрузить сообщения из chat_index.db или из экспорта"""
+    source = Path(source)
+    if source.suffix == '.db':
+        return MessageColumns.from_index(source)
+
+    import contextlib
+    from telegram_export import find_pages, iter_records
+
+    pages = find_pages(source)
+    if not pages:
+        print(f"Ошибка: В {source} нет файлов messages*.html")
+        sys.exit(1)
+    transcriptions = None
+    if transcriptions_dir:
+        from inject_transcriptions import load_transcriptions
+        with contextlib.redirect_stdout(None):
+            transcriptions = load_transcriptions(transcriptions_dir)
+    return MessageColumns.from_records(iter_records(pages, transcriptions))
+
+
+def benchmark(count, authors=17, seed=0):
+    """Замер на синтетических столбцах: count сообщений, authors участников"""
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    columns = MessageColumns.__new__(MessageColumns)
+    columns.ids = np.arange(1, count + 1, dtype=np.int64)
+    start = np.datetime64('2025-01-01T00:00:00').astype(np.int64)
+    columns.times = np.sort(rng.integers(start, start + 365 * 86400, count)).astype('datetime64[s]')
+    columns.names = [f"Участник {i}" for i in range(authors)]
+    columns.authors = rng.zipf(1.5, count) % authors
+    reply = rng.random(count) < 0.2
+    columns.reply_to = np.where(reply, np.maximum(1, columns.ids - rng.integers(1, 50, count)), -1)
+    columns.words = rng.integers(1, 60, count)
+    columns.voice_seconds = np.where(rng.random(count) < 0.05, rng.integers(5, 300, count), 0)
+    columns.reactions = rng.poisson(0.3, count)
+    generated = time.perf_counter() - started
+
+    started = time.perf_counter()
+    stats = compute_stats(columns)
+    computed = time.perf_counter() - started
+    text = format_markdown(stats)
+    print(f"Сообщений: {count}, участников: {authors}, недель: {len(stats['weeks'])}")
+    print(f"Генерация столбцов: {generated:.2f} с, расчёт: {computed:.2f} с, таблицы: {len(text)} символов")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Статистика активности участников чата')
+    parser.add_argument('source', nargs='?', help='Папка экспорта, messages.html или chat_index.db')
+    parser.add_argument('transcriptions', nargs='?', default=None, help='Папка транскрипций (для экспорта)')
+    parser.add_argument('--output', default=None, help='Записать результат в файл')
+    parser.add_argument('--json', action='store_true', help='JSON вместо markdown')
+    parser.add_argument('--benchmark', type=int, default=None, metavar='N', help='Замер на N синтетических сообщений')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return
+    if not args.source:
+        parser.error('укажите экспорт или chat_index.db')
+
+    started = time.perf_counter()
+    columns = load_columns(args.source, args.transcriptions)
+    loaded = time.perf_counter() - started
+    started = time.perf_counter()
+    stats = compute_stats(columns)
+    computed = time.perf_counter() - started
+
+    # JSON читает бот (команды /stats и /who, app/local_answers.py)
+    text = json.dumps(stats, ensure_ascii=False, indent=2) if args.json else format_markdown(stats)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text, encoding='utf-8')
+        print(f"✅ Готово! Файл сохранен: {args.output}")
+    else:
+        print(text)
+        if args.json:
+            return
+    print(f"Сообщений: {len(columns)}, загрузка {loaded:.2f} с, расчёт {computed:.3f} с")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,30 @@
 """
 Конвертер PDF файлов в Markdown формат.
 Использует PyMuPDF (fitz) для извлечения текста.
+
+Большие документы обрабатываются параллельно: страницы делятся на диапазоны,
+каждый диапазон читается в отдельном процессе (со своим экземпляром документа),
+а результат пишется в .md по порядку страниц по мере готовности.
+
+Если передана папка (например, files/ из экспорта чата), конвертируются все
+поддерживаемые документы в ней: PDF - через PyMuPDF, DOCX и другие форматы -
+через Pandoc. Неизменённые файлы пропускаются по SHA-256 из манифеста.
+
+С флагом --ocr страницы без текстового слоя распознаются локальным Tesseract
+(rus+eng). Рендерятся и распознаются только такие страницы, результаты
+кэшируются по хэшу изображения страницы.
 """
 
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import subprocess
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 try:
@@ -15,27 +36,227 @@ except ImportError:
     sys.exit(1)
 
 
-def extract_text_from_pdf(pdf_path):
+# Количество страниц в одном задании для процесса
+PAGES_PER_CHUNK = 16
+
+# Документы меньшего размера читаются в текущем процессе
+MIN_PAGES_FOR_POOL = 2 * PAGES_PER_CHUNK
+
+# Файлы пакетного режима в выходной папке
+MANIFEST_FILENAME = '.manifest.json'
+INDEX_FILENAME = 'index.md'
+
+# Форматы, которые конвертируются через Pandoc
+PANDOC_EXTENSIONS = {'.docx', '.odt', '.rtf', '.epub', '.html', '.htm'}
+
+# Параметры OCR по умолчанию
+OCR_DPI = 300
+OCR_LANGUAGE = 'rus+eng'
+OCR_CACHE_DIRNAME = '.ocr_cache'
+
+# При OCR задания меньше: распознавание страницы намного дороже извлечения текста
+OCR_PAGES_PER_CHUNK = 2
+
+
+def get_page_count(pdf_path):
+    """Возвращает количество страниц в PDF файле"""
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def check_ocr():
+    """Проверяет, что pytesseract, Pillow и Tesseract установлены"""
+    try:
+        import pytesseract
+        from PIL import Image  # noqa: F401
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def ocr_page(page, dpi=OCR_DPI, language=OCR_LANGUAGE, cache_dir=None):
     """
-    Извлекает текст из PDF файла постранично.
+    Распознаёт текст страницы через Tesseract.
+
+    Страница рендерится в оттенках серого; результат кэшируется по SHA-256
+    пикселей, DPI и языка, поэтому повторный запуск не распознаёт её заново.
+
+    Args:
+        page: страница fitz
+        dpi: разрешение рендеринга
+        language: языки Tesseract
+        cache_dir: папка кэша (None - без кэша)
+
+    Returns:
+        распознанный текст
+    """
+    import pytesseract
+    from PIL import Image
+
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+
+    cache_path = None
+    if cache_dir is not None:
+        digest = hashlib.sha256(pix.samples)
+        digest.update(f"|{dpi}|{language}".encode('utf-8'))
+        cache_path = Path(cache_dir) / f"{digest.hexdigest()}.txt"
+        if cache_path.exists():
+            return cache_path.read_text(encoding='utf-8')
+
+    image = Image.frombytes('L', (pix.width, pix.height), pix.samples)
+    text = pytesseract.image_to_string(image, lang=language)
+
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_text(text, encoding='utf-8')
+        os.replace(tmp_path, cache_path)
+
+    return text
+
+
+def init_worker():
+    """
+    Инициализация процесса-воркера пула.
+
+    Процессов уже по числу ядер, поэтому Tesseract в воркерах работает в
+    один поток; без пула (один процесс) он использует все ядра.
+    """
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+
+def extract_page_range(pdf_path, start, stop, ocr=None):
+    """
+    Извлекает текст из диапазона страниц PDF файла.
+
+    Выполняется в процессе-воркере, поэтому открывает документ сам.
 
     Args:
         pdf_path: путь к PDF файлу
+        start: индекс первой страницы (с нуля)
+        stop: индекс страницы, следующей за последней
+        ocr: параметры ocr_page (dpi, language, cache_dir) для страниц
+             без текстового слоя; None - OCR выключен
 
     Returns:
-        список кортежей (номер_страницы, текст)
+        список кортежей (номер_страницы, текст) для страниц с текстом
     """
     pages = []
 
     with fitz.open(pdf_path) as doc:
-        for page_num, page in enumerate(doc, 1):
+        for page_index in range(start, stop):
+            page = doc[page_index]
             text = page.get_text("text")
+            if not text.strip() and ocr is not None:
+                text = ocr_page(page, **ocr)
             if text.strip():
-                pages.append((page_num, text))
+                pages.append((page_index + 1, text))
 
     return pages
 
 
+def extract_text_from_pdf(pdf_path, workers=None, chunk_size=None, ocr=None):
+    """
+    Извлекает текст из PDF файла постранично.
+
+    Страницы отдаются по порядку по мере готовности. В работе одновременно
+    находится не больше 2 * workers диапазонов, поэтому расход памяти
+    не зависит от количества страниц.
+
+    Args:
+        pdf_path: путь к PDF файлу
+        workers: количество процессов (по умолчанию - по числу ядер)
+        chunk_size: количество страниц в одном задании
+        ocr: параметры OCR для страниц без текста (см. extract_page_range)
+
+    Yields:
+        кортежи (номер_страницы, текст)
+    """
+    if chunk_size is None:
+        chunk_size = OCR_PAGES_PER_CHUNK if ocr is not None else PAGES_PER_CHUNK
+
+    page_count = get_page_count(pdf_path)
+    ranges = [
+        (start, min(start + chunk_size, page_count))
+        for start in range(0, page_count, chunk_size)
+    ]
+
+    workers = workers or os.cpu_count() or 1
+
+    # Для небольших документов накладные расходы на процессы не окупаются
+    # (кроме OCR, где даже несколько страниц распознаются долго)
+    if workers == 1 or (page_count < MIN_PAGES_FOR_POOL and ocr is None):
+        for start, stop in ranges:
+            yield from extract_page_range(pdf_path, start, stop, ocr)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        pending = deque()
+        ranges_iter = iter(ranges)
+
+        # Заполняем окно заданий
+        for start, stop in ranges_iter:
+            pending.append(executor.submit(extract_page_range, str(pdf_path), start, stop, ocr))
+            if len(pending) >= 2 * workers:
+                break
+
+        # Забираем результаты по порядку, досылая новые задания
+        while pending:
+            pages = pending.popleft().result()
+            next_range = next(ranges_iter, None)
+            if next_range is not None:
+                pending.append(executor.submit(extract_page_range, str(pdf_path), *next_range, ocr))
+            yield from pages
+
+
+def format_header(title, page_count):
+    """
+    Форматирует заголовок Markdown документа.
+
+    Args:
+        title: заголовок документа
+        page_count: количество страниц
+
+    Returns:
+        строка в формате Markdown
+    """
+    return f"# {title}\n\n*Страниц: {page_count}*\n\n---\n\n"
+
+
+def format_page(page_num, text):
+    """
+    Форматирует одну страницу как раздел Markdown.
+
+    Args:
+        page_num: номер страницы
+        text: текст страницы
+
+    Returns:
+        строка в формате Markdown
+    """
+    lines = [f"## Страница {page_num}", ""]
+
+    # Обрабатываем текст: убираем лишние пустые строки
+    prev_empty = False
+
+    for line in text.split('\n'):
+        line = line.rstrip()
+        is_empty = not line
+
+        if is_empty:
+            if not prev_empty:
+                lines.append("")
+            prev_empty = True
+        else:
+            lines.append(line)
+            prev_empty = False
+
+    lines.extend(["", "---", "", ""])
+
+    return '\n'.join(lines)
+
+
 def format_as_markdown(pages, title):
     """
     Форматирует извлечённый текст как Markdown.
@@ -47,53 +268,53 @@ def format_as_markdown(pages, title):
     Returns:
         строка в формате Markdown
     """
-    lines = []
-
-    # Заголовок документа
-    lines.append(f"# {title}")
-    lines.append("")
-    lines.append(f"*Страниц: {len(pages)}*")
-    lines.append("")
-    lines.append("---")
-    lines.append("")
-
-    # Содержимое страниц
-    for page_num, text in pages:
-        lines.append(f"## Страница {page_num}")
-        lines.append("")
-
-        # Обрабатываем текст: убираем лишние пустые строки
-        text_lines = text.split('\n')
-        cleaned_lines = []
-        prev_empty = False
-
-        for line in text_lines:
-            line = line.rstrip()
-            is_empty = not line
-
-            if is_empty:
-                if not prev_empty:
-                    cleaned_lines.append("")
-                prev_empty = True
-            else:
-                cleaned_lines.append(line)
-                prev_empty = False
-
-        lines.extend(cleaned_lines)
-        lines.append("")
-        lines.append("---")
-        lines.append("")
+    parts = [format_header(title, len(pages))]
+    parts.extend(format_page(page_num, text) for page_num, text in pages)
+    return ''.join(parts).rstrip('\n') + '\n'
 
-    return '\n'.join(lines)
 
+def write_markdown(pdf_path, output_path, workers=None, ocr=None):
+    """
+    Извлекает текст из PDF и потоково записывает его в Markdown файл.
 
-def convert_pdf_to_md(pdf_path, output_path=None):
+    Args:
+        pdf_path: путь к PDF файлу
+        output_path: путь к выходному MD файлу
+        workers: количество процессов для извлечения текста
+        ocr: параметры OCR для страниц без текста (см. extract_page_range)
+
+    Returns:
+        количество страниц с текстом (0 - если текст не найден,
+        в этом случае выходной файл удаляется)
+    """
+    pdf_path = Path(pdf_path)
+    output_path = Path(output_path)
+    title = pdf_path.stem  # имя файла без расширения
+
+    extracted = 0
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(format_header(title, get_page_count(pdf_path)))
+
+        for page_num, text in extract_text_from_pdf(pdf_path, workers=workers, ocr=ocr):
+            f.write(format_page(page_num, text))
+            extracted += 1
+
+    if not extracted:
+        output_path.unlink()
+
+    return extracted
+
+
+def convert_pdf_to_md(pdf_path, output_path=None, workers=None, ocr=None):
     """
     Конвертирует PDF файл в Markdown формат.
 
     Args:
         pdf_path: путь к PDF файлу
         output_path: путь для сохранения MD (по умолчанию - то же имя с расширением .md)
+        workers: количество процессов (по умолчанию - по числу ядер)
+        ocr: параметры OCR (dpi, language); кэш хранится рядом с MD файлом
     """
     pdf_path = Path(pdf_path)
 
@@ -107,50 +328,425 @@ def convert_pdf_to_md(pdf_path, output_path=None):
     else:
         output_path = Path(output_path)
 
+    if ocr is not None:
+        ocr = {**ocr, 'cache_dir': str(output_path.parent / OCR_CACHE_DIRNAME)}
+
     print(f"Читаю файл: {pdf_path}")
+    print("Конвертирую в Markdown...")
 
-    # Извлекаем текст
-    pages = extract_text_from_pdf(pdf_path)
+    # Извлекаем текст и сразу записываем его в файл
+    extracted = write_markdown(pdf_path, output_path, workers=workers, ocr=ocr)
 
-    if not pages:
+    if not extracted:
         print("Ошибка: Не удалось извлечь текст из PDF")
-        print("Возможно, PDF содержит только изображения (требуется OCR)")
+        if ocr is None:
+            print("Возможно, PDF содержит только изображения (запустите с флагом --ocr)")
         sys.exit(1)
 
-    print(f"Извлечено страниц: {len(pages)}")
-    print("Конвертирую в Markdown...")
+    print(f"Извлечено страниц: {extracted}")
+    print(f"\n✅ Готово! Файл сохранен: {output_path}")
+    print(f"Размер: {output_path.stat().st_size / 1024:.2f} KB")
 
-    # Форматируем как Markdown
-    title = pdf_path.stem  # имя файла без расширения
-    markdown_content = format_as_markdown(pages, title)
 
-    # Сохраняем результат
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(markdown_content)
+def convert_pdf_document(src_path, output_path, ocr=None):
+    """Конвертер PDF для пакетного режима (страницы читаются в текущем процессе)"""
+    return write_markdown(src_path, output_path, workers=1, ocr=ocr)
 
-    print(f"\n✅ Готово! Файл сохранен: {output_path}")
-    print(f"Размер: {output_path.stat().st_size / 1024:.2f} KB")
 
+def convert_with_pandoc(src_path, output_path, **options):
+    """
+    Конвертирует документ в Markdown через Pandoc.
 
-def main():
-    """Главная функция"""
-    if len(sys.argv) < 2:
-        print("Конвертер PDF в Markdown")
-        print("")
-        print("Использование:")
-        print(f"  python {sys.argv[0]} <путь_к_файлу.pdf> [путь_для_выходного_файла.md]")
-        print("")
-        print("Примеры:")
-        print(f"  python {sys.argv[0]} document.pdf")
-        print(f"  python {sys.argv[0]} document.pdf output.md")
-        print("")
-        print("По умолчанию MD файл сохраняется в ту же папку, что и исходный PDF.")
+    Args:
+        src_path: путь к исходному документу
+        output_path: путь к выходному MD файлу
+        options: параметры пакетного режима (не используются)
+
+    Returns:
+        1 если документ сконвертирован, 0 если он пустой
+    """
+    result = subprocess.run(
+        ['pandoc', str(src_path), '-t', 'gfm', '--wrap=none', '-o', str(output_path)],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"pandoc завершился с кодом {result.returncode}")
+
+    if not Path(output_path).read_text(encoding='utf-8').strip():
+        Path(output_path).unlink()
+        return 0
+
+    return 1
+
+
+# Конвертеры по расширению файла: функция(src_path, output_path, **options) ->
+# число сконвертированных единиц (страниц), 0 - если текст не найден
+CONVERTERS = {'.pdf': convert_pdf_document}
+CONVERTERS.update({ext: convert_with_pandoc for ext in PANDOC_EXTENSIONS})
+
+
+def register_converter(extension, converter):
+    """
+    Регистрирует конвертер для дополнительного формата документов.
+
+    Процессы-воркеры получают конвертер вместе с заданием (CONVERTERS
+    процесса-родителя им не виден), поэтому регистрировать его можно
+    в любой момент до convert_directory.
+
+    Args:
+        extension: расширение файла с точкой, например '.pptx'
+        converter: функция(src_path, output_path, **options) -> число страниц;
+                   должна быть определена на уровне модуля (передаётся в процессы)
+    """
+    CONVERTERS[extension.lower()] = converter
+
+
+def file_sha256(path):
+    """Вычисляет SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_documents(input_dir):
+    """
+    Находит все документы поддерживаемых форматов в папке (рекурсивно).
+
+    Args:
+        input_dir: папка с документами
+
+    Returns:
+        отсортированный список путей
+    """
+    input_dir = Path(input_dir)
+    return sorted(
+        path for path in input_dir.rglob('*')
+        if path.is_file() and path.suffix.lower() in CONVERTERS
+    )
+
+
+def plan_outputs(documents, input_dir, previous=None):
+    """
+    Сопоставляет каждому документу относительный путь выходного MD файла.
+
+    Документ, уже записанный в манифест, сохраняет своё имя: иначе новый
+    документ с тем же именем (report.docx рядом с report.pdf) мог бы
+    получить имя report.md и перезаписать чужой результат. Новые документы
+    с занятым именем получают расширение исходника в имени: report.docx.md
+    (и номер, если занято и оно).
+
+    Args:
+        documents: пути к документам
+        input_dir: папка с документами
+        previous: манифест прошлого запуска {документ: запись с 'output'}
+
+    Returns:
+        словарь {относительный_путь_документа: относительный_путь_md}
+    """
+    sources = [path.relative_to(input_dir) for path in documents]
+    previous = previous or {}
+
+    outputs = {
+        rel.as_posix(): previous[rel.as_posix()]['output']
+        for rel in sources
+        if previous.get(rel.as_posix(), {}).get('output')
+    }
+    taken = set(outputs.values())
+
+    for rel in sources:
+        source = rel.as_posix()
+        if source in outputs:
+            continue
+        candidates = itertools.chain(
+            [rel.with_suffix('.md'), rel.with_name(rel.name + '.md')],
+            (rel.with_name(f"{rel.name}.{number}.md") for number in itertools.count(2))
+        )
+        md_rel = next(c.as_posix() for c in candidates if c.as_posix() not in taken)
+        taken.add(md_rel)
+        outputs[source] = md_rel
+
+    return outputs
+
+
+def load_manifest(output_dir):
+    """Загружает манифест пакетной конвертации (или пустой словарь)"""
+    manifest_path = Path(output_dir) / MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    """Атомарно сохраняет манифест пакетной конвертации"""
+    manifest_path = Path(output_dir) / MANIFEST_FILENAME
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def convert_document(src_path, output_path, options, converter=None):
+    """
+    Конвертирует один документ подходящим конвертером (выполняется в процессе-воркере).
+
+    Args:
+        src_path: путь к документу
+        output_path: путь к выходному MD файлу
+        options: параметры конвертера (например, ocr)
+        converter: конвертер из CONVERTERS процесса-родителя (None - по расширению
+                   из CONVERTERS этого процесса)
+
+    Returns:
+        словарь с результатом: pages, size (байт) или error
+    """
+    converter = converter or CONVERTERS[Path(src_path).suffix.lower()]
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        pages = converter(src_path, output_path, **options)
+    except Exception as e:
+        return {'error': str(e)}
+
+    if not pages:
+        return {'error': 'текст не найден'}
+
+    return {'pages': pages, 'size': Path(output_path).stat().st_size}
+
+
+def write_index(output_dir, manifest):
+    """
+    Записывает index.md со списком полученных Markdown файлов.
+
+    Args:
+        output_dir: выходная папка
+        manifest: манифест пакетной конвертации
+    """
+    converted = sorted(
+        (source, entry) for source, entry in manifest.items() if entry.get('output')
+    )
+
+    lines = [
+        "# Документы из экспорта",
+        "",
+        f"*Документов: {len(converted)}*",
+        "",
+        "| Документ | Markdown | Страниц | Размер |",
+        "|----------|----------|---------|--------|",
+    ]
+    for source, entry in converted:
+        lines.append(
+            f"| {source} | [{entry['output']}]({entry['output']}) "
+            f"| {entry['pages']} | {entry['size'] / 1024:.1f} KB |"
+        )
+
+    failed = sorted(source for source, entry in manifest.items() if entry.get('error'))
+    if failed:
+        lines.extend(["", "## Не сконвертированы", ""])
+        lines.extend(f"- {source}: {manifest[source]['error']}" for source in failed)
+
+    with open(Path(output_dir) / INDEX_FILENAME, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def convert_directory(input_dir, output_dir, workers=None, force=False, ocr=None):
+    """
+    Конвертирует все документы из папки в Markdown.
+
+    Документы обрабатываются параллельно, по одному на процесс. Файлы,
+    у которых SHA-256 совпадает с записанным в манифесте, пропускаются.
+
+    Args:
+        input_dir: папка с документами (например, files/ из экспорта)
+        output_dir: папка для MD файлов, манифеста и index.md
+        workers: количество процессов (по умолчанию - по числу ядер)
+        force: конвертировать заново даже неизменённые файлы
+        ocr: параметры OCR (dpi, language) для PDF без текстового слоя
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+
+    if not input_dir.is_dir():
+        print(f"Ошибка: Папка {input_dir} не найдена")
         sys.exit(1)
 
-    pdf_path = sys.argv[1]
-    output_path = sys.argv[2] if len(sys.argv) > 2 else None
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    options = {}
+    if ocr is not None:
+        options['ocr'] = {**ocr, 'cache_dir': str(output_dir / OCR_CACHE_DIRNAME)}
+
+    documents = find_documents(input_dir)
+    print(f"Найдено документов: {len(documents)}")
+
+    # Имена выходных файлов считаем по всем документам, чтобы они не менялись
+    # в зависимости от того, какие конвертеры доступны; уже записанные в манифест
+    # документы сохраняют свои имена
+    old_manifest = load_manifest(output_dir)
+    outputs = plan_outputs(documents, input_dir, old_manifest)
+    manifest = {}
+    tasks = {}
+
+    if any(path.suffix.lower() in PANDOC_EXTENSIONS for path in documents) and not shutil.which('pandoc'):
+        print("⚠️  Pandoc не найден, документы кроме PDF будут пропущены")
+        print("   Установите: https://pandoc.org/installing.html")
+        for path in documents:
+            source = path.relative_to(input_dir).as_posix()
+            if path.suffix.lower() in PANDOC_EXTENSIONS and source in old_manifest:
+                manifest[source] = old_manifest[source]
+        documents = [path for path in documents if path.suffix.lower() not in PANDOC_EXTENSIONS]
+
+    for path in documents:
+        source = path.relative_to(input_dir).as_posix()
+        sha256 = file_sha256(path)
+        entry = old_manifest.get(source)
+
+        # Файл конвертируется заново и при включении/выключении OCR
+        if (not force and entry and entry['sha256'] == sha256
+                and entry.get('ocr', False) == (ocr is not None)
+                and (entry.get('error') or (output_dir / outputs[source]).exists())):
+            manifest[source] = entry
+            continue
+
+        tasks[source] = sha256
+
+    skipped = len(manifest)
+    print(f"Без изменений: {skipped}, к конвертации: {len(tasks)}")
+
+    # Удаляем MD файлы документов, которых больше нет в папке
+    for source, entry in old_manifest.items():
+        if source not in outputs and entry.get('output'):
+            (output_dir / entry['output']).unlink(missing_ok=True)
+
+    failed = 0
+
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=init_worker) as executor:
+            futures = {
+                executor.submit(
+                    convert_document,
+                    str(input_dir / source),
+                    str(output_dir / outputs[source]),
+                    options,
+                    CONVERTERS[Path(source).suffix.lower()]
+                ): source
+                for source in tasks
+            }
+
+            for i, future in enumerate(as_completed(futures), 1):
+                source = futures[future]
+                result = future.result()
+                entry = {'sha256': tasks[source], 'ocr': ocr is not None}
+
+                if 'error' in result:
+                    entry['error'] = result['error']
+                    failed += 1
+                    print(f"[{i}/{len(tasks)}] ❌ {source}: {result['error']}")
+                else:
+                    entry.update(output=outputs[source], pages=result['pages'], size=result['size'])
+                    print(f"[{i}/{len(tasks)}] ✓ {source} -> {outputs[source]}")
+
+                manifest[source] = entry
+
+    save_manifest(output_dir, manifest)
+    write_index(output_dir, manifest)
+
+    print(f"\n✅ Готово! Сконвертировано: {len(tasks) - failed}, пропущено: {skipped}, ошибок: {failed}")
+    print(f"Индекс: {output_dir / INDEX_FILENAME}")
 
-    convert_pdf_to_md(pdf_path, output_path)
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(
+        description='Конвертер PDF и других документов в Markdown',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Примеры использования:
+
+  # Один PDF (MD сохраняется в ту же папку)
+  python utils/pdf_to_md.py document.pdf
+
+  # Один PDF с указанием выходного файла
+  python utils/pdf_to_md.py document.pdf output.md
+
+  # Все документы из папки files/ экспорта
+  python utils/pdf_to_md.py "ChatExport_2026-01-19/ChatExport_2026-01-19/files" data/documents
+
+  # Распознать сканы (страницы без текстового слоя) через Tesseract
+  python utils/pdf_to_md.py scan.pdf --ocr --dpi 300
+
+По умолчанию в пакетном режиме результат сохраняется в data/documents.
+        """
+    )
+
+    parser.add_argument(
+        'input_path',
+        help='Путь к PDF файлу или папке с документами'
+    )
+
+    parser.add_argument(
+        'output_path',
+        nargs='?',
+        default=None,
+        help='Выходной MD файл или папка (для пакетного режима)'
+    )
+
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=None,
+        help='Количество процессов (по умолчанию: по числу ядер)'
+    )
+
+    parser.add_argument(
+        '-f', '--force',
+        action='store_true',
+        help='Конвертировать заново даже неизменённые документы'
+    )
+
+    parser.add_argument(
+        '--ocr',
+        action='store_true',
+        help='Распознавать страницы без текстового слоя через Tesseract'
+    )
+
+    parser.add_argument(
+        '--dpi',
+        type=int,
+        default=OCR_DPI,
+        help=f'Разрешение рендеринга страниц для OCR (по умолчанию: {OCR_DPI})'
+    )
+
+    parser.add_argument(
+        '-l', '--language',
+        default=OCR_LANGUAGE,
+        help=f'Языки Tesseract (по умолчанию: {OCR_LANGUAGE})'
+    )
+
+    args = parser.parse_args()
+
+    input_path = Path(args.input_path)
+
+    ocr = None
+    if args.ocr:
+        if not check_ocr():
+            print("Ошибка: Для OCR необходимы Tesseract и библиотеки pytesseract, Pillow")
+            print("Установите их командами:")
+            print("  pip install pytesseract pillow")
+            print("  apt-get install tesseract-ocr tesseract-ocr-rus (Linux)")
+            print("  или скачайте с https://github.com/UB-Mannheim/tesseract/wiki (Windows)")
+            sys.exit(1)
+        ocr = {'dpi': args.dpi, 'language': args.language}
+
+    if input_path.is_dir():
+        base_dir = Path(__file__).parent.parent
+        output_dir = Path(args.output_path) if args.output_path else base_dir / "data" / "documents"
+        convert_directory(input_path, output_dir, workers=args.workers, force=args.force, ocr=ocr)
+    else:
+        convert_pdf_to_md(input_path, args.output_path, workers=args.workers, ocr=ocr)
 
 
 if __name__ == '__main__':
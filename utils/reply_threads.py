@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Граф ответов: восстановление веток обсуждения по reply_to_id.
+
+Сообщение, отвечающее на другое, входит в ветку того сообщения; корень
+ветки - сообщение, которое само ни на что не отвечает (или отвечает на
+сообщение, которого нет в экспорте). Граф строится за один проход по
+записям в порядке экспорта: цель ответа всегда раньше ответа, поэтому
+корень сообщения - корень его цели. После этого вся ветка любого
+сообщения выдаётся за время, пропорциональное её размеру.
+
+Использование:
+    python utils/reply_threads.py <папка_экспорта|messages.html> [ID сообщения] [--top 20]
+
+Без ID печатает самые длинные ветки, с ID - ветку этого сообщения.
+"""
+
+import argparse
+import sys
+from collections import deque
+
+from telegram_export import find_pages, iter_records
+
+
+class ReplyGraph:
+    """Ветки ответов по записям telegram_export"""
+
+    def __init__(self, records=()):
+        self.parent = {}    # ID -> ID сообщения, на которое оно отвечает
+        self.children = {}  # ID -> [ID ответов] по порядку
+        self.root = {}      # ID -> ID корня ветки
+        self.threads = {}   # ID корня -> [ID сообщений ветки] по порядку
+        for record in records:
+            self.add(record['id'], record['reply_to_id'])
+
+    def add(self, message_id, reply_to_id=None):
+        """
+        Добавить сообщение (в порядке экспорта).
+
+        Args:
+            message_id: ID сообщения
+            reply_to_id: ID сообщения, на которое оно отвечает, или None
+        """
+        if reply_to_id is not None and reply_to_id in self.root:
+            self.parent[message_id] = reply_to_id
+            self.children.setdefault(reply_to_id, []).append(message_id)
+            root = self.root[reply_to_id]
+        else:
+            root = message_id
+        self.root[message_id] = root
+        self.threads.setdefault(root, []).append(message_id)
+
+    def __contains__(self, message_id):
+        return message_id in self.root
+
+    def thread(self, message_id):
+        """Все сообщения ветки, в которую входит сообщение (по порядку)"""
+        root = self.root.get(message_id)
+        return list(self.threads[root]) if root is not None else []
+
+    def ancestors(self, message_id, depth=None):
+        """Цепочка сообщений, на которые отвечает сообщение: ближайшее первым"""
+        chain = []
+        current = self.parent.get(message_id)
+        while current is not None and (depth is None or len(chain) < depth):
+            chain.append(current)
+            current = self.parent.get(current)
+        return chain
+
+    def replies(self, message_id):
+        """Все ответы на сообщение, включая ответы на ответы (обход в ширину)"""
+        found = []
+        queue = deque(self.children.get(message_id, ()))
+        while queue:
+            current = queue.popleft()
+            found.append(current)
+            queue.extend(self.children.get(current, ()))
+        return found
+
+    def largest(self, count=20):
+        """Корни самых длинных веток: [(ID корня, число сообщений)]"""
+        sizes = ((root, len(ids)) for root, ids in self.threads.items() if len(ids) > 1)
+        return sorted(sizes, key=lambda item: -item[1])[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ветки ответов в экспорте Telegram')
+    parser.add_argument('export', help='Папка экспорта или messages.html')
+    parser.add_argument('message_id', nargs='?', type=int, default=None, help='ID сообщения')
+    parser.add_argument('--top', type=int, default=20, help='Сколько самых длинных веток показать')
+    args = parser.parse_args()
+
+    pages = find_pages(args.export)
+    if not pages:
+        print(f"Ошибка: В {args.export} нет файлов messages*.html")
+        sys.exit(1)
+
+    records = {}
+    graph = ReplyGraph()
+    for record in iter_records(pages):
+        records[record['id']] = record
+        graph.add(record['id'], record['reply_to_id'])
+
+    if args.message_id is None:
+        replies = len(graph.parent)
+        print(f"Сообщений: {len(records)}, ответов: {replies}, "
+              f"веток из 2+ сообщений: {sum(1 for ids in graph.threads.values() if len(ids) > 1)}")
+        for root, size in graph.largest(args.top):
+            record = records[root]
+            print(f"  #{root} {record['date']} {record['author']}: {size} сообщений"
+                  f" - {' '.join(record['text'].split())[:80]}")
+        return
+
+    if args.message_id not in graph:
+        print(f"Ошибка: Сообщение {args.message_id} не найдено")
+        sys.exit(1)
+
+    for message_id in graph.thread(args.message_id):
+        record = records[message_id]
+        depth = len(graph.ancestors(message_id))
+        marker = '▶ ' if message_id == args.message_id else ''
+        print(f"{'  ' * depth}{marker}#{message_id} {record['date']} {record['author']}: "
+              f"{' '.join((record['text'] or record['transcript'] or '').split())[:200]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Разбор HTML экспорта Telegram в структурированные записи.
+
+В отличие от html_to_txt.py, который пишет сообщения как текст, здесь
+каждое сообщение превращается в словарь с полями: ID, дата, автор
+(у "присоединённых" сообщений подряд от одного автора он берётся из
+предыдущего), ID сообщения, на которое дан ответ, автор и дата оригинала
+пересланного сообщения, текст, транскрипция голосового, длительность
+голосового, краткое описание другого вложения, реакции. Ветки ответов по этим записям - reply_threads.py.
+
+Использование:
+    python utils/telegram_export.py <папка_экспорта|messages.html> [папка_транскрипций]
+
+Печатает записи в формате JSON Lines.
+"""
+
+import contextlib
+import json
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    print("Ошибка: Необходимо установить библиотеку BeautifulSoup4")
+    print("Установите её командой: pip install beautifulsoup4")
+    sys.exit(1)
+
+
+# ID сообщения из атрибута id="message123"
+MESSAGE_ID_RE = re.compile(r'^message(\d+)$')
+
+# ID цели ответа из ссылки "#go_to_message123" (или "messages2.html#go_to_message123")
+REPLY_ID_RE = re.compile(r'go_to_message(\d+)')
+
+
+def reply_target_id(reply_to):
+    """ID сообщения, на которое дан ответ (None, если ссылки нет)"""
+    link = reply_to.find('a', href=REPLY_ID_RE)
+    return int(REPLY_ID_RE.search(link['href']).group(1)) if link else None
+
+
+def forwarded_origin(forwarded):
+    """
+    Автор и дата оригинала пересланного сообщения.
+
+    Дата лежит внутри from_name отдельным span и не должна склеиваться
+    с именем; элемент не изменяется.
+
+    Returns:
+        tuple: (автор или None, дата или None)
+    """
+    fwd_from = forwarded.find('div', class_='from_name')
+    if not fwd_from:
+        return None, None
+    date_span = fwd_from.find('span', class_='date')
+    name = ''.join(fwd_from.find_all(string=True, recursive=False)).strip()
+    date = None
+    if date_span:
+        date = date_span.get('title') or date_span.get_text(strip=True)
+    return name or fwd_from.get_text(strip=True), date
+
+
+def process_text_element(text_elem):
+    """Обрабатывает текстовый элемент, сохраняя форматирование"""
+    for br in text_elem.find_all('br'):
+        br.replace_with('\n')
+    text = text_elem.get_text()
+    lines = [line.strip() for line in text.split('\n')]
+    return '\n'.join(lines).strip()
+
+
+def find_pages(path):
+    """
+    Найти страницы экспорта: messages.html, messages2.html, ... по порядку.
+
+    Args:
+        path: Папка экспорта или путь к одному HTML файлу
+
+    Returns:
+        list: Пути к HTML файлам
+    """
+    path = Path(path)
+    if path.is_file():
+        return [path]
+
+    def page_number(page):
+        digits = page.stem[len('messages'):]
+        return int(digits) if digits.isdigit() else 1
+
+    return sorted(path.glob('messages*.html'), key=page_number)
+
+
+def parse_date(title):
+    """
+    Дата из атрибута title: "22.03.2025 11:41:52 UTC+03:00" -> "2025-03-22T11:41:52".
+
+    Часовой пояс экспорта одинаков для всех сообщений и отбрасывается.
+    """
+    try:
+        return datetime.strptime(title.split(' UTC')[0].strip(), '%d.%m.%Y %H:%M:%S').isoformat()
+    except ValueError:
+        return None
+
+
+def parse_duration(text):
+    """Длительность "01:05" или "1:02:03" в секундах (None, если не разобрать)"""
+    try:
+        seconds = 0
+        for part in text.strip().split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    except ValueError:
+        return None
+
+
+def parse_reactions(body):
+    """Реакции: [{'emoji': '👍', 'count': 3}, ...]"""
+    reactions = []
+    block = body.find('span', class_='reactions')
+    if not block:
+        return reactions
+
+    for reaction in block.find_all('span', class_='reaction'):
+        emoji = reaction.find('span', class_='emoji')
+        if emoji:
+            userpics = reaction.find('span', class_='userpics')
+            count = len(userpics.find_all('div', class_='userpic')) if userpics else 1
+            reactions.append({'emoji': emoji.get_text(strip=True), 'count': count})
+    return reactions
+
+
+def parse_media(media_wrap):
+    """
+    Краткое описание вложения, кроме голосового: "📷", "🎥 название", "📎 имя файла".
+
+    Returns:
+        str или None
+    """
+    if media_wrap.find('a', class_='media_voice_message'):
+        return None
+    title = media_wrap.find('div', class_='title')
+    title = title.get_text(strip=True) if title else ''
+    if media_wrap.find('a', class_='photo_wrap'):
+        return '📷'
+    if media_wrap.find('a', class_='video_file_wrap'):
+        return f"🎥 {title}".strip()
+    if media_wrap.find('a', class_='audio_file'):
+        return f"🎵 {title}".strip()
+    file_name = media_wrap.find('div', class_='name')
+    if media_wrap.find('div', class_='file'):
+        return f"📎 {file_name.get_text(strip=True) if file_name else ''}".strip()
+    if media_wrap.find('div', class_='sticker'):
+        return '🎨'
+    return '📎'
+
+
+def parse_record(msg_div, transcriptions, previous_author=None):
+    """
+    Разобрать одно сообщение экспорта в запись.
+
+    Args:
+        msg_div: Элемент div.message
+        transcriptions: Транскрипции голосовых {имя файла без расширения: текст}
+        previous_author: Автор предыдущего сообщения (для "присоединённых" сообщений)
+
+    Returns:
+        dict: Запись сообщения или None для служебных сообщений
+    """
+    if 'service' in msg_div.get('class', []):
+        return None
+
+    match = MESSAGE_ID_RE.match(msg_div.get('id', ''))
+    body = msg_div.find('div', class_='body', recursive=False)
+    if not match or not body:
+        return None
+
+    date_elem = body.find('div', class_='date')
+    from_name = body.find('div', class_='from_name', recursive=False)
+
+    record = {
+        'id': int(match.group(1)),
+        'date': parse_date(date_elem.get('title', '')) if date_elem else None,
+        'author': from_name.get_text(strip=True) if from_name else previous_author,
+        'reply_to_id': None,
+        'forwarded_from': None,
+        'forwarded_date': None,
+        'text': '',
+        'transcript': None,
+        'voice_seconds': None,
+        'media': None,
+        'reactions': parse_reactions(body),
+    }
+
+    reply_to = body.find('div', class_='reply_to')
+    if reply_to:
+        record['reply_to_id'] = reply_target_id(reply_to)
+
+    texts = []
+
+    forwarded = body.find('div', class_='forwarded')
+    if forwarded:
+        record['forwarded_from'], fwd_date = forwarded_origin(forwarded)
+        if fwd_date:
+            record['forwarded_date'] = parse_date(fwd_date)
+        fwd_text = forwarded.find('div', class_='text')
+        if fwd_text:
+            texts.append(process_text_element(fwd_text))
+
+    text_elem = body.find('div', class_='text', recursive=False)
+    if text_elem:
+        texts.append(process_text_element(text_elem))
+    record['text'] = '\n'.join(text for text in texts if text)
+
+    media_wrap = body.find('div', class_='media_wrap', recursive=False)
+    if media_wrap:
+        record['media'] = parse_media(media_wrap)
+
+    voice = body.find('a', class_='media_voice_message')
+    if voice:
+        status = voice.find('div', class_='status')
+        if status:
+            record['voice_seconds'] = parse_duration(status.get_text(strip=True))
+        record['transcript'] = transcriptions.get(Path(voice.get('href', '')).stem)
+
+    return record
+
+
+def iter_records(pages, transcriptions=None):
+    """
+    Разобрать страницы экспорта в записи сообщений по порядку.
+
+    Args:
+        pages: Пути к HTML файлам (find_pages)
+        transcriptions: Транскрипции голосовых (load_transcriptions) или None
+
+    Yields:
+        dict: Запись сообщения (см. parse_record)
+    """
+    transcriptions = transcriptions or {}
+
+    for page in pages:
+        with open(page, 'r', encoding='utf-8') as f:
+            soup = BeautifulSoup(f.read(), 'html.parser')
+
+        # Новая страница начинается с сообщения с явным автором
+        previous_author = None
+        for msg_div in soup.find_all('div', class_='message'):
+            if 'service' in msg_div.get('class', []):
+                previous_author = None
+                continue
+            record = parse_record(msg_div, transcriptions, previous_author)
+            if record:
+                previous_author = record['author']
+                yield record
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Использование:")
+        print(f"  python {sys.argv[0]} <папка_экспорта|messages.html> [папка_транскрипций]")
+        sys.exit(1)
+
+    pages = find_pages(sys.argv[1])
+    if not pages:
+        print(f"Ошибка: В {sys.argv[1]} нет файлов messages*.html")
+        sys.exit(1)
+
+    transcriptions = {}
+    if len(sys.argv) >= 3:
+        # Ход загрузки - в stderr, чтобы не смешивать с JSON Lines
+        from inject_transcriptions import load_transcriptions
+        with contextlib.redirect_stdout(sys.stderr):
+            transcriptions = load_transcriptions(sys.argv[2])
+
+    for record in iter_records(pages, transcriptions):
+        print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
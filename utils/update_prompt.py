@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Скрипт для обновления system_prompt.txt на VPS сервере.
+
+Бот сам подхватывает изменённый файл (горячая перезагрузка, RELOAD_INTERVAL),
+поэтому перезапуск сервиса выполняется только с флагом --restart.
 """
 
 import os
@@ -22,6 +25,8 @@ VPS_PASSWORD = os.getenv('VPS_PASSWORD')
 REMOTE_DIR = "/opt/masterskaya-bot"
 
 def main():
+    restart = '--restart' in sys.argv
+
     print("🔄 Обновление system_prompt.txt на сервере...")
     print()
 
@@ -56,20 +61,26 @@ def main():
             timeout=10
         )
 
-        # Копирование файла через SFTP
+        # Копирование файла через SFTP: сначала во временный файл, затем
+        # атомарное переименование, чтобы бот не прочитал файл наполовину
         sftp = ssh.open_sftp()
         remote_path = f"{REMOTE_DIR}/app/config/system_prompt.txt"
+        remote_tmp_path = f"{remote_path}.tmp"
 
         print(f"📁 Копирование {local_file} -> {remote_path}...")
-        sftp.put(str(local_file), remote_path)
+        sftp.put(str(local_file), remote_tmp_path)
+        sftp.posix_rename(remote_tmp_path, remote_path)
         sftp.close()
         print("✅ Файл скопирован")
 
-        # Перезапуск бота
-        print()
-        print("🔄 Перезапуск бота...")
-        stdin, stdout, stderr = ssh.exec_command('systemctl restart masterskaya-bot')
-        stdout.channel.recv_exit_status()  # Ждем завершения команды
+        if restart:
+            # Перезапуск бота
+            print()
+            print("🔄 Перезапуск бота...")
+            stdin, stdout, stderr = ssh.exec_command('systemctl restart masterskaya-bot')
+            stdout.channel.recv_exit_status()  # Ждем завершения команды
+        else:
+            print("🔄 Бот подхватит новый prompt без перезапуска (см. 'Контекст перезагружен' в логах)")
 
         # Проверка статуса
         print("📊 Проверка статуса...")
@@ -77,9 +88,9 @@ def main():
         status_output = stdout.read().decode('utf-8')
 
         if 'active (running)' in status_output:
-            print("✅ Бот успешно перезапущен и работает")
+            print("✅ Бот работает")
         else:
-            print("⚠️  Бот перезапущен, но статус неясен:")
+            print("⚠️  Статус бота неясен:")
             print(status_output)
 
         print()
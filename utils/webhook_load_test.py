@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест webhook-сервера Telegram-бота.
+
+Отправляет на локальный webhook бота (BOT_MODE=webhook) синтетические
+обновления Telegram (текстовые сообщения из многих чатов) и измеряет
+задержку приёма и пропускную способность.
+
+Бот пытается ответить в несуществующие чаты, поэтому его вызовы Telegram API
+завершаются ошибками в логе - на приём обновлений это не влияет. Чтобы не
+расходовать квоту Hydra AI, укажите в API_URL локальный mock API
+(benchmarks/mock_llm_server.py).
+
+С --mock-telegram PORT скрипт поднимает и минимальный поддельный Bot API
+(getMe, setWebhook, sendMessage, ...), и весь бот работает без сети:
+сначала запустите нагрузочный тест, затем бота с TELEGRAM_API_URL=http://127.0.0.1:PORT.
+В этом режиме скрипт дожидается ответов бота (sendMessage) и измеряет
+сквозную пропускную способность - ответов в секунду от первого обновления
+до последнего ответа. С --unique каждый вопрос уникален и не находится
+в кэше ответов, то есть каждый ответ - запрос к (mock) API.
+
+Использование:
+    python utils/webhook_load_test.py [url] [--requests N] [--concurrency N]
+
+Примеры:
+    python utils/webhook_load_test.py
+    python utils/webhook_load_test.py http://127.0.0.1:8443/telegram -n 2000 -c 50 --secret mysecret
+    python utils/webhook_load_test.py --mock-telegram 8081 --unique -n 300
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Тексты синтетических сообщений
+QUESTIONS = [
+    "Кто является основным разработчиком?",
+    "Что такое проект MyBox?",
+    "Какие технологии используются?",
+    "Как менялось видение проекта?",
+    "/help",
+]
+
+
+class MockTelegramHandler(BaseHTTPRequestHandler):
+    """Минимальный поддельный Bot API: на любой вызов /bot<token>/<метод> отвечает ok=true"""
+
+    BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'MockBot', 'username': 'mock_bot'}
+
+    # Число вызовов по методам и моменты отправки сообщений, общие для всех экземпляров обработчика
+    calls = {}
+    sent_at = []
+    calls_lock = threading.Lock()
+
+    def do_POST(self):
+        method = self.path.rstrip('/').rsplit('/', 1)[-1]
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        with self.calls_lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if method == 'sendMessage':
+                self.sent_at.append(time.perf_counter())
+
+        if method == 'getMe':
+            result = self.BOT_USER
+        elif method in ('sendMessage', 'editMessageText'):
+            params = self.parse_params(body)
+            result = {
+                'message_id': 1,
+                'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'},
+                'from': self.BOT_USER,
+                'text': params.get('text', ''),
+            }
+        else:
+            result = True
+
+        payload = json.dumps({'ok': True, 'result': result}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST
+
+    def parse_params(self, body):
+        """Разобрать тело запроса в JSON или form-encoded"""
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            return json.loads(body or b'{}')
+        params = {}
+        for pair in body.decode('utf-8', errors='replace').split('&'):
+            if '=' in pair:
+                key, value = pair.split('=', 1)
+                params[urllib.parse.unquote_plus(key)] = urllib.parse.unquote_plus(value)
+        return params
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_telegram(port):
+    """Запустить поддельный Bot API в фоновом потоке"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockTelegramHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_update(update_id, chat_count, unique=False):
+    """
+    Собрать синтетическое обновление Telegram с текстовым сообщением.
+
+    Args:
+        update_id: Уникальный ID обновления
+        chat_count: Количество различных синтетических чатов
+        unique: Добавить к вопросу номер, чтобы он не нашёлся в кэше ответов
+
+    Returns:
+        dict: Обновление в формате Telegram Bot API
+    """
+    chat_id = 10_000_000 + update_id % chat_count
+    text = QUESTIONS[update_id % len(QUESTIONS)]
+    if unique and not text.startswith('/'):
+        text = f"{text} (вопрос {update_id})"
+
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private', 'first_name': 'Load'},
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Load', 'username': f'load{chat_id}'},
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+
+    return {'update_id': update_id, 'message': message}
+
+
+def post_update(url, update, secret=None, timeout=10):
+    """
+    Отправить одно обновление на webhook.
+
+    Returns:
+        tuple: (задержка в секундах, HTTP-статус или None при ошибке соединения)
+    """
+    headers = {'Content-Type': 'application/json'}
+    if secret:
+        headers['X-Telegram-Bot-Api-Secret-Token'] = secret
+
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(update).encode('utf-8'),
+        headers=headers,
+        method='POST'
+    )
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = None
+
+    return time.perf_counter() - start, status
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль отсортированного списка (nearest-rank)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_load_test(url, total, concurrency, chat_count, secret=None, unique=False):
+    """
+    Отправить total обновлений через concurrency параллельных соединений.
+
+    Returns:
+        dict: Отчёт - пропускная способность, перцентили задержки, число ответов по статусам
+    """
+    updates = [make_update(i, chat_count, unique) for i in range(1, total + 1)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda update: post_update(url, update, secret), updates))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, status in results if status == 200)
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0,
+            'p50': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+        },
+        'statuses': statuses,
+        'started': start,
+    }
+
+
+def wait_for_answers(started, expected, settle):
+    """
+    Дождаться ответов бота на поддельном Bot API.
+
+    Ждёт, пока sendMessage не наберёт expected вызовов или пока за settle
+    секунд не придёт ни одного нового.
+
+    Args:
+        started: Момент отправки первого обновления (time.perf_counter)
+        expected: Сколько ответов ожидается
+        settle: Сколько секунд ждать нового ответа
+
+    Returns:
+        dict: Число ответов, время до последнего и ответов в секунду
+    """
+    seen, idle_since = -1, time.perf_counter()
+    while True:
+        with MockTelegramHandler.calls_lock:
+            count = len(MockTelegramHandler.sent_at)
+        if count >= expected or time.perf_counter() - idle_since > settle:
+            break
+        if count != seen:
+            seen, idle_since = count, time.perf_counter()
+        time.sleep(0.05)
+
+    with MockTelegramHandler.calls_lock:
+        sent_at = list(MockTelegramHandler.sent_at)
+    elapsed = (sent_at[-1] - started) if sent_at else 0.0
+    return {
+        'answers': len(sent_at),
+        'elapsed_s': round(elapsed, 3),
+        'answers_per_s': round(len(sent_at) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест webhook бота')
+    parser.add_argument('url', nargs='?', default='http://127.0.0.1:8443/telegram',
+                        help='URL webhook (по умолчанию: http://127.0.0.1:8443/telegram)')
+    parser.add_argument('-n', '--requests', type=int, default=500, help='Количество обновлений (по умолчанию: 500)')
+    parser.add_argument('-c', '--concurrency', type=int, default=20, help='Параллельных соединений (по умолчанию: 20)')
+    parser.add_argument('--chats', type=int, default=100, help='Количество синтетических чатов (по умолчанию: 100)')
+    parser.add_argument('--secret', default=None, help='WEBHOOK_SECRET бота')
+    parser.add_argument('--json', action='store_true', help='Вывести отчёт в JSON')
+    parser.add_argument('--mock-telegram', type=int, default=None, metavar='PORT',
+                        help='Поднять поддельный Bot API на этом порту и ждать Enter перед отправкой')
+    parser.add_argument('--unique', action='store_true', help='Уникальные вопросы (мимо кэша ответов)')
+    parser.add_argument('--settle', type=float, default=10.0,
+                        help='С --mock-telegram: сколько секунд ждать нового ответа бота (по умолчанию: 10)')
+    parser.add_argument('--no-wait', action='store_true', help='С --mock-telegram: не ждать Enter')
+    args = parser.parse_args()
+
+    if args.mock_telegram:
+        start_mock_telegram(args.mock_telegram)
+        print(f"Поддельный Bot API: http://127.0.0.1:{args.mock_telegram}")
+        if not args.no_wait:
+            print(f"Запустите бота с TELEGRAM_API_URL=http://127.0.0.1:{args.mock_telegram} и нажмите Enter")
+            input()
+
+    print(f"Цель: {args.url}")
+    print(f"Отправка {args.requests} обновлений, параллельно {args.concurrency}...")
+
+    with MockTelegramHandler.calls_lock:
+        # Вызовы при запуске бота (приветствия, прогрев) к нагрузке не относятся
+        MockTelegramHandler.sent_at.clear()
+    report = run_load_test(args.url, args.requests, args.concurrency, args.chats, args.secret, args.unique)
+    started = report.pop('started')
+    if args.mock_telegram:
+        report['end_to_end'] = wait_for_answers(started, args.requests, args.settle)
+        report['bot_api_calls'] = dict(MockTelegramHandler.calls)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    latency = report['latency_ms']
+    print(f"\nГотово за {report['elapsed_s']} с")
+    print(f"  Пропускная способность: {report['throughput_rps']} обновлений/с")
+    print(f"  Задержка: среднее {latency['mean']} мс, p50 {latency['p50']} мс, "
+          f"p95 {latency['p95']} мс, p99 {latency['p99']} мс")
+    print(f"  Статусы:  {report['statuses']}")
+    if 'end_to_end' in report:
+        end_to_end = report['end_to_end']
+        print(f"  Ответы бота: {end_to_end['answers']} за {end_to_end['elapsed_s']} с "
+              f"({end_to_end['answers_per_s']} ответов/с)")
+    if 'bot_api_calls' in report:
+        print(f"  Bot API:  {report['bot_api_calls']}")
+
+
+if __name__ == "__main__":
+    main()